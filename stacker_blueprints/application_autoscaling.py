@@ -0,0 +1,225 @@
+"""Helpers for the blueprints that scale resources with Application Auto
+Scaling.
+
+Scaling is configured with dicts using the same lowercase keys across
+blueprints (min, max, target, scale-in-cooldown...), see the blueprints
+for examples.
+
+Ref: https://docs.aws.amazon.com/autoscaling/application/userguide/what-is-application-auto-scaling.html  # noqa
+"""
+from troposphere import NoValue
+from troposphere import applicationautoscaling as aas
+from troposphere import cloudwatch
+
+
+def scheduled_actions(schedules):
+    """Return the aas.ScheduledAction of each schedule.
+
+    Args:
+        schedules (list): dicts with a name, a schedule (an at(), rate() or
+            cron() expression), min and/or max, and an optional start-time
+            and end-time.
+    """
+    actions = []
+    for schedule in schedules:
+        if "min" not in schedule and "max" not in schedule:
+            raise ValueError("Scheduled action %s needs a min or max." %
+                             schedule["name"])
+        action = aas.ScheduledAction(
+            ScheduledActionName=schedule["name"],
+            Schedule=schedule["schedule"],
+            ScalableTargetAction=aas.ScalableTargetAction(
+                MinCapacity=schedule.get("min", NoValue),
+                MaxCapacity=schedule.get("max", NoValue),
+            ),
+        )
+        if "start-time" in schedule:
+            action.StartTime = schedule["start-time"]
+        if "end-time" in schedule:
+            action.EndTime = schedule["end-time"]
+        actions.append(action)
+    return actions
+
+
+def target_tracking_configuration(config, metric_type, default_target,
+                                  resource_label=None):
+    """Return a TargetTrackingScalingPolicyConfiguration tracking a
+    predefined metric.
+
+    Args:
+        config (dict): The target (default: default_target),
+            scale-in-cooldown and scale-out-cooldown (default: 60) and
+            disable-scale-in (default: False).
+        metric_type (str): The PredefinedMetricType to track.
+        default_target (float): The target value when config has none.
+        resource_label (str): The ResourceLabel of the metric, required by
+            the ALBRequestCountPerTarget metrics.
+    """
+    metric = aas.PredefinedMetricSpecification(
+        PredefinedMetricType=metric_type
+    )
+    if resource_label:
+        metric.ResourceLabel = resource_label
+    configuration = aas.TargetTrackingScalingPolicyConfiguration(
+        TargetValue=config.get("target", default_target),
+        ScaleInCooldown=config.get("scale-in-cooldown", 60),
+        ScaleOutCooldown=config.get("scale-out-cooldown", 60),
+        PredefinedMetricSpecification=metric,
+    )
+    if config.get("disable-scale-in"):
+        configuration.DisableScaleIn = True
+    return configuration
+
+
+def step_scaling_configuration(config):
+    """Return a StepScalingPolicyConfiguration.
+
+    Args:
+        config (dict): The steps (a list of dicts with lower and/or upper,
+            the bounds of the step relative to the alarm threshold, and
+            adjustment), adjustment-type (default: ChangeInCapacity),
+            cooldown (default: 60) and aggregation (default: Average).
+    """
+    steps = config.get("steps")
+    if not steps:
+        raise ValueError("Step scaling policy %s needs steps." %
+                         config["name"])
+    return aas.StepScalingPolicyConfiguration(
+        AdjustmentType=config.get("adjustment-type", "ChangeInCapacity"),
+        Cooldown=config.get("cooldown", 60),
+        MetricAggregationType=config.get("aggregation", "Average"),
+        StepAdjustments=[
+            aas.StepAdjustment(
+                MetricIntervalLowerBound=step.get("lower", NoValue),
+                MetricIntervalUpperBound=step.get("upper", NoValue),
+                ScalingAdjustment=step["adjustment"],
+            )
+            for step in steps
+        ],
+    )
+
+
+def step_scaling_alarm(title, config, policy):
+    """Return the alarm triggering a step scaling policy.
+
+    Args:
+        title (str): The title of the alarm.
+        config (dict): The namespace, metric and dimensions (a dict) of the
+            metric, its statistic (default: Average), period (default: 60),
+            evaluation-periods (default: 1), comparison (default:
+            GreaterThanOrEqualToThreshold) and threshold.
+        policy (aas.ScalingPolicy): The policy to trigger.
+    """
+    dimensions = config.get("dimensions", {})
+    return cloudwatch.Alarm(
+        title,
+        AlarmActions=[policy.Ref()],
+        ComparisonOperator=config.get(
+            "comparison", "GreaterThanOrEqualToThreshold"
+        ),
+        Dimensions=[
+            cloudwatch.MetricDimension(Name=name, Value=dimensions[name])
+            for name in sorted(dimensions)
+        ] or NoValue,
+        EvaluationPeriods=config.get("evaluation-periods", 1),
+        MetricName=config["metric"],
+        Namespace=config["namespace"],
+        Period=config.get("period", 60),
+        Statistic=config.get("statistic", "Average"),
+        Threshold=config["threshold"],
+    )
+
+
+def _parse_time(value):
+    try:
+        hours, minutes = [int(part) for part in value.split(":")]
+    except ValueError:
+        raise ValueError("Invalid time %r, expected HH:MM." % value)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError("Invalid time %r, expected HH:MM." % value)
+    return hours * 60 + minutes
+
+
+def _cron(minute_of_day, days):
+    hours, minutes = divmod(minute_of_day, 60)
+    if days == "*":
+        return "cron(%d %d * * ? *)" % (minutes, hours)
+    return "cron(%d %d ? * %s *)" % (minutes, hours, days)
+
+
+def pre_warm_schedules(peaks, minimum):
+    """Return the schedules raising the min capacity ahead of peaks.
+
+    Each peak gives two schedules: <name>-pre-warm raises the min capacity
+    lead minutes before the peak starts, and <name>-cool-down sets it back
+    to minimum once it ends, leaving target tracking to scale in.
+
+    Args:
+        peaks (list): dicts with a name, start and end (HH:MM, in UTC),
+            min (the capacity to have when the peak starts), days (a cron
+            day-of-week field such as MON-FRI, default: every day) and lead
+            (minutes, default: 15).
+        minimum (int): The min capacity outside of peaks.
+    """
+    schedules = []
+    for peak in peaks:
+        days = peak.get("days", "*")
+        start = _parse_time(peak["start"]) - peak.get("lead", 15)
+        if start < 0:
+            if days != "*":
+                raise ValueError("The pre-warm of peak %s would start the "
+                                 "day before, please use a shorter lead." %
+                                 peak["name"])
+            start += 24 * 60
+        schedules.append({
+            "name": peak["name"] + "-pre-warm",
+            "schedule": _cron(start, days),
+            "min": peak["min"],
+        })
+        schedules.append({
+            "name": peak["name"] + "-cool-down",
+            "schedule": _cron(_parse_time(peak["end"]), days),
+            "min": minimum,
+        })
+    return schedules
+
+
+def restore_schedules(schedules, minimum, maximum):
+    """Return the schedules, each followed by one restoring the min and max
+    capacity at its end.
+
+    Scheduled actions set the capacity range until another action changes
+    it, so a schedule leaving the range of its target must have an end.
+
+    Args:
+        schedules (list): dicts, see `scheduled_actions`, with an optional
+            end: the schedule of the <name>-restore action, setting the min
+            and max capacity back to minimum and maximum.
+        minimum (int): The min capacity outside of schedules.
+        maximum (int): The max capacity outside of schedules.
+    """
+    result = []
+    for schedule in schedules:
+        schedule = dict(schedule)
+        end = schedule.pop("end", None)
+        low = schedule.get("min", minimum)
+        high = schedule.get("max", maximum)
+        if low > high:
+            raise ValueError("The min (%d) of scheduled action %s can't be "
+                             "more than its max (%d)." % (
+                                 low, schedule["name"], high))
+        if end is None and not minimum <= low <= high <= maximum:
+            raise ValueError(
+                "Scheduled action %s sets a capacity outside of the min (%d) "
+                "and max (%d) of its target without an end to restore "
+                "them." % (schedule["name"], minimum, maximum)
+            )
+        result.append(schedule)
+        if end is not None:
+            result.append({
+                "name": schedule["name"] + "-restore",
+                "schedule": end,
+                "min": minimum,
+                "max": maximum,
+            })
+    return result
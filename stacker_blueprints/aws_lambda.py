@@ -1,4 +1,7 @@
+import hashlib
+import json
 import logging
+import numbers
 
 from stacker.blueprints.base import Blueprint
 
@@ -7,32 +10,118 @@ from stacker.blueprints.variables.types import TroposphereType
 from stacker.util import cf_safe_name
 
 from troposphere import (
+    AccountId,
+    Join,
     NoValue,
     Output,
     Ref,
+    Region,
     Sub,
+    encode_to_dict,
     iam,
 )
 
+from troposphere import applicationautoscaling as aas
+
 from troposphere import awslambda
 
+from troposphere import cloudwatch
+
 from troposphere import events
 
 import awacs.logs
 import awacs.kinesis
 import awacs.dynamodb
+import awacs.sqs
 
 from awacs.aws import Statement, Allow, Policy
 from awacs.helpers.trust import get_lambda_assumerole_policy
 
+from .application_autoscaling import (
+    restore_schedules,
+    scheduled_actions,
+    target_tracking_configuration,
+)
 from .policies import (
+    INLINE_POLICY_MAX_BYTES,
+    add_role_policies,
+    compact_statements,
     lambda_basic_execution_statements,
     lambda_vpc_execution_statements,
+    policy_size,
+    split_statements,
 )
+from .util import CLOUDFORMATION_LIMITS, STRING_TYPES
 
 
 logger = logging.getLogger(name=__name__)
 
+# reference:
+#   https://docs.aws.amazon.com/autoscaling/application/userguide/application-auto-scaling-service-linked-roles.html  # noqa
+LAMBDA_AUTOSCALING_ROLE = (
+    "arn:${AWS::Partition}:iam::${AWS::AccountId}:role/aws-service-role/"
+    "lambda.application-autoscaling.amazonaws.com/"
+    "AWSServiceRoleForApplicationAutoScaling_LambdaConcurrency"
+)
+
+
+# The (min, max) of the EventSourceMapping throughput settings of each
+# type of event source.
+# reference: https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/aws-resource-lambda-eventsourcemapping.html  # noqa
+STREAM_LIMITS = {
+    "BatchSize": (1, 10000),
+    "MaximumBatchingWindowInSeconds": (0, 300),
+    "ParallelizationFactor": (1, 10),
+    "MaximumRetryAttempts": (-1, 10000),
+    "MaximumRecordAgeInSeconds": (-1, 604800),
+}
+
+EVENT_SOURCE_LIMITS = {
+    "kinesis": STREAM_LIMITS,
+    "dynamodb": STREAM_LIMITS,
+    "sqs": {
+        "BatchSize": (1, 10000),
+        "MaximumBatchingWindowInSeconds": (0, 300),
+    },
+}
+
+# SQS batches over this size need a batching window.
+SQS_MAX_UNBATCHED_SIZE = 10
+
+STARTING_POSITIONS = {
+    "kinesis": ("TRIM_HORIZON", "LATEST", "AT_TIMESTAMP"),
+    "dynamodb": ("TRIM_HORIZON", "LATEST"),
+}
+
+STREAM_ONLY_PROPERTIES = ("BisectBatchOnFunctionError",)
+
+# EventSourceThroughput keys, and the EventSourceMapping properties they set
+THROUGHPUT_PROPERTIES = {
+    "batch-size": "BatchSize",
+    "batching-window": "MaximumBatchingWindowInSeconds",
+    "parallelization-factor": "ParallelizationFactor",
+    "bisect-on-error": "BisectBatchOnFunctionError",
+    "starting-position": "StartingPosition",
+    "max-retry-attempts": "MaximumRetryAttempts",
+    "max-record-age": "MaximumRecordAgeInSeconds",
+}
+
+
+def get_event_source_type(event_source_arn):
+    """Returns the type of event source of an arn.
+
+    Args:
+        event_source_arn (str): The Arn of an event source.
+
+    Returns:
+        str: The service of the arn (kinesis, dynamodb, sqs, kafka...), or
+            None if it isn't a string, such as an intrinsic function.
+    """
+    if not isinstance(event_source_arn, STRING_TYPES):
+        return None
+    parts = event_source_arn.split(":")
+    return parts[2] if len(parts) > 2 else None
+
 
 def get_stream_action_type(stream_arn):
     """Returns the awacs Action for a stream type given an arn
@@ -62,6 +151,87 @@ def get_stream_action_type(stream_arn):
         )
 
 
+def _literal_int(value, default=None):
+    """Returns value as an int, or default if it isn't a literal int or
+    string, such as an intrinsic function."""
+    if isinstance(value, bool) or not isinstance(
+            value, STRING_TYPES + (numbers.Integral,)):
+        return default
+    return int(value)
+
+
+def validate_event_source_mapping(mapping, source_type,
+                                  check_starting_position=True):
+    """Checks EventSourceMapping properties against the limits of its type
+    of event source.
+
+    Only kinesis, dynamodb and sqs event sources are checked, the
+    properties of other event sources are passed through as they are, as
+    are properties that aren't literals, such as a Ref.
+
+    Args:
+        mapping (dict): The EventSourceMapping properties.
+        source_type (str): See `get_event_source_type`.
+        check_starting_position (bool): Whether to check the value of the
+            StartingPosition of stream event sources, and not only that it
+            is set.
+
+    Returns:
+        list: A description of every problem found.
+    """
+    problems = []
+    if source_type not in EVENT_SOURCE_LIMITS:
+        return problems
+    is_stream = source_type in STARTING_POSITIONS
+    limits = EVENT_SOURCE_LIMITS[source_type]
+
+    for prop in sorted(STREAM_LIMITS):
+        if prop not in mapping:
+            continue
+        value = mapping[prop]
+        if prop not in limits:
+            problems.append("%s isn't supported for %s event sources." % (
+                prop, source_type))
+            continue
+        minimum, maximum = limits[prop]
+        number = _literal_int(value)
+        if number is not None and not minimum <= number <= maximum:
+            problems.append("%s must be between %d and %d for %s event "
+                            "sources, got %s." % (
+                                prop, minimum, maximum, source_type, value))
+
+    if not is_stream:
+        for prop in STREAM_ONLY_PROPERTIES + ("StartingPosition",):
+            if prop in mapping:
+                problems.append("%s isn't supported for %s event sources." % (
+                    prop, source_type))
+        batch_size = _literal_int(mapping.get("BatchSize", 0), 0)
+        window = _literal_int(
+            mapping.get("MaximumBatchingWindowInSeconds", 0), 1
+        )
+        if batch_size > SQS_MAX_UNBATCHED_SIZE and not window:
+            problems.append("A BatchSize over %d needs a "
+                            "MaximumBatchingWindowInSeconds." % (
+                                SQS_MAX_UNBATCHED_SIZE))
+    else:
+        positions = STARTING_POSITIONS[source_type]
+        position = mapping.get("StartingPosition")
+        if position is None or (check_starting_position and
+                                isinstance(position, STRING_TYPES) and
+                                position not in positions):
+            problems.append("StartingPosition must be one of %s for %s "
+                            "event sources, got %s." % (
+                                ", ".join(positions), source_type,
+                                mapping.get("StartingPosition")))
+
+    record_age = _literal_int(mapping.get("MaximumRecordAgeInSeconds", -1),
+                              -1)
+    if is_stream and 0 <= record_age < 60:
+        problems.append("MaximumRecordAgeInSeconds must be -1 or at least "
+                        "60, got %d." % record_age)
+    return problems
+
+
 def stream_reader_statements(stream_arn):
     """Returns statements to allow Lambda to read from a stream.
 
@@ -99,12 +269,43 @@ def stream_reader_statements(stream_arn):
     ]
 
 
+def queue_reader_statements(queue_arn):
+    """Returns statements to allow Lambda to read from an SQS queue.
+
+    Arg:
+        queue_arn (str): An sqs queue arn.
+
+    Returns:
+        list: A list of statements.
+    """
+    return [
+        Statement(
+            Effect=Allow,
+            Resource=[queue_arn],
+            Action=[
+                awacs.sqs.ReceiveMessage,
+                awacs.sqs.DeleteMessage,
+                awacs.sqs.GetQueueAttributes,
+            ]
+        ),
+    ]
+
+
+def event_source_reader_statements(event_source_arn):
+    """Returns statements to allow Lambda to read from an event source."""
+    if get_event_source_type(event_source_arn) == "sqs":
+        return queue_reader_statements(event_source_arn)
+    return stream_reader_statements(event_source_arn)
+
+
 class Function(Blueprint):
     VARIABLES = {
         "Code": {
             "type": awslambda.Code,
             "description": "The troposphere.awslambda.Code object "
-                           "returned by the aws lambda hook.",
+                           "returned by the aws lambda hook, or by the "
+                           "stacker_blueprints.lambda_package."
+                           "upload_packages hook.",
         },
         "DeadLetterArn": {
             "type": str,
@@ -196,6 +397,51 @@ class Function(Blueprint):
             "description": "An optional event source mapping config.",
             "default": {},
         },
+        "EventSourceThroughput": {
+            "type": dict,
+            "description": "Throughput settings for the EventSourceMapping, "
+                           "checked against the limits of its type of event "
+                           "source (kinesis, dynamodb or sqs). Keys: "
+                           "batch-size, batching-window (seconds), "
+                           "parallelization-factor, bisect-on-error, "
+                           "starting-position, max-retry-attempts and "
+                           "max-record-age (seconds). They override the "
+                           "same settings in EventSourceMapping.",
+            "default": {},
+        },
+        "IteratorAgeAlarm": {
+            "type": dict,
+            "description": "Adds a CloudWatch alarm on the IteratorAge of "
+                           "the function, for kinesis and dynamodb event "
+                           "sources. Keys: threshold (milliseconds, "
+                           "required), period (seconds, default: 60), "
+                           "evaluation-periods (default: 5), alarm-actions "
+                           "and ok-actions (lists of Arns).",
+            "default": {},
+        },
+        "ReservedConcurrentExecutions": {
+            "type": int,
+            "description": "The number of concurrent executions reserved "
+                           "for the function. Default: -1 (unreserved)",
+            "default": -1,
+        },
+        "ProvisionedConcurrency": {
+            "type": dict,
+            "description": "Provisioned concurrency for the alias, which "
+                           "requires AliasName and a published "
+                           "AliasVersion. Keys: min (the provisioned "
+                           "concurrency), max (when above min, adds target "
+                           "tracking scaling on "
+                           "ProvisionedConcurrencyUtilization), target "
+                           "(default: 0.7), scale-in-cooldown, "
+                           "scale-out-cooldown (default: 60) and schedules "
+                           "(a list of dicts with name, schedule, and min "
+                           "and/or max, plus optional start-time and "
+                           "end-time, for known traffic peaks). Schedules "
+                           "going outside of min and max need an end, the "
+                           "schedule of an action restoring them.",
+            "default": {},
+        },
     }
 
     def code(self):
@@ -227,6 +473,19 @@ class Function(Blueprint):
     def layer_arns(self):
         return self.get_variables()["LayerArns"] or NoValue
 
+    def provisioned_concurrency_config(self):
+        variables = self.get_variables()
+        config = variables["ProvisionedConcurrency"]
+        if "min" not in config:
+            raise ValueError("ProvisionedConcurrency needs a min, the "
+                             "provisioned concurrency of the alias.")
+        if variables["AliasVersion"] in ("", "$LATEST"):
+            raise ValueError("ProvisionedConcurrency can't be used with an "
+                             "alias of $LATEST, please set AliasVersion.")
+        return awslambda.ProvisionedConcurrencyConfiguration(
+            ProvisionedConcurrentExecutions=config["min"]
+        )
+
     def add_policy_statements(self, statements):
         """Adds statements to the policy.
 
@@ -269,21 +528,8 @@ class Function(Blueprint):
         return statements
 
     def create_policy(self):
-        t = self.template
-
-        self.policy = t.add_resource(
-            iam.PolicyType(
-                "Policy",
-                PolicyName=Sub("${AWS::StackName}-policy"),
-                PolicyDocument=Policy(
-                    Statement=self.generate_policy_statements()
-                ),
-                Roles=[self.role.Ref()],
-            )
-        )
-
-        t.add_output(
-            Output("PolicyName", Value=Ref(self.policy))
+        self.policy = add_role_policies(
+            self.template, self.role, self.generate_policy_statements()
         )
 
     def create_role(self):
@@ -340,6 +586,13 @@ class Function(Blueprint):
             )
         )
 
+        # Only set when used, so that templates of functions without
+        # concurrency settings don't change.
+        if variables["ReservedConcurrentExecutions"] >= 0:
+            self.function.ReservedConcurrentExecutions = (
+                variables["ReservedConcurrentExecutions"]
+            )
+
         t.add_output(
             Output("FunctionName", Value=self.function.Ref())
         )
@@ -374,13 +627,103 @@ class Function(Blueprint):
                 )
             )
 
+            if variables["ProvisionedConcurrency"]:
+                self.alias.ProvisionedConcurrencyConfig = (
+                    self.provisioned_concurrency_config()
+                )
+
             t.add_output(Output("AliasArn", Value=self.alias.Ref()))
 
+    def create_concurrency_scaling(self):
+        """Scale the provisioned concurrency of the alias, if configured.
+
+        Ref: https://docs.aws.amazon.com/lambda/latest/dg/configuration-concurrency.html#managing-provisioned-concurency  # noqa
+        """
+        t = self.template
+        variables = self.get_variables()
+        if not variables["AliasName"]:
+            raise ValueError("ProvisionedConcurrency requires an AliasName.")
+
+        config = variables["ProvisionedConcurrency"]
+        minimum = config["min"]
+        maximum = config.get("max", minimum)
+        schedules = restore_schedules(config.get("schedules", []), minimum,
+                                      maximum)
+        if maximum <= minimum and not schedules:
+            return
+
+        self.scalable_target = t.add_resource(
+            aas.ScalableTarget(
+                "ProvisionedConcurrencyScalableTarget",
+                DependsOn=self.alias,
+                MinCapacity=minimum,
+                MaxCapacity=maximum,
+                ResourceId=Join(":", [
+                    "function", self.function.Ref(), self.alias.Name,
+                ]),
+                RoleARN=Sub(LAMBDA_AUTOSCALING_ROLE),
+                ScalableDimension="lambda:function:ProvisionedConcurrency",
+                ServiceNamespace="lambda",
+                ScheduledActions=scheduled_actions(schedules) or NoValue,
+            )
+        )
+
+        if maximum > minimum:
+            t.add_resource(
+                aas.ScalingPolicy(
+                    "ProvisionedConcurrencyScalingPolicy",
+                    PolicyName=Sub(
+                        "${AWS::StackName}-provisioned-concurrency"
+                    ),
+                    PolicyType="TargetTrackingScaling",
+                    ScalingTargetId=self.scalable_target.Ref(),
+                    TargetTrackingScalingPolicyConfiguration=(
+                        target_tracking_configuration(
+                            config,
+                            "LambdaProvisionedConcurrencyUtilization",
+                            default_target=0.7,
+                        )
+                    ),
+                )
+            )
+
+    def event_source_mapping(self):
+        """Returns the EventSourceMapping properties, with the
+        EventSourceThroughput settings applied.
+
+        Raises:
+            ValueError: If any of the settings is outside of the limits of
+                the event source.
+        """
+        variables = self.get_variables()
+        mapping = dict(variables["EventSourceMapping"])
+        for key, value in variables["EventSourceThroughput"].items():
+            try:
+                mapping[THROUGHPUT_PROPERTIES[key]] = value
+            except KeyError:
+                raise ValueError(
+                    "Unknown EventSourceThroughput setting %s, valid "
+                    "settings are: %s" % (
+                        key, ", ".join(sorted(THROUGHPUT_PROPERTIES)))
+                )
+
+        # A StartingPosition given in the EventSourceMapping itself is passed
+        # through as it is, only the EventSourceThroughput one is checked.
+        source_type = get_event_source_type(mapping["EventSourceArn"])
+        problems = validate_event_source_mapping(
+            mapping, source_type,
+            "starting-position" in variables["EventSourceThroughput"],
+        )
+        if problems:
+            raise ValueError("Invalid EventSourceMapping:\n  %s" % (
+                "\n  ".join(problems)))
+        return mapping
+
     def create_event_source_mapping(self):
         t = self.template
         variables = self.get_variables()
-        mapping = variables["EventSourceMapping"]
-        if mapping:
+        if variables["EventSourceMapping"]:
+            mapping = self.event_source_mapping()
             if "FunctionName" in mapping:
                 logger.warn(
                     Sub("FunctionName defined in EventSourceMapping in "
@@ -395,7 +738,7 @@ class Function(Blueprint):
 
             if not variables["Role"]:
                 self.add_policy_statements(
-                    stream_reader_statements(
+                    event_source_reader_statements(
                         mapping["EventSourceArn"]
                     )
                 )
@@ -404,6 +747,47 @@ class Function(Blueprint):
                 Output("EventSourceMappingId", Value=resource.Ref())
             )
 
+            if variables["IteratorAgeAlarm"]:
+                self.create_iterator_age_alarm(mapping["EventSourceArn"])
+
+    def create_iterator_age_alarm(self, event_source_arn):
+        """Alarms when the function falls behind on its stream.
+
+        Ref: https://docs.aws.amazon.com/lambda/latest/dg/monitoring-metrics.html  # noqa
+        """
+        t = self.template
+        config = self.get_variables()["IteratorAgeAlarm"]
+        if get_event_source_type(event_source_arn) not in STARTING_POSITIONS:
+            raise ValueError("IteratorAgeAlarm is only supported for kinesis "
+                             "and dynamodb event sources.")
+
+        alarm = t.add_resource(
+            cloudwatch.Alarm(
+                "IteratorAgeAlarm",
+                AlarmDescription=Sub(
+                    "${AWS::StackName} is falling behind on its stream."
+                ),
+                Namespace="AWS/Lambda",
+                MetricName="IteratorAge",
+                Dimensions=[
+                    cloudwatch.MetricDimension(
+                        Name="FunctionName",
+                        Value=self.function.Ref(),
+                    ),
+                ],
+                Statistic="Maximum",
+                Unit="Milliseconds",
+                Period=config.get("period", 60),
+                EvaluationPeriods=config.get("evaluation-periods", 5),
+                Threshold=config["threshold"],
+                ComparisonOperator="GreaterThanThreshold",
+                TreatMissingData="notBreaching",
+                AlarmActions=config.get("alarm-actions", NoValue),
+                OKActions=config.get("ok-actions", NoValue),
+            )
+        )
+        t.add_output(Output("IteratorAgeAlarmName", Value=alarm.Ref()))
+
     def create_template(self):
         variables = self.get_variables()
         self._policy_statements = []
@@ -416,6 +800,8 @@ class Function(Blueprint):
         if not role_arn:
             self.create_role()
         self.create_function()
+        if variables["ProvisionedConcurrency"]:
+            self.create_concurrency_scaling()
         self.create_event_source_mapping()
         # We don't use self.role_arn here because it is set internally if a
         # role is created
@@ -423,12 +809,262 @@ class Function(Blueprint):
             self.create_policy()
 
 
+class Functions(Blueprint):
+    """Creates many lambda functions, sharing a single execution role.
+
+    Every function gets a Version, and an Alias pointing at it when
+    AliasName is given. The logical id of a Version ends with a hash of the
+    properties of its function, so that a new version is published, and the
+    alias moved to it, whenever the code or configuration changes. Unless
+    an external Role is passed in, all the functions run as one Role, with
+    one policy allowing each of them to write to its log group.
+
+    Example::
+
+      - name: functions
+        class_path: stacker_blueprints.aws_lambda.Functions
+        variables:
+          AliasName: live
+          Functions:
+            Resize:
+              Code:
+                S3Bucket: my-bucket
+                S3Key: resize.zip
+              Handler: resize.handler
+              Runtime: python3.8
+            Thumbnail:
+              Code:
+                S3Bucket: my-bucket
+                S3Key: thumbnail.zip
+              Handler: thumbnail.handler
+              MemorySize: 512
+              Runtime: python3.8
+
+    A template is limited to 500 resources and 200 outputs, which is about
+    100 functions with aliases. Larger sets of functions need to be split
+    across several stacks, which can share a role through the Role variable.
+    """
+    VARIABLES = {
+        "Functions": {
+            "type": TroposphereType(awslambda.Function, many=True,
+                                    validate=False),
+            "description": "A dictionary of AWS::Lambda::Function "
+                           "properties, keyed by the logical name of each "
+                           "function. Role defaults to the shared role.",
+        },
+        "AliasName": {
+            "type": str,
+            "description": "The name of an alias to create for every "
+                           "function, pointing at its latest version.",
+            "default": "",
+        },
+        "Role": {
+            "type": str,
+            "description": "Arn of the Role to create the functions as - if "
+                           "not specified, a role shared by all the "
+                           "functions will be created with the basic "
+                           "permissions necessary for Lambda to run.",
+            "default": "",
+        },
+    }
+
+    def check_limits(self, functions):
+        """Raise a ValueError if the functions don't fit in one template."""
+        variables = self.get_variables()
+        # Function, Version and Alias, each but the Version with an output
+        per_function = 3 if variables["AliasName"] else 2
+        resources = len(functions) * per_function
+        outputs = len(functions) * (per_function - 1)
+        if not variables["Role"]:
+            # The shared Role with RoleName and RoleArn outputs, and its
+            # policies with an output each
+            statements = self.generate_policy_statements()
+            policies = 1
+            if policy_size(statements) > INLINE_POLICY_MAX_BYTES:
+                policies = len(
+                    split_statements(compact_statements(statements)))
+            resources += 1 + policies
+            outputs += 2 + policies
+        if resources > CLOUDFORMATION_LIMITS["resources"]:
+            raise ValueError(
+                "%d functions need %d resources, more than the %d allowed "
+                "in a template. Please split them across stacks." % (
+                    len(functions), resources,
+                    CLOUDFORMATION_LIMITS["resources"])
+            )
+        if outputs > CLOUDFORMATION_LIMITS["outputs"]:
+            raise ValueError(
+                "%d functions need %d outputs, more than the %d allowed "
+                "in a template. Please split them across stacks." % (
+                    len(functions), outputs,
+                    CLOUDFORMATION_LIMITS["outputs"])
+            )
+
+    def generate_policy_statements(self):
+        """Statements allowing every function to write to its log group.
+
+        A single statement, with one wildcard resource per function covering
+        both its log group and log streams, keeps the policy small. With
+        too many functions for an inline policy it is split across managed
+        policies by `add_role_policies`.
+        """
+        return [
+            Statement(
+                Effect=Allow,
+                Resource=[
+                    Join("", [
+                        "arn:aws:logs:", Region, ":", AccountId,
+                        ":log-group:/aws/lambda/", function.Ref(), "*",
+                    ])
+                    for function in self.functions
+                ],
+                Action=[
+                    awacs.logs.CreateLogGroup,
+                    awacs.logs.CreateLogStream,
+                    awacs.logs.PutLogEvents,
+                ]
+            )
+        ]
+
+    def create_role(self):
+        t = self.template
+
+        self.role = t.add_resource(
+            iam.Role(
+                "Role",
+                AssumeRolePolicyDocument=get_lambda_assumerole_policy()
+            )
+        )
+
+        if any(getattr(f, "VpcConfig", None) for f in self.functions):
+            self.role.Policies = [
+                iam.Policy(
+                    PolicyName=Sub("${AWS::StackName}-vpc-policy"),
+                    PolicyDocument=Policy(
+                        Statement=lambda_vpc_execution_statements()
+                    ),
+                )
+            ]
+
+        t.add_output(Output("RoleName", Value=Ref(self.role)))
+        self.role_arn = self.role.GetAtt("Arn")
+        t.add_output(Output("RoleArn", Value=self.role_arn))
+
+    def create_policy(self):
+        add_role_policies(
+            self.template, self.role, self.generate_policy_statements()
+        )
+
+    def create_function(self, function):
+        t = self.template
+        alias_name = self.get_variables()["AliasName"]
+        title = function.title
+
+        if not getattr(function, "Role", None):
+            function.Role = self.role_arn
+        t.add_resource(function)
+        t.add_output(
+            Output("%sArn" % title, Value=function.GetAtt("Arn"))
+        )
+
+        # Versions are only published when created, a new logical id per
+        # change of the function publishes a new one.
+        digest = hashlib.md5(json.dumps(
+            encode_to_dict(function.properties), sort_keys=True
+        ).encode("utf-8")).hexdigest()
+        version = t.add_resource(
+            awslambda.Version(
+                "%sVersion%s" % (title, digest[:8]),
+                FunctionName=function.Ref(),
+            )
+        )
+
+        if alias_name:
+            alias = t.add_resource(
+                awslambda.Alias(
+                    "%sAlias" % title,
+                    Name=alias_name,
+                    FunctionName=function.Ref(),
+                    FunctionVersion=version.GetAtt("Version"),
+                )
+            )
+            t.add_output(Output("%sAliasArn" % title, Value=alias.Ref()))
+
+    def create_template(self):
+        variables = self.get_variables()
+        self.functions = sorted(variables["Functions"],
+                                key=lambda function: function.title)
+        if not self.functions:
+            raise ValueError("Functions can't be empty.")
+        self.check_limits(self.functions)
+
+        self.role_arn = variables["Role"]
+        if not self.role_arn:
+            self.create_role()
+        for function in self.functions:
+            self.create_function(function)
+        if not variables["Role"]:
+            self.create_policy()
+
+
+# An events rule can invoke at most 5 targets.
+# reference: https://docs.aws.amazon.com/eventbridge/latest/userguide/eb-quota.html  # noqa
+RULE_MAX_TARGETS = 5
+
+WARM_UP_SCHEDULE = "rate(5 minutes)"
+
+
+def warm_up_targets(config):
+    """Return the (id, arn, concurrency) of each function to warm up.
+
+    Functions listed more than once are warmed up once, under their first
+    id, with the highest concurrency asked for.
+    """
+    default_concurrency = config.get("concurrency", 1)
+    by_arn = {}
+    for target_id in sorted(config.get("functions", {})):
+        target = config["functions"][target_id]
+        if not isinstance(target, dict):
+            target = {"arn": target}
+        concurrency = target.get("concurrency", default_concurrency)
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise ValueError("WarmUp concurrency of %s must be a positive "
+                             "integer, got %r." % (target_id, concurrency))
+        arn = target["arn"]
+        if arn in by_arn:
+            first_id, _, previous = by_arn[arn]
+            by_arn[arn] = (first_id, arn, max(previous, concurrency))
+        else:
+            by_arn[arn] = (target_id, arn, concurrency)
+    return sorted(by_arn.values())
+
+
 class FunctionScheduler(Blueprint):
+    """Invokes lambda functions on a schedule.
+
+    Either from a CloudwatchEventsRule, or in warm up mode from rate based
+    rules sending each function a payload asking it to keep `concurrency`
+    instances warm. The function is expected to fan out to that many
+    concurrent invocations of itself when it receives the payload.
+    """
 
     VARIABLES = {
         "CloudwatchEventsRule": {
-            "type": TroposphereType(events.Rule),
+            "type": TroposphereType(events.Rule, optional=True),
             "description": "The troposphere.events.Rule object params.",
+            "default": None,
+        },
+        "WarmUp": {
+            "type": dict,
+            "description": "Keeps functions warm. Keys: functions (a dict "
+                           "of target id to function arn, or to a dict "
+                           "with arn and concurrency), schedule (default: "
+                           "%s), concurrency (the number of instances to "
+                           "keep warm, default: 1) and payload (a dict "
+                           "added to the {\"warmer\": true, "
+                           "\"concurrency\": n} input of each target)." % (
+                               WARM_UP_SCHEDULE),
+            "default": {},
         },
     }
 
@@ -458,5 +1094,58 @@ class FunctionScheduler(Blueprint):
                 )
             )
 
+    def create_warm_up(self):
+        t = self.template
+        config = self.get_variables()["WarmUp"]
+        targets = warm_up_targets(config)
+        if not targets:
+            raise ValueError("WarmUp needs at least one function.")
+
+        for i in range(0, len(targets), RULE_MAX_TARGETS):
+            number = i // RULE_MAX_TARGETS + 1
+            title = "WarmUpRule%d" % number if number > 1 else "WarmUpRule"
+            rule_targets = []
+            for target_id, arn, concurrency in targets[
+                    i:i + RULE_MAX_TARGETS]:
+                payload = dict(config.get("payload", {}))
+                payload.update({"warmer": True, "concurrency": concurrency})
+                rule_targets.append(
+                    events.Target(
+                        Id=target_id,
+                        Arn=arn,
+                        Input=json.dumps(payload, sort_keys=True),
+                    )
+                )
+            rule = t.add_resource(
+                events.Rule(
+                    title,
+                    Description="Keeps lambda functions warm.",
+                    ScheduleExpression=config.get(
+                        "schedule", WARM_UP_SCHEDULE),
+                    State="ENABLED",
+                    Targets=rule_targets,
+                )
+            )
+
+            # Every function is a target of a single rule, so needs a
+            # single permission.
+            for target in rule_targets:
+                t.add_resource(
+                    awslambda.Permission(
+                        "WarmUpPermFor{}".format(cf_safe_name(target.Id)),
+                        Principal="events.amazonaws.com",
+                        Action="lambda:InvokeFunction",
+                        FunctionName=target.Arn,
+                        SourceArn=rule.GetAtt("Arn")
+                    )
+                )
+
     def create_template(self):
-        self.create_scheduler()
+        variables = self.get_variables()
+        if not (variables["CloudwatchEventsRule"] or variables["WarmUp"]):
+            raise ValueError("Either CloudwatchEventsRule or WarmUp must be "
+                             "given.")
+        if variables["CloudwatchEventsRule"]:
+            self.create_scheduler()
+        if variables["WarmUp"]:
+            self.create_warm_up()
@@ -1,22 +1,52 @@
+from hashlib import md5
+import logging
+
 from stacker.blueprints.base import Blueprint
 from stacker.blueprints.variables.types import TroposphereType
+from stacker.util import cf_safe_name
 
 from troposphere import (
     iam,
     applicationautoscaling as aas,
+    cloudformation,
+    dax,
     dynamodb,
+    ec2,
     Ref,
     GetAtt,
     Output,
     Sub,
 )
+from troposphere.validators import integer
 
+from .application_autoscaling import (
+    pre_warm_schedules,
+    restore_schedules,
+    scheduled_actions,
+)
 from .policies import (
+    add_role_policies,
+    dax_dynamodb_policy,
     dynamodb_autoscaling_policy,
+    dynamodb_table_arns,
+    make_simple_assume_policy,
 )
+from .util import CLOUDFORMATION_LIMITS, jump_consistent_hash
 
 from awacs.helpers.trust import get_application_autoscaling_assumerole_policy
 
+logger = logging.getLogger(__name__)
+
+# A DAX cluster has a primary node and up to 10 read replicas.
+DAX_MAX_NODES = 11
+# The port of unencrypted DAX cluster endpoints.
+DAX_PORT = 8111
+
+
+# The troposphere version we depend on types ReplicationFactor as a string.
+class DAXClusterResource(dax.Cluster):
+    props = dict(dax.Cluster.props, ReplicationFactor=(integer, True))
+
 
 def snake_to_camel_case(name):
     """
@@ -29,6 +59,29 @@ def snake_to_camel_case(name):
     return "".join(word.capitalize() for word in name.split("_"))
 
 
+def shard_autoscaling_configs(configs, shards):
+    """Split AutoScalingConfigs into shards.
+
+    Configs are assigned by the md5 of their table, so a table stays in the
+    same shard as long as the number of shards doesn't change, and when it
+    grows only the tables landing in the new shards move.
+
+    Args:
+        configs (list): AutoScalingConfigs of the AutoScaling blueprint.
+        shards (int): The number of shards.
+
+    Returns:
+        list: A list of lists of configs, one per shard.
+    """
+    if shards < 1:
+        raise ValueError("The number of shards must be at least 1.")
+    result = [[] for _ in range(shards)]
+    for config in configs:
+        key = int(md5(config["table"].encode("utf-8")).hexdigest()[:16], 16)
+        result[jump_consistent_hash(key, shards)].append(config)
+    return result
+
+
 class DynamoDB(Blueprint):
     """Manages the creation of DynamoDB tables.
 
@@ -116,17 +169,220 @@ class AutoScaling(Blueprint):
                 max: 50
                 scale-in-cooldown: 180
                 scale-out-cooldown: 180
+                schedules:
+                  - name: nightly-batch
+                    schedule: cron(0 2 * * ? *)
+                    end: cron(0 4 * * ? *)
+                    min: 40
+                    max: 200
+                pre-warm:
+                  - name: morning
+                    start: "08:00"
+                    end: "10:00"
+                    days: MON-FRI
+                    min: 40
               write:
                 max: 25
+
+    Each read or write config can also have schedules, scheduled actions
+    with a name, a schedule (at(), rate() or cron() in UTC) and a min
+    and/or max, and pre-warm, peaks ahead of which the min capacity is
+    raised (see
+    :func:`stacker_blueprints.application_autoscaling.pre_warm_schedules`).
+    A scheduled action sets the capacity range until another one changes
+    it: schedules going outside of the min and max of the config need an
+    end, a schedule restoring them (see
+    :func:`stacker_blueprints.application_autoscaling.restore_schedules`).
+
+    Indexes are scaled for the capacity types they list, read and/or
+    write, with the config of their table updated with the fields they set,
+    so an empty dict scales them like the table. An index of "*" applies
+    to every global secondary index of the table not listed on its own, and
+    scales both the capacity types of the table unless one is set to false.
+    It requires the Tables of the DynamoDB blueprint, usually shared with a
+    yaml anchor::
+
+      Tables: *tables
+      AutoScalingConfigs:
+        - table: prod-user-table
+          read:
+            min: 5
+            max: 100
+          indexes:
+            - index: "*"
+            - index: by-email
+              read:
+                max: 2000
+
+    Fleets of tables too large for a single template are split across
+    stacks sharing the same AutoScalingConfigs, each scaling the tables of
+    its Shard (see :func:`shard_autoscaling_configs`). Shards don't depend
+    on each other, so they are deployed in parallel, and share the role of
+    an :class:`AutoScalingRole` stack through RoleArn. Shards is set by
+    hand, as a blueprint can't add stacks: a shard too large for a template
+    raises a ValueError naming the number of Shards needed::
+
+      - name: dynamodb-autoscaling-role
+        class_path: stacker_blueprints.dynamodb.AutoScalingRole
+        variables:
+          AutoScalingConfigs: *configs
+      - name: dynamodb-autoscaling-0
+        class_path: stacker_blueprints.dynamodb.AutoScaling
+        variables:
+          AutoScalingConfigs: *configs
+          RoleArn: ${output dynamodb-autoscaling-role::RoleArn}
+          Shard: 0
+          Shards: 2
+      - name: dynamodb-autoscaling-1
+        ...
+
+    Changing Shards moves tables between shards, and a table can only be
+    registered by one stack at a time, so resharding is done in two
+    phases rather than in a single parallel deploy, where a stack could
+    deregister a table after the stack it moved to registered it. When
+    growing, tables only move to the new shards: first update the existing
+    shard stacks with the new Shards, deregistering the tables that move,
+    then create the new shard stacks. When shrinking, first delete the
+    shard stacks being removed, then update the others. Tables keep their
+    provisioned capacity, but aren't scaled, between the two phases.
+
+    Tables are spread across shards by hash, so a small fleet can leave a
+    shard without tables. Such a shard still renders a valid template, with
+    only the role, or a placeholder resource when RoleArn is set.
     """
     VARIABLES = {
         "AutoScalingConfigs": {
             "type": list,
             "description": "A list of dicts, each of which represent "
                            "a DynamoDB AutoScaling Configuration.",
-        }
+        },
+        "Tables": {
+            "type": TroposphereType(dynamodb.Table, many=True,
+                                    optional=True),
+            "description": "The Tables of the DynamoDB blueprint, to find "
+                           "the global secondary indexes of a table when "
+                           "its indexes include \"*\".",
+            "default": None,
+        },
+        "RoleArn": {
+            "type": str,
+            "description": "The role used to scale the tables, see "
+                           "AutoScalingRole. A role is created when not "
+                           "set.",
+            "default": "",
+        },
+        "Shard": {
+            "type": int,
+            "description": "The shard of the AutoScalingConfigs to scale, "
+                           "from 0 to Shards - 1.",
+            "default": 0,
+        },
+        "Shards": {
+            "type": int,
+            "description": "The number of stacks the AutoScalingConfigs are "
+                           "split across.",
+            "default": 1,
+        },
     }
 
+    def global_secondary_indexes(self, table_name):
+        """Return the names of the global secondary indexes of a table of
+        the Tables variable."""
+        for table in self.get_variables()["Tables"] or []:
+            if getattr(table, "TableName", table.title) == table_name:
+                return sorted(
+                    index.IndexName for index in
+                    getattr(table, "GlobalSecondaryIndexes", [])
+                )
+        raise ValueError("Table %s isn't in Tables, its indexes can't be "
+                         "found." % table_name)
+
+    def index_configs(self, table_asc):
+        """Return the (index name, config) of each index of a table config,
+        with "*" expanded to every global secondary index."""
+        configs = table_asc.get("indexes", [])
+        listed = [c["index"] for c in configs if c["index"] != "*"]
+        if len(set(listed)) != len(listed):
+            raise ValueError("Indexes of table %s are listed more than "
+                             "once." % table_asc["table"])
+
+        result = []
+        for config in configs:
+            if config["index"] != "*":
+                result.append((config["index"], config))
+                continue
+            for index in self.global_secondary_indexes(table_asc["table"]):
+                if index not in listed:
+                    result.append((index, config))
+        return result
+
+    @staticmethod
+    def inherited_config(table_asc, index_asc, capacity_type):
+        """The config of an index capacity type: the table config, updated
+        with the fields set on the index, or None if it isn't scaled.
+
+        Listed indexes only scale the capacity types they set, "*" scales
+        those of the table too."""
+        if index_asc["index"] == "*":
+            override = index_asc.get(capacity_type, {})
+            if capacity_type not in table_asc and not override:
+                return None
+        else:
+            override = index_asc.get(capacity_type)
+        if override is None or override is False:
+            return None
+        config = dict(table_asc.get(capacity_type, {}))
+        config.update(override)
+        return config
+
+    def scalable_target_count(self, table_asc):
+        """The number of scalable targets of a table config, each with a
+        scaling policy."""
+        count = len([t for t in ("read", "write") if t in table_asc])
+        for _, index_asc in self.index_configs(table_asc):
+            count += len([
+                t for t in ("read", "write")
+                if self.inherited_config(table_asc, index_asc, t) is not None
+            ])
+        return count
+
+    def template_resources(self, configs):
+        """The number of resources of a template scaling configs."""
+        resources = 2 * sum(self.scalable_target_count(c) for c in configs)
+        if not self.get_variables()["RoleArn"]:
+            resources += 1
+        return resources
+
+    def shard_configs(self):
+        """The AutoScalingConfigs of this shard, checked to fit in a
+        template."""
+        variables = self.get_variables()
+        configs = variables["AutoScalingConfigs"]
+        shard, shards = variables["Shard"], variables["Shards"]
+        if not 0 <= shard < shards:
+            raise ValueError("Shard must be between 0 and %d, got %d." %
+                             (shards - 1, shard))
+        shard_configs = shard_autoscaling_configs(configs, shards)[shard]
+        if not shard_configs:
+            logger.warning("Shard %d of the AutoScalingConfigs has no "
+                           "tables, consider using fewer Shards.", shard)
+
+        limit = CLOUDFORMATION_LIMITS["resources"]
+        resources = self.template_resources(shard_configs)
+        if resources > limit:
+            needed = shards
+            while needed < len(configs) and any(
+                self.template_resources(s) > limit
+                for s in shard_autoscaling_configs(configs, needed)
+            ):
+                needed += 1
+            raise ValueError(
+                "Shard %d of the AutoScalingConfigs needs %d resources, more "
+                "than the %d allowed in a template. Please split them "
+                "across %d Shards." % (shard, resources, limit, needed)
+            )
+        return shard_configs
+
     # reference: https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/aws-resource-dynamodb-table.html#cfn-dynamodb-table-examples-application-autoscaling # noqa
     def create_scaling_iam_role(self):
         assumerole_policy = get_application_autoscaling_assumerole_policy()
@@ -165,6 +421,32 @@ class AutoScaling(Blueprint):
 
         return name
 
+    def scalable_target_schedules(self, table, asc, capacity_type, index=""):
+        """The schedules and pre-warm schedules of a scalable target, named
+        after the target so that they are unique across the stack."""
+        minimum = asc.get("min", 1)
+        maximum = asc.get("max", 1000)
+        for peak in asc.get("pre-warm", []):
+            if not minimum <= peak["min"] <= maximum:
+                raise ValueError(
+                    "The pre-warm min of peak %s (%d) must be between the "
+                    "min (%d) and max (%d) of %s." % (
+                        peak["name"], peak["min"], minimum, maximum,
+                        self.scalable_resource_name(
+                            "", table, capacity_type, index))
+                )
+
+        schedules = restore_schedules(asc.get("schedules", []), minimum,
+                                      maximum)
+        schedules.extend(pre_warm_schedules(asc.get("pre-warm", []), minimum))
+        return [
+            dict(schedule, name=self.scalable_resource_name(
+                snake_to_camel_case(schedule["name"]), table, capacity_type,
+                index
+            ))
+            for schedule in schedules
+        ]
+
     def create_scalable_target_and_scaling_policy(self, table, asc, capacity_type="read", index=""): # noqa
         capacity_type = capacity_type.title()
         if capacity_type not in ("Read", "Write"):
@@ -194,6 +476,12 @@ class AutoScaling(Blueprint):
             )
         )
 
+        schedules = self.scalable_target_schedules(
+            table, asc, capacity_type, index
+        )
+        if schedules:
+            scalable_target.ScheduledActions = scheduled_actions(schedules)
+
         # https://docs.aws.amazon.com/autoscaling/application/APIReference/API_PredefinedMetricSpecification.html # noqa
         predefined_metric_spec = aas.PredefinedMetricSpecification(
             PredefinedMetricType="DynamoDB{}CapacityUtilization".format(
@@ -227,10 +515,19 @@ class AutoScaling(Blueprint):
 
     def create_template(self):
         variables = self.get_variables()
-        self.auto_scaling_configs = variables["AutoScalingConfigs"]
+        self.auto_scaling_configs = self.shard_configs()
         self.tables = [config["table"] for config in self.auto_scaling_configs]
-        self.iam_role = self.create_scaling_iam_role()
-        self.iam_role_arn = GetAtt(self.iam_role, "Arn")
+        if variables["RoleArn"]:
+            self.iam_role = None
+            self.iam_role_arn = variables["RoleArn"]
+        else:
+            self.iam_role = self.create_scaling_iam_role()
+            self.iam_role_arn = GetAtt(self.iam_role, "Arn")
+        if not self.auto_scaling_configs and self.iam_role is None:
+            # A template needs at least one resource.
+            self.template.add_resource(
+                cloudformation.WaitConditionHandle("Placeholder")
+            )
         self.scalable_targets = {}
 
         for table_asc in self.auto_scaling_configs:
@@ -250,21 +547,269 @@ class AutoScaling(Blueprint):
                 )
                 self.scalable_targets[table_name]["write"] = st
 
-            self.scalable_targets[table_name]["indexes"] = {}
+            index_targets = self.scalable_targets[table_name]["indexes"] = {}
+
+            for index, index_asc in self.index_configs(table_asc):
+                index_targets[index] = {}
+                for capacity_type in ("read", "write"):
+                    asc = self.inherited_config(
+                        table_asc, index_asc, capacity_type
+                    )
+                    if asc is None:
+                        continue
+                    index_targets[index][capacity_type] = (
+                        self.create_scalable_target_and_scaling_policy(
+                            table_name, asc, capacity_type, index
+                        )
+                    )
 
-            for index_asc in table_asc.get("indexes", []):
 
-                index = index_asc["index"]
-                self.scalable_targets[table_name]["indexes"][index] = {}
+class AutoScalingRole(Blueprint):
+    """Manages the role of the AutoScaling of DynamoDB tables, shared by the
+    shards of AutoScaling stacks.
+
+    Its policy covers every table of AutoScalingConfigs and their indexes,
+    in the region and account of the stack, and is split across managed
+    policies when it grows too large for an inline policy.
+    """
+
+    VARIABLES = {
+        "AutoScalingConfigs": {
+            "type": list,
+            "description": "The AutoScalingConfigs of the AutoScaling "
+                           "stacks using the role.",
+        },
+    }
+
+    def create_template(self):
+        t = self.template
+        tables = sorted(set(
+            config["table"]
+            for config in self.get_variables()["AutoScalingConfigs"]
+        ))
+        role = t.add_resource(
+            iam.Role(
+                "Role",
+                AssumeRolePolicyDocument=(
+                    get_application_autoscaling_assumerole_policy()
+                ),
+            )
+        )
+        policy = dynamodb_autoscaling_policy(
+            tables, resources=dynamodb_table_arns(tables)
+        )
+        add_role_policies(t, role, policy.Statement)
+        t.add_output(Output("RoleName", Value=Ref(role)))
+        t.add_output(Output("RoleArn", Value=GetAtt(role, "Arn")))
 
-                if "read" in index_asc:
-                    st = self.create_scalable_target_and_scaling_policy(
-                        table_name, table_asc["read"], "read", index
-                    )
-                    self.scalable_targets[table_name]["indexes"][index]["read"] = st # noqa
 
-                if "write" in index_asc:
-                    st = self.create_scalable_target_and_scaling_policy(
-                        table_name, table_asc["write"], "write", index
+class DAXCluster(Blueprint):
+    """Manages a DAX cluster caching the reads of DynamoDB tables.
+
+    The cluster gets its own subnet group, parameter group, security group
+    and an IAM role allowing it to read and write through to Tables only.
+    ItemTTL and QueryTTL are how long, in milliseconds, items and query
+    results are cached.
+
+    Example::
+
+      - name: users-cache
+        class_path: stacker_blueprints.dynamodb.DAXCluster
+        variables:
+          Tables:
+            - prod-user-table
+          VpcId: vpc-123456
+          Subnets:
+            - subnet-123456
+            - subnet-654321
+          AllowedSecurityGroups:
+            - sg-123456
+          NodeType: dax.r5.large
+          Nodes: 3
+          ItemTTL: 60000
+    """
+
+    VARIABLES = {
+        "Tables": {
+            "type": list,
+            "description": "The names of the DynamoDB tables the cluster "
+                           "caches.",
+        },
+        "VpcId": {
+            "type": str,
+            "description": "The VPC to create the cluster in.",
+        },
+        "Subnets": {
+            "type": list,
+            "description": "The subnets to create the nodes in.",
+        },
+        "AllowedSecurityGroups": {
+            "type": list,
+            "description": "The security groups allowed to connect to the "
+                           "cluster.",
+            "default": [],
+        },
+        "ClusterName": {
+            "type": str,
+            "description": "The name of the cluster, generated if empty.",
+            "default": "",
+        },
+        "NodeType": {
+            "type": str,
+            "description": "The node type of the cluster.",
+            "default": "dax.r5.large",
+        },
+        "Nodes": {
+            "type": int,
+            "description": "The number of nodes of the cluster. Use at "
+                           "least 3, spread across availability zones, for "
+                           "production clusters.",
+            "default": 3,
+        },
+        "ItemTTL": {
+            "type": int,
+            "description": "How long items are cached, in milliseconds.",
+            "default": 300000,
+        },
+        "QueryTTL": {
+            "type": int,
+            "description": "How long query and scan results are cached, in "
+                           "milliseconds.",
+            "default": 300000,
+        },
+        "SSEEnabled": {
+            "type": bool,
+            "description": "Whether to encrypt the cluster at rest.",
+            "default": True,
+        },
+        "PreferredMaintenanceWindow": {
+            "type": str,
+            "description": "The weekly maintenance window, in "
+                           "ddd:hh24:mi-ddd:hh24:mi format in UTC.",
+            "default": "",
+        },
+        "NotificationTopicArn": {
+            "type": str,
+            "description": "The SNS topic to publish cluster events to.",
+            "default": "",
+        },
+    }
+
+    def validate_variables(self):
+        variables = self.get_variables()
+        if not variables["Tables"]:
+            raise ValueError("A DAX cluster needs at least one table.")
+        if not 1 <= variables["Nodes"] <= DAX_MAX_NODES:
+            raise ValueError("A DAX cluster has between 1 and %d nodes, "
+                             "got %d." % (DAX_MAX_NODES, variables["Nodes"]))
+        for name in ("ItemTTL", "QueryTTL"):
+            if variables[name] < 0:
+                raise ValueError("%s can't be negative." % name)
+
+    def create_subnet_group(self):
+        return self.template.add_resource(
+            dax.SubnetGroup(
+                "SubnetGroup",
+                Description="%s subnet group." % self.name,
+                SubnetIds=self.get_variables()["Subnets"],
+            )
+        )
+
+    def create_parameter_group(self):
+        variables = self.get_variables()
+        return self.template.add_resource(
+            dax.ParameterGroup(
+                "ParameterGroup",
+                Description="%s parameter group." % self.name,
+                ParameterNameValues={
+                    "record-ttl-millis": str(variables["ItemTTL"]),
+                    "query-ttl-millis": str(variables["QueryTTL"]),
+                },
+            )
+        )
+
+    def create_security_group(self):
+        t = self.template
+        variables = self.get_variables()
+        sg = t.add_resource(
+            ec2.SecurityGroup(
+                "SecurityGroup",
+                GroupDescription="%s security group" % self.name,
+                VpcId=variables["VpcId"],
+            )
+        )
+        # Titled after the group, so that removing a group leaves the rules
+        # of the others alone.
+        for group in sorted(set(variables["AllowedSecurityGroups"])):
+            t.add_resource(
+                ec2.SecurityGroupIngress(
+                    "%sIngress" % cf_safe_name(group),
+                    GroupId=Ref(sg),
+                    IpProtocol="tcp",
+                    FromPort=DAX_PORT,
+                    ToPort=DAX_PORT,
+                    SourceSecurityGroupId=group,
+                )
+            )
+        t.add_output(Output("SecurityGroup", Value=Ref(sg)))
+        return sg
+
+    def create_role(self):
+        t = self.template
+        role = t.add_resource(
+            iam.Role(
+                "Role",
+                AssumeRolePolicyDocument=make_simple_assume_policy(
+                    "dax.amazonaws.com"
+                ),
+                Policies=[
+                    iam.Policy(
+                        PolicyName=Sub("${AWS::StackName}-dax"),
+                        PolicyDocument=dax_dynamodb_policy(
+                            self.get_variables()["Tables"]
+                        ),
                     )
-                    self.scalable_targets[table_name]["indexes"][index]["write"] = st # noqa
+                ],
+            )
+        )
+        t.add_output(Output("RoleArn", Value=GetAtt(role, "Arn")))
+        return role
+
+    def create_cluster(self, subnet_group, parameter_group, security_group,
+                       role):
+        t = self.template
+        variables = self.get_variables()
+        cluster = DAXClusterResource(
+            "Cluster",
+            IAMRoleARN=GetAtt(role, "Arn"),
+            NodeType=variables["NodeType"],
+            ParameterGroupName=Ref(parameter_group),
+            ReplicationFactor=variables["Nodes"],
+            SecurityGroupIds=[Ref(security_group)],
+            SSESpecification=dax.SSESpecification(
+                SSEEnabled=variables["SSEEnabled"],
+            ),
+            SubnetGroupName=Ref(subnet_group),
+        )
+        for name, prop in (("ClusterName", "ClusterName"),
+                           ("PreferredMaintenanceWindow",
+                            "PreferredMaintenanceWindow"),
+                           ("NotificationTopicArn", "NotificationTopicARN")):
+            if variables[name]:
+                setattr(cluster, prop, variables[name])
+        t.add_resource(cluster)
+
+        t.add_output(Output("ClusterName", Value=Ref(cluster)))
+        t.add_output(Output("ClusterArn", Value=GetAtt(cluster, "Arn")))
+        t.add_output(Output("ClusterDiscoveryEndpoint",
+                            Value=GetAtt(cluster, "ClusterDiscoveryEndpoint")))
+        return cluster
+
+    def create_template(self):
+        self.validate_variables()
+        self.create_cluster(
+            self.create_subnet_group(),
+            self.create_parameter_group(),
+            self.create_security_group(),
+            self.create_role(),
+        )
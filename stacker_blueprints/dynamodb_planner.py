@@ -0,0 +1,259 @@
+"""Choose between on-demand and provisioned capacity for DynamoDB tables.
+
+`plan_tables` takes the expected request rates of tables, as hourly series,
+and prices both billing modes for each table::
+
+    plans = plan_tables([
+        {"table": "prod-user-table",
+         "reads": [120, 80, 60, ...],
+         "writes": [15, 10, 5, ...]},
+    ])
+
+A plan holds the recommended billing mode, the monthly cost of both modes
+and, for provisioned tables, the min, max and target of the autoscaling of
+reads and writes. `tables_variable` and `autoscaling_configs_variable` turn
+plans into the variables of :class:`stacker_blueprints.dynamodb.DynamoDB`
+and :class:`stacker_blueprints.dynamodb.AutoScaling`.
+
+Provisioned capacity is modelled the way target tracking behaves: each
+hour the capacity is the rate divided by the target utilization, bounded by
+the min and max, and it only scales in an hour after the rate drops. Hours
+where the rate climbs above the capacity of the hour before are counted as
+burst hours, where requests may be throttled until the table scales out.
+
+Series are plain lists of the average request units per second over each
+hour, and are meant to repeat: a day (24 values) or a week (168 values).
+"""
+from __future__ import division
+
+import math
+
+# https://aws.amazon.com/dynamodb/pricing/ (us-east-1)
+PRICES = {
+    "read-request-unit": 0.125 / 1e6,
+    "write-request-unit": 0.625 / 1e6,
+    "read-capacity-unit-hour": 0.00013,
+    "write-capacity-unit-hour": 0.00065,
+}
+
+HOURS_PER_MONTH = 730
+
+CAPACITY_TYPES = ("read", "write")
+
+PAY_PER_REQUEST = "PAY_PER_REQUEST"
+PROVISIONED = "PROVISIONED"
+
+DEFAULT_TARGET = 70.0
+# The target utilizations DynamoDB target tracking accepts.
+MIN_TARGET = 20.0
+MAX_TARGET = 90.0
+DEFAULT_HEADROOM = 1.5
+DEFAULT_MARGIN = 0.1
+
+
+def _series(profile, capacity_type):
+    series = profile.get(capacity_type + "s")
+    if not series:
+        raise ValueError("Table %s has no %ss series." %
+                         (profile["table"], capacity_type))
+    if any(rate < 0 for rate in series):
+        raise ValueError("Table %s has negative %s rates." %
+                         (profile["table"], capacity_type))
+    return series
+
+
+def on_demand_cost(series, price):
+    """Return the monthly cost of a rate series billed per request."""
+    return sum(series) * 3600 * price * HOURS_PER_MONTH / len(series)
+
+
+def scaling_settings(series, target=DEFAULT_TARGET,
+                     headroom=DEFAULT_HEADROOM):
+    """Return the min, max and target of the autoscaling of a rate series.
+
+    The min covers the quietest hour and the max the busiest one, times
+    headroom, at the target utilization (a percentage, from 20 to 90).
+    """
+    if not MIN_TARGET <= target <= MAX_TARGET:
+        raise ValueError("The target utilization must be between %d and %d, "
+                         "got %s." % (MIN_TARGET, MAX_TARGET, target))
+    ratio = 100.0 / target
+    return {
+        "min": max(1, int(math.ceil(min(series) * ratio))),
+        "max": max(1, int(math.ceil(max(series) * ratio * headroom))),
+        "target": float(target),
+    }
+
+
+def provisioned_capacity(series, settings):
+    """Return the capacity provisioned each hour of a rate series."""
+    ratio = 100.0 / settings["target"]
+    needed = [rate * ratio for rate in series]
+    # The capacity of an hour can't drop below that of the hour before, as
+    # target tracking only scales in once the rate stayed low for a while.
+    # Series repeat, so the first hour follows the last one.
+    return [
+        min(settings["max"], max(settings["min"], int(math.ceil(max(a, b)))))
+        for a, b in zip(needed, needed[-1:] + needed[:-1])
+    ]
+
+
+def burst_hours(series, capacity):
+    """Return the number of hours whose rate is above the capacity of the
+    hour before, or above the max."""
+    return sum(
+        1 for rate, current, previous in
+        zip(series, capacity, capacity[-1:] + capacity[:-1])
+        if rate > min(current, previous)
+    )
+
+
+def plan_table(profile, prices=None, target=DEFAULT_TARGET,
+               headroom=DEFAULT_HEADROOM, margin=DEFAULT_MARGIN):
+    """Return the plan of a table.
+
+    Args:
+        profile (dict): The table (its TableName), and its reads and writes
+            series.
+        prices (dict): Overrides of PRICES.
+        target (float): The target utilization of provisioned capacity, a
+            percentage from 20 to 90.
+        headroom (float): How far above the busiest hour the max capacity
+            is.
+        margin (float): How much cheaper provisioned capacity must be to be
+            recommended, as it's an estimate and needs to be managed.
+
+    Returns:
+        dict: The table, billing-mode, the monthly on-demand-cost and
+            provisioned-cost, and read and write dicts with the min, max
+            and target of their autoscaling and their burst-hours.
+    """
+    prices = dict(PRICES, **(prices or {}))
+    series = dict(
+        (capacity_type, _series(profile, capacity_type))
+        for capacity_type in CAPACITY_TYPES
+    )
+    if len(series["read"]) != len(series["write"]):
+        raise ValueError("The reads and writes series of table %s don't "
+                         "have the same length." % profile["table"])
+
+    plan = {"table": profile["table"], "on-demand-cost": 0.0,
+            "provisioned-cost": 0.0}
+    for capacity_type in CAPACITY_TYPES:
+        rates = series[capacity_type]
+        settings = scaling_settings(rates, target, headroom)
+        capacity = provisioned_capacity(rates, settings)
+        settings["burst-hours"] = burst_hours(rates, capacity)
+        plan[capacity_type] = settings
+
+        plan["on-demand-cost"] += on_demand_cost(
+            rates, prices[capacity_type + "-request-unit"]
+        )
+        plan["provisioned-cost"] += (
+            sum(capacity) * prices[capacity_type + "-capacity-unit-hour"] *
+            HOURS_PER_MONTH / len(capacity)
+        )
+
+    if plan["provisioned-cost"] * (1 + margin) < plan["on-demand-cost"]:
+        plan["billing-mode"] = PROVISIONED
+    else:
+        plan["billing-mode"] = PAY_PER_REQUEST
+    return plan
+
+
+def plan_tables(profiles, **kwargs):
+    """Return the plan of each table, see `plan_table` for the arguments.
+    """
+    plans = [plan_table(profile, **kwargs) for profile in profiles]
+    names = [plan["table"] for plan in plans]
+    if len(set(names)) != len(names):
+        raise ValueError("Tables can only be planned once.")
+    return plans
+
+
+def _table_name(title, properties):
+    return properties.get("TableName", title)
+
+
+def tables_variable(plans, tables):
+    """Return the Tables variable of the DynamoDB blueprint, with the billing
+    mode and capacity of each planned table.
+
+    Provisioned tables and their global secondary indexes start at the min
+    capacity of their plan, leaving the rest to autoscaling.
+
+    Args:
+        plans (list): The plans of `plan_tables`.
+        tables (dict): The Tables variable to update, the properties of each
+            table keyed by title. Tables are matched by TableName, or title
+            when they have none.
+    """
+    by_name = dict((plan["table"], plan) for plan in plans)
+    result = {}
+    for title, properties in tables.items():
+        properties = dict(properties)
+        plan = by_name.pop(_table_name(title, properties), None)
+        if plan:
+            throughput = None
+            if plan["billing-mode"] == PROVISIONED:
+                throughput = {
+                    "ReadCapacityUnits": plan["read"]["min"],
+                    "WriteCapacityUnits": plan["write"]["min"],
+                }
+            properties["BillingMode"] = plan["billing-mode"]
+            _set_throughput(properties, throughput)
+            if "GlobalSecondaryIndexes" in properties:
+                properties["GlobalSecondaryIndexes"] = [
+                    _set_throughput(dict(index), throughput)
+                    for index in properties["GlobalSecondaryIndexes"]
+                ]
+        result[title] = properties
+
+    if by_name:
+        raise ValueError("Planned tables %s aren't in tables." %
+                         ", ".join(sorted(by_name)))
+    return result
+
+
+def _set_throughput(properties, throughput):
+    if throughput is None:
+        properties.pop("ProvisionedThroughput", None)
+    else:
+        properties["ProvisionedThroughput"] = dict(throughput)
+    return properties
+
+
+def autoscaling_configs_variable(plans, tables=None):
+    """Return the AutoScalingConfigs variable of the AutoScaling blueprint,
+    scaling the provisioned tables of plans.
+
+    Args:
+        plans (list): The plans of `plan_tables`.
+        tables (dict): The Tables variable of the DynamoDB blueprint. When
+            given, the global secondary indexes of each table are scaled
+            with the config of their table.
+    """
+    indexes = {}
+    for title, properties in (tables or {}).items():
+        indexes[_table_name(title, properties)] = sorted(
+            index["IndexName"]
+            for index in properties.get("GlobalSecondaryIndexes", [])
+        )
+
+    configs = []
+    for plan in plans:
+        if plan["billing-mode"] != PROVISIONED:
+            continue
+        config = {"table": plan["table"]}
+        for capacity_type in CAPACITY_TYPES:
+            config[capacity_type] = dict(
+                (key, plan[capacity_type][key])
+                for key in ("min", "max", "target")
+            )
+        if indexes.get(plan["table"]):
+            config["indexes"] = [
+                {"index": index, "read": {}, "write": {}}
+                for index in indexes[plan["table"]]
+            ]
+        configs.append(config)
+    return configs
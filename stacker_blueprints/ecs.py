@@ -1,32 +1,546 @@
-from awacs.helpers.trust import get_ecs_task_assumerole_policy
+from awacs.helpers.trust import (
+    get_application_autoscaling_assumerole_policy,
+    get_default_assumerole_policy,
+    get_ecs_task_assumerole_policy,
+)
 
 from troposphere import (
+    applicationautoscaling as aas,
+    autoscaling,
+    ec2,
     ecs,
     iam,
 )
 
 from troposphere import (
+    AWSObject,
+    AWSProperty,
+    Base64,
+    Join,
     NoValue,
     Output,
     Region,
     Sub,
 )
+from troposphere.validators import boolean, integer
 
 from stacker.blueprints.base import Blueprint
 from stacker.blueprints.variables.types import TroposphereType
+from stacker.util import cf_safe_name
+
+from .application_autoscaling import (
+    restore_schedules,
+    scheduled_actions,
+    step_scaling_alarm,
+    step_scaling_configuration,
+    target_tracking_configuration,
+)
+from .policies import (
+    ecs_service_autoscaling_policy,
+    ecs_task_execution_policy,
+)
+from .util import STRING_TYPES, memoized_property
+
+# The AutoScaling keys of the target tracking policies of services, with the
+# title prefix of their policy, their metric and default target.
+SERVICE_SCALING_METRICS = (
+    ("cpu", "CPU", "ECSServiceAverageCPUUtilization", 75.0),
+    ("memory", "Memory", "ECSServiceAverageMemoryUtilization", 75.0),
+    ("requests", "RequestCount", "ALBRequestCountPerTarget", None),
+)
+
 
-from .policies import ecs_task_execution_policy
+FARGATE_CAPACITY_PROVIDERS = ("FARGATE", "FARGATE_SPOT")
+
+# A service can have at most 5 placement strategies.
+MAX_PLACEMENT_STRATEGIES = 5
+
+BINPACK_FIELDS = ("cpu", "memory")
+SPREAD_FIELDS = ("instanceId", "host")
+
+AVAILABILITY_ZONE_SPREAD = {
+    "Type": "spread", "Field": "attribute:ecs.availability-zone"
+}
+INSTANCE_SPREAD = {"Type": "spread", "Field": "instanceId"}
+
+# Commonly used PlacementStrategies, by name.
+# reference: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-placement-strategies.html  # noqa
+PLACEMENT_STRATEGY_PRESETS = {
+    # Balanced across zones, then packed on as few instances as possible,
+    # to get the most out of their memory.
+    "az-binpack-memory": [
+        AVAILABILITY_ZONE_SPREAD,
+        {"Type": "binpack", "Field": "memory"},
+    ],
+    "az-binpack-cpu": [
+        AVAILABILITY_ZONE_SPREAD,
+        {"Type": "binpack", "Field": "cpu"},
+    ],
+    # Balanced across zones, then across the instances of each zone.
+    "az-spread-instances": [AVAILABILITY_ZONE_SPREAD, INSTANCE_SPREAD],
+    "binpack-memory": [{"Type": "binpack", "Field": "memory"}],
+    "binpack-cpu": [{"Type": "binpack", "Field": "cpu"}],
+    "spread-instances": [INSTANCE_SPREAD],
+    "random": [{"Type": "random"}],
+}
+
+
+def validate_placement_strategies(strategies):
+    """Raise a ValueError if placement strategies are invalid.
+
+    Ref: https://docs.aws.amazon.com/AmazonECS/latest/APIReference/API_PlacementStrategy.html  # noqa
+    """
+    if len(strategies) > MAX_PLACEMENT_STRATEGIES:
+        raise ValueError("A service can have at most %d placement "
+                         "strategies, got %d." % (MAX_PLACEMENT_STRATEGIES,
+                                                  len(strategies)))
+    for strategy in strategies:
+        field = getattr(strategy, "Field", None)
+        if strategy.Type == "random":
+            valid = field is None
+        elif strategy.Type == "binpack":
+            valid = field in BINPACK_FIELDS
+        else:
+            valid = field in SPREAD_FIELDS or (
+                field is not None and field.startswith("attribute:")
+            )
+        if not valid:
+            raise ValueError("Invalid Field %r for a %s placement "
+                             "strategy." % (field, strategy.Type))
+
+
+def validate_capacity_provider_strategy(strategy):
+    """Raise a ValueError if a capacity provider strategy is invalid.
+
+    Ref: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/cluster-capacity-providers.html  # noqa
+    """
+    names = [item.CapacityProvider for item in strategy]
+    if len(set(names)) != len(names):
+        raise ValueError("Capacity providers can only be used once in a "
+                         "strategy, got %s." % ", ".join(names))
+    with_base = [
+        item.CapacityProvider for item in strategy
+        if getattr(item, "Base", 0)
+    ]
+    if len(with_base) > 1:
+        raise ValueError("Only one capacity provider of a strategy can have "
+                         "a Base, got %s." % ", ".join(with_base))
 
 
 class Cluster(Blueprint):
+    """An ECS cluster, with optional capacity providers.
+
+    Capacity providers are associated with the cluster through a separate
+    resource, so that providers backed by autoscaling groups of the
+    cluster can be created in the same template. Example::
+
+      CapacityProviders:
+        - FARGATE
+        - FARGATE_SPOT
+      DefaultCapacityProviderStrategy:
+        - CapacityProvider: FARGATE
+          Base: 1
+          Weight: 1
+        - CapacityProvider: FARGATE_SPOT
+          Weight: 3
+    """
+
+    VARIABLES = {
+        "CapacityProviders": {
+            "type": list,
+            "description": "The names of the capacity providers of the "
+                           "cluster, such as FARGATE and FARGATE_SPOT.",
+            "default": [],
+        },
+        "AutoScalingGroupProviders": {
+            "type": TroposphereType(ecs.CapacityProvider, many=True,
+                                    optional=True),
+            "description": "Capacity providers backed by autoscaling "
+                           "groups, created and added to the capacity "
+                           "providers of the cluster. Strategies can refer "
+                           "to them by title.",
+            "default": None,
+        },
+        "DefaultCapacityProviderStrategy": {
+            "type": TroposphereType(ecs.CapacityProviderStrategy, many=True,
+                                    optional=True),
+            "description": "The strategy of the services that don't set "
+                           "one. Required with capacity providers.",
+            "default": None,
+        },
+    }
+
+    def create_capacity_providers(self):
+        t = self.template
+        providers = sorted(
+            self.get_variables()["AutoScalingGroupProviders"] or [],
+            key=lambda provider: provider.title
+        )
+        self.capacity_providers = {}
+        for provider in providers:
+            t.add_resource(provider)
+            self.capacity_providers[provider.title] = provider
+            t.add_output(
+                Output(provider.title + "Name", Value=provider.Ref())
+            )
+
+    def default_capacity_provider_strategy(self):
+        return self.get_variables()["DefaultCapacityProviderStrategy"]
+
+    def create_capacity_provider_associations(self):
+        t = self.template
+        variables = self.get_variables()
+        names = list(variables["CapacityProviders"])
+        names.extend(sorted(self.capacity_providers))
+        strategy = self.default_capacity_provider_strategy()
+        if not names and not strategy:
+            return
+
+        if not strategy:
+            raise ValueError("DefaultCapacityProviderStrategy is required "
+                             "with capacity providers.")
+        validate_capacity_provider_strategy(strategy)
+        for item in strategy:
+            if item.CapacityProvider not in names:
+                raise ValueError("Capacity provider %s of the "
+                                 "DefaultCapacityProviderStrategy isn't a "
+                                 "capacity provider of the cluster." %
+                                 item.CapacityProvider)
+            provider = self.capacity_providers.get(item.CapacityProvider)
+            if provider:
+                item.CapacityProvider = provider.Ref()
+
+        t.add_resource(
+            ecs.ClusterCapacityProviderAssociations(
+                "CapacityProviderAssociations",
+                Cluster=self.cluster.Ref(),
+                CapacityProviders=[
+                    self.capacity_providers[name].Ref()
+                    if name in self.capacity_providers else name
+                    for name in names
+                ],
+                DefaultCapacityProviderStrategy=strategy,
+            )
+        )
+
     def create_template(self):
         t = self.template
 
-        cluster = t.add_resource(ecs.Cluster("Cluster"))
+        self.cluster = cluster = t.add_resource(ecs.Cluster("Cluster"))
 
         t.add_output(Output("ClusterId", Value=cluster.Ref()))
         t.add_output(Output("ClusterArn", Value=cluster.GetAtt("Arn")))
 
+        self.create_capacity_providers()
+        self.create_capacity_provider_associations()
+
+
+# The latest ECS optimized Amazon Linux 2 AMI.
+# reference: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/retrieve-ecs-optimized_AMI.html  # noqa
+ECS_OPTIMIZED_IMAGE_ID = (
+    "{{resolve:ssm:/aws/service/ecs/optimized-ami/amazon-linux-2/"
+    "recommended/image_id}}"
+)
+
+ECS_INSTANCE_ROLE_POLICY = (
+    "arn:aws:iam::aws:policy/service-role/"
+    "AmazonEC2ContainerServiceforEC2Role"
+)
+
+WARM_POOL_STATES = ("Hibernated", "Running", "Stopped")
+
+
+# Not in the troposphere version we depend on yet.
+class InstanceReusePolicy(AWSProperty):
+    props = {
+        "ReuseOnScaleIn": (boolean, False),
+    }
+
+
+class WarmPool(AWSObject):
+    resource_type = "AWS::AutoScaling::WarmPool"
+
+    props = {
+        "AutoScalingGroupName": (STRING_TYPES, True),
+        "InstanceReusePolicy": (InstanceReusePolicy, False),
+        "MaxGroupPreparedCapacity": (integer, False),
+        "MinSize": (integer, False),
+        "PoolState": (STRING_TYPES, False),
+    }
+
+
+class AutoScalingCluster(Cluster):
+    """An ECS cluster with its own EC2 instances.
+
+    The instances are in an autoscaling group, launched from a
+    LaunchTemplate, and the group is the default capacity provider of the
+    cluster. ECS managed scaling sizes the group for the tasks of the
+    cluster, and managed termination protection keeps it from terminating
+    instances running tasks when scaling in.
+
+    With a WarmPool, scaling out starts pre-initialized instances from the
+    pool instead of launching new ones, which takes seconds instead of
+    minutes. Example::
+
+      Subnets:
+        - subnet-1234
+        - subnet-5678
+      InstanceType: c5.xlarge
+      MaxSize: 50
+      ManagedScaling:
+        target-capacity: 90
+      WarmPool:
+        min-size: 2
+        state: Stopped
+    """
+
+    def defined_variables(self):
+        variables = super(AutoScalingCluster, self).defined_variables()
+        variables.update({
+            "Subnets": {
+                "type": list,
+                "description": "The subnets to launch the instances in.",
+            },
+            "SecurityGroups": {
+                "type": list,
+                "description": "The security group ids of the instances.",
+                "default": [],
+            },
+            "ImageId": {
+                "type": str,
+                "description": "The AMI of the instances. Defaults to the "
+                               "latest ECS optimized Amazon Linux 2 AMI.",
+                "default": ECS_OPTIMIZED_IMAGE_ID,
+            },
+            "InstanceType": {
+                "type": str,
+                "description": "The instance type of the instances.",
+                "default": "m5.large",
+            },
+            "KeyName": {
+                "type": str,
+                "description": "An optional ssh key pair for the instances.",
+                "default": "",
+            },
+            "InstanceProfileArn": {
+                "type": str,
+                "description": "An existing instance profile to use. By "
+                               "default one is created, with the "
+                               "AmazonEC2ContainerServiceforEC2Role "
+                               "policy.",
+                "default": "",
+            },
+            "MinSize": {
+                "type": int,
+                "description": "The minimum number of instances.",
+                "default": 0,
+            },
+            "MaxSize": {
+                "type": int,
+                "description": "The maximum number of instances.",
+            },
+            "ManagedScaling": {
+                "type": dict,
+                "description": "The managed scaling of the capacity "
+                               "provider. Keys: target-capacity (the "
+                               "percentage of the instances to use, "
+                               "default: 100), min-step and max-step (the "
+                               "number of instances added or removed at "
+                               "once, default: 1 and 10000).",
+                "default": {},
+            },
+            "ManagedTerminationProtection": {
+                "type": bool,
+                "description": "Whether to protect instances running tasks "
+                               "from being terminated when scaling in.",
+                "default": True,
+            },
+            "WarmPool": {
+                "type": dict,
+                "description": "An optional warm pool of pre-initialized "
+                               "instances. Keys: min-size (default: 0), "
+                               "max-prepared-capacity (default: MaxSize), "
+                               "state (one of %s, default: Stopped) and "
+                               "reuse-on-scale-in (default: false)." % (
+                                   ", ".join(WARM_POOL_STATES)),
+                "default": {},
+            },
+            "EcsAgentConfig": {
+                "type": dict,
+                "description": "Extra ECS agent settings, written to "
+                               "/etc/ecs/ecs.config.",
+                "default": {},
+            },
+        })
+        return variables
+
+    def validate_sizes(self):
+        variables = self.get_variables()
+        if variables["MinSize"] > variables["MaxSize"]:
+            raise ValueError("MinSize (%d) can't be more than MaxSize (%d)." %
+                             (variables["MinSize"], variables["MaxSize"]))
+        target = variables["ManagedScaling"].get("target-capacity", 100)
+        if not 0 < target <= 100:
+            raise ValueError("ManagedScaling target-capacity must be between "
+                             "1 and 100, got %s." % target)
+        state = variables["WarmPool"].get("state", "Stopped")
+        if state not in WARM_POOL_STATES:
+            raise ValueError("WarmPool state must be one of %s, got %s." % (
+                ", ".join(WARM_POOL_STATES), state))
+
+    def generate_user_data(self):
+        variables = self.get_variables()
+        config = dict(variables["EcsAgentConfig"])
+        if variables["WarmPool"]:
+            # Instances of the warm pool only register with the cluster
+            # once they leave the pool.
+            config["ECS_WARM_POOLS_CHECK"] = "true"
+        lines = ["#!/bin/bash", "cat >> /etc/ecs/ecs.config <<EOF",
+                 "ECS_CLUSTER=${Cluster}"]
+        lines.extend("%s=%s" % (k, config[k]) for k in sorted(config))
+        lines.extend(["EOF", ""])
+        return Base64(Sub("\n".join(lines)))
+
+    def create_instance_profile(self):
+        t = self.template
+        arn = self.get_variables()["InstanceProfileArn"]
+        if arn:
+            return arn
+
+        self.instance_role = t.add_resource(
+            iam.Role(
+                "InstanceRole",
+                AssumeRolePolicyDocument=get_default_assumerole_policy(),
+                ManagedPolicyArns=[ECS_INSTANCE_ROLE_POLICY],
+            )
+        )
+        t.add_output(
+            Output("InstanceRoleArn", Value=self.instance_role.GetAtt("Arn"))
+        )
+        profile = t.add_resource(
+            iam.InstanceProfile(
+                "InstanceProfile",
+                Roles=[self.instance_role.Ref()],
+            )
+        )
+        return profile.GetAtt("Arn")
+
+    def create_launch_template(self):
+        t = self.template
+        variables = self.get_variables()
+        data = ec2.LaunchTemplateData(
+            IamInstanceProfile=ec2.IamInstanceProfile(
+                Arn=self.create_instance_profile()
+            ),
+            ImageId=variables["ImageId"],
+            InstanceType=variables["InstanceType"],
+            UserData=self.generate_user_data(),
+        )
+        if variables["SecurityGroups"]:
+            data.SecurityGroupIds = variables["SecurityGroups"]
+        if variables["KeyName"]:
+            data.KeyName = variables["KeyName"]
+
+        self.launch_template = t.add_resource(
+            ec2.LaunchTemplate("LaunchTemplate", LaunchTemplateData=data)
+        )
+        t.add_output(
+            Output("LaunchTemplateId", Value=self.launch_template.Ref())
+        )
+
+    def create_autoscaling_group(self):
+        t = self.template
+        variables = self.get_variables()
+        self.autoscaling_group = t.add_resource(
+            autoscaling.AutoScalingGroup(
+                "AutoScalingGroup",
+                LaunchTemplate=autoscaling.LaunchTemplateSpecification(
+                    LaunchTemplateId=self.launch_template.Ref(),
+                    Version=self.launch_template.GetAtt(
+                        "LatestVersionNumber"
+                    ),
+                ),
+                MinSize=variables["MinSize"],
+                MaxSize=variables["MaxSize"],
+                # Managed termination protection requires new instances to
+                # be protected, ECS removes the protection of idle ones.
+                NewInstancesProtectedFromScaleIn=(
+                    variables["ManagedTerminationProtection"]
+                ),
+                VPCZoneIdentifier=variables["Subnets"],
+            )
+        )
+        t.add_output(
+            Output("AutoScalingGroup", Value=self.autoscaling_group.Ref())
+        )
+
+    def create_warm_pool(self):
+        t = self.template
+        variables = self.get_variables()
+        config = variables["WarmPool"]
+        if not config:
+            return
+
+        warm_pool = WarmPool(
+            "WarmPool",
+            AutoScalingGroupName=self.autoscaling_group.Ref(),
+            MinSize=config.get("min-size", 0),
+            PoolState=config.get("state", "Stopped"),
+        )
+        if "max-prepared-capacity" in config:
+            warm_pool.MaxGroupPreparedCapacity = (
+                config["max-prepared-capacity"]
+            )
+        if config.get("reuse-on-scale-in"):
+            warm_pool.InstanceReusePolicy = InstanceReusePolicy(
+                ReuseOnScaleIn=True
+            )
+        t.add_resource(warm_pool)
+
+    def create_capacity_providers(self):
+        super(AutoScalingCluster, self).create_capacity_providers()
+        t = self.template
+        variables = self.get_variables()
+        config = variables["ManagedScaling"]
+        protection = variables["ManagedTerminationProtection"]
+        provider = t.add_resource(
+            ecs.CapacityProvider(
+                "CapacityProvider",
+                AutoScalingGroupProvider=ecs.AutoScalingGroupProvider(
+                    AutoScalingGroupArn=self.autoscaling_group.Ref(),
+                    ManagedScaling=ecs.ManagedScaling(
+                        Status="ENABLED",
+                        TargetCapacity=config.get("target-capacity", 100),
+                        MinimumScalingStepSize=config.get("min-step", 1),
+                        MaximumScalingStepSize=config.get("max-step", 10000),
+                    ),
+                    ManagedTerminationProtection=(
+                        "ENABLED" if protection else "DISABLED"
+                    ),
+                ),
+            )
+        )
+        self.capacity_providers[provider.title] = provider
+        t.add_output(Output("CapacityProviderName", Value=provider.Ref()))
+
+    def default_capacity_provider_strategy(self):
+        strategy = super(
+            AutoScalingCluster, self
+        ).default_capacity_provider_strategy()
+        return strategy or [
+            ecs.CapacityProviderStrategy(
+                CapacityProvider="CapacityProvider",
+                Weight=1,
+            )
+        ]
+
+    def create_template(self):
+        self.validate_sizes()
+        self.create_launch_template()
+        self.create_autoscaling_group()
+        self.create_warm_pool()
+        super(AutoScalingCluster, self).create_template()
+
 
 class BaseECSTask(Blueprint):
     VARIABLES = {
@@ -130,7 +644,7 @@ class BaseECSTask(Blueprint):
     def task_definition_memory(self):
         return NoValue
 
-    @property
+    @memoized_property
     def environment(self):
         env_dict = self.get_variables()["Environment"]
         if not env_dict:
@@ -148,7 +662,7 @@ class BaseECSTask(Blueprint):
     def log_group_name(self):
         return self.task_name
 
-    @property
+    @memoized_property
     def log_configuration(self):
         log_config = self.get_variables()["LogConfiguration"]
         if not log_config:
@@ -174,7 +688,7 @@ class BaseECSTask(Blueprint):
     def container_port(self):
         return self.get_variables()["ContainerPort"]
 
-    @property
+    @memoized_property
     def host_port(self):
         host_port = self.get_variables()["HostPort"]
         if host_port and not self.container_port:
@@ -182,7 +696,7 @@ class BaseECSTask(Blueprint):
                              "HostPort")
         return host_port
 
-    @property
+    @memoized_property
     def container_protocol(self):
         container_protocol = self.get_variables()["ContainerProtocol"]
         if container_protocol and not self.container_port:
@@ -190,7 +704,7 @@ class BaseECSTask(Blueprint):
                              "ContainerProtocol")
         return container_protocol
 
-    @property
+    @memoized_property
     def container_port_mappings(self):
         mappings = NoValue
         if self.container_port:
@@ -377,7 +891,44 @@ class SimpleFargateTask(BaseECSTask):
 
 
 class BaseECSApp(BaseECSTask):
-    """ Combines an ECS Task with an ECS Service for a simple App. """
+    """ Combines an ECS Task with an ECS Service for a simple App.
+
+    The service can be scaled between a min and max number of tasks with
+    AutoScaling, for example::
+
+      AutoScaling:
+        min: 2
+        max: 20
+        cpu:
+          target: 60.0
+        requests:
+          target: 1000
+          resource-label: app/my-alb/1234/targetgroup/my-tg/5678
+        steps:
+          - name: queue-depth
+            namespace: AWS/SQS
+            metric: ApproximateNumberOfMessagesVisible
+            dimensions:
+              QueueName: my-queue
+            threshold: 100
+            steps:
+              - lower: 0
+                upper: 1000
+                adjustment: 2
+              - lower: 1000
+                adjustment: 5
+        schedules:
+          - name: nightly
+            schedule: cron(0 22 * * ? *)
+            end: cron(0 6 * * ? *)
+            min: 1
+            max: 4
+
+    Scheduled actions set the range of the number of tasks until another
+    one changes it, so schedules going outside of min and max need an end,
+    the schedule of an action restoring them (see
+    :func:`stacker_blueprints.application_autoscaling.restore_schedules`).
+    """
     def defined_variables(self):
         variables = super(BaseECSApp, self).defined_variables()
 
@@ -416,6 +967,25 @@ class BaseECSApp(BaseECSTask):
                                "objects.",
                 "default": None,
             },
+            "PlacementStrategies": {
+                "type": TroposphereType(
+                    ecs.PlacementStrategy,
+                    optional=True,
+                    many=True,
+                ),
+                "description": "An optional list of PlacementStrategy "
+                               "objects. Only used by tasks on EC2 "
+                               "instances.",
+                "default": None,
+            },
+            "PlacementStrategyPreset": {
+                "type": str,
+                "description": "The name of a preset to use as the "
+                               "PlacementStrategies, one of: %s." % (
+                                   ", ".join(
+                                       sorted(PLACEMENT_STRATEGY_PRESETS))),
+                "default": "",
+            },
             "LoadBalancerTargetGroupArns": {
                 "type": list,
                 "description": "A list of load balancer target group arns "
@@ -430,6 +1000,36 @@ class BaseECSApp(BaseECSTask):
                                "starts up.",
                 "default": 0,
             },
+            "CapacityProviderStrategy": {
+                "type": TroposphereType(
+                    ecs.CapacityProviderStrategyItem,
+                    optional=True,
+                    many=True,
+                ),
+                "description": "An optional list of "
+                               "CapacityProviderStrategyItem objects, "
+                               "spreading the tasks across the capacity "
+                               "providers of the cluster. Replaces the "
+                               "LaunchType when set.",
+                "default": None,
+            },
+            "AutoScaling": {
+                "type": dict,
+                "description": "Scales the number of tasks of the service, "
+                               "starting from Count. Keys: max, min "
+                               "(default: Count), cpu and memory (target "
+                               "tracking of the average utilization, with "
+                               "target (default: 75.0), scale-in-cooldown, "
+                               "scale-out-cooldown and disable-scale-in), "
+                               "requests (target tracking of "
+                               "ALBRequestCountPerTarget, with the same "
+                               "keys plus a resource-label, and a required "
+                               "target), steps (step scaling policies on "
+                               "any metric) and schedules (scheduled "
+                               "actions, which need an end when they go "
+                               "outside of min and max).",
+                "default": {},
+            },
         }
 
         variables.update(extra_vars)
@@ -455,7 +1055,30 @@ class BaseECSApp(BaseECSTask):
     def placement_constraints(self):
         return self.get_variables()["PlacementConstraints"] or NoValue
 
-    @property
+    @memoized_property
+    def placement_strategies(self):
+        variables = self.get_variables()
+        strategies = variables["PlacementStrategies"]
+        preset = variables["PlacementStrategyPreset"]
+        if preset:
+            if strategies:
+                raise ValueError("Can't specify both PlacementStrategies "
+                                 "and PlacementStrategyPreset")
+            if preset not in PLACEMENT_STRATEGY_PRESETS:
+                raise ValueError("Unknown PlacementStrategyPreset %s, "
+                                 "valid presets: %s" % (
+                                     preset, ", ".join(
+                                         sorted(PLACEMENT_STRATEGY_PRESETS))))
+            strategies = [
+                ecs.PlacementStrategy(**strategy)
+                for strategy in PLACEMENT_STRATEGY_PRESETS[preset]
+            ]
+        if not strategies:
+            return NoValue
+        validate_placement_strategies(strategies)
+        return strategies
+
+    @memoized_property
     def load_balancer_target_group_arns(self):
         arns = self.get_variables()["LoadBalancerTargetGroupArns"]
         if arns and not self.container_port:
@@ -475,18 +1098,43 @@ class BaseECSApp(BaseECSTask):
             )
         return load_balancers or NoValue
 
-    @property
+    @memoized_property
+    def load_balancers(self):
+        return self.generate_load_balancers()
+
+    @memoized_property
     def health_check_grace_period_seconds(self):
         grace_period = self.get_variables()["HealthCheckGracePeriodSeconds"]
-        if grace_period and self.generate_load_balancers() is NoValue:
+        if grace_period and self.load_balancers is NoValue:
             raise ValueError("Cannot specify HealthCheckGracePeriodSeconds "
                              "without specifying LoadBalancers")
         return grace_period or NoValue
 
+    def validate_capacity_provider_strategy(self, strategy):
+        validate_capacity_provider_strategy(strategy)
+
+    @memoized_property
+    def capacity_provider_strategy(self):
+        strategy = self.get_variables()["CapacityProviderStrategy"]
+        if not strategy:
+            return NoValue
+        self.validate_capacity_provider_strategy(strategy)
+        return strategy
+
     @property
     def launch_type(self):
         return "EC2"
 
+    @property
+    def runs_on_fargate(self):
+        strategy = self.capacity_provider_strategy
+        if strategy is NoValue:
+            return self.launch_type == "FARGATE"
+        return all(
+            item.CapacityProvider in FARGATE_CAPACITY_PROVIDERS
+            for item in strategy
+        )
+
     @property
     def network_configuration(self):
         return NoValue
@@ -504,12 +1152,27 @@ class BaseECSApp(BaseECSTask):
             "DesiredCount": self.count,
             "HealthCheckGracePeriodSeconds": grace_period,
             "LaunchType": self.launch_type,
-            "LoadBalancers": self.generate_load_balancers(),
+            "LoadBalancers": self.load_balancers,
             "NetworkConfiguration": self.network_configuration,
             "PlacementConstraints": self.placement_constraints,
             "TaskDefinition": self.task_definition.Ref(),
         }
 
+        # A service can't have both a launch type and a capacity provider
+        # strategy.
+        if self.capacity_provider_strategy is not NoValue:
+            config["CapacityProviderStrategy"] = (
+                self.capacity_provider_strategy
+            )
+            del config["LaunchType"]
+
+        if self.placement_strategies is not NoValue:
+            # Fargate places tasks itself.
+            if self.runs_on_fargate:
+                raise ValueError("Placement strategies can't be used by "
+                                 "services running on Fargate.")
+            config["PlacementStrategies"] = self.placement_strategies
+
         return config
 
     def create_service(self):
@@ -521,9 +1184,117 @@ class BaseECSApp(BaseECSTask):
         self.add_output("ServiceArn", self.service.Ref())
         self.add_output("ServiceName", self.service.GetAtt("Name"))
 
+    @property
+    def autoscaling(self):
+        return self.get_variables()["AutoScaling"]
+
+    @property
+    def cluster_name(self):
+        # Cluster can be an arn, ending in cluster/<name>
+        return self.cluster.split(":cluster/")[-1]
+
+    def create_scaling_role(self):
+        t = self.template
+        assumerole_policy = get_application_autoscaling_assumerole_policy()
+        self.scaling_role = t.add_resource(
+            iam.Role(
+                "ScalingRole",
+                AssumeRolePolicyDocument=assumerole_policy,
+                Policies=[
+                    iam.Policy(
+                        PolicyName=Sub("${AWS::StackName}-ecs-autoscaling"),
+                        PolicyDocument=ecs_service_autoscaling_policy(),
+                    )
+                ],
+            )
+        )
+
+    def create_scaling_policies(self, config):
+        t = self.template
+        for key, name, metric_type, default_target in SERVICE_SCALING_METRICS:
+            if key not in config:
+                continue
+            metric_config = config[key]
+            resource_label = metric_config.get("resource-label")
+            if metric_type == "ALBRequestCountPerTarget":
+                if not resource_label or "target" not in metric_config:
+                    raise ValueError("AutoScaling %s needs a target and a "
+                                     "resource-label." % key)
+            t.add_resource(
+                aas.ScalingPolicy(
+                    name + "ScalingPolicy",
+                    PolicyName=Sub("${AWS::StackName}-%s" % key),
+                    PolicyType="TargetTrackingScaling",
+                    ScalingTargetId=self.scalable_target.Ref(),
+                    TargetTrackingScalingPolicyConfiguration=(
+                        target_tracking_configuration(
+                            metric_config, metric_type, default_target,
+                            resource_label,
+                        )
+                    ),
+                )
+            )
+
+        for step in config.get("steps", []):
+            title = cf_safe_name(step["name"])
+            policy = t.add_resource(
+                aas.ScalingPolicy(
+                    title + "ScalingPolicy",
+                    PolicyName=Sub("${AWS::StackName}-%s" % step["name"]),
+                    PolicyType="StepScaling",
+                    ScalingTargetId=self.scalable_target.Ref(),
+                    StepScalingPolicyConfiguration=(
+                        step_scaling_configuration(step)
+                    ),
+                )
+            )
+            t.add_resource(step_scaling_alarm(title + "Alarm", step, policy))
+
+    def create_autoscaling(self):
+        """Scale the DesiredCount of the service, if configured.
+
+        Ref: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/service-auto-scaling.html  # noqa
+        """
+        config = self.autoscaling
+        if not config:
+            return
+
+        minimum = config.get("min", self.count)
+        maximum = config.get("max")
+        if maximum is None:
+            raise ValueError("AutoScaling needs a max.")
+        if maximum < minimum:
+            raise ValueError("AutoScaling max (%d) can't be less than its min "
+                             "(%d)." % (maximum, minimum))
+        if not minimum <= self.count <= maximum:
+            raise ValueError("Count must be between the AutoScaling min "
+                             "(%d) and max (%d)." % (minimum, maximum))
+
+        t = self.template
+        self.create_scaling_role()
+        self.scalable_target = t.add_resource(
+            aas.ScalableTarget(
+                "ScalableTarget",
+                MinCapacity=minimum,
+                MaxCapacity=maximum,
+                ResourceId=Join("/", [
+                    "service", self.cluster_name, self.service.GetAtt("Name"),
+                ]),
+                RoleARN=self.scaling_role.GetAtt("Arn"),
+                ScalableDimension="ecs:service:DesiredCount",
+                ServiceNamespace="ecs",
+                ScheduledActions=scheduled_actions(restore_schedules(
+                    config.get("schedules", []), minimum, maximum
+                )) or NoValue,
+            )
+        )
+        self.create_scaling_policies(config)
+        self.add_output("ScalableTargetId", self.scalable_target.Ref())
+
     def create_template(self):
         super(BaseECSApp, self).create_template()
         self.create_service()
+        self.create_autoscaling()
 
 
 class SimpleFargateApp(BaseECSApp, SimpleFargateTask):
@@ -557,6 +1328,17 @@ class SimpleFargateApp(BaseECSApp, SimpleFargateTask):
     def launch_type(self):
         return "FARGATE"
 
+    def validate_capacity_provider_strategy(self, strategy):
+        super(SimpleFargateApp, self).validate_capacity_provider_strategy(
+            strategy
+        )
+        for item in strategy:
+            if item.CapacityProvider not in FARGATE_CAPACITY_PROVIDERS:
+                raise ValueError("Fargate services can only use the %s "
+                                 "capacity providers, not %s." % (
+                                     " and ".join(FARGATE_CAPACITY_PROVIDERS),
+                                     item.CapacityProvider))
+
     @property
     def network_configuration(self):
         return ecs.NetworkConfiguration(
@@ -1,21 +1,5 @@
 import logging
 
-from awacs import (
-    awslambda,
-    ecs,
-    ec2,
-    events,
-    iam,
-    route53,
-    kinesis,
-    sns,
-    logs,
-    sqs,
-    s3,
-    cloudformation,
-    elasticloadbalancing as elb,
-    ecr,
-)
 from awacs.aws import (
     Statement,
     Allow,
@@ -31,8 +15,26 @@ from troposphere import (
     Join,
 )
 
+from ..util import LazyModule
+
 logger = logging.getLogger(__name__)
 
+# Imported on first use, see stacker_blueprints.policies
+awslambda = LazyModule("awacs.awslambda")
+ecs = LazyModule("awacs.ecs")
+ec2 = LazyModule("awacs.ec2")
+events = LazyModule("awacs.events")
+iam = LazyModule("awacs.iam")
+route53 = LazyModule("awacs.route53")
+kinesis = LazyModule("awacs.kinesis")
+sns = LazyModule("awacs.sns")
+logs = LazyModule("awacs.logs")
+sqs = LazyModule("awacs.sqs")
+s3 = LazyModule("awacs.s3")
+cloudformation = LazyModule("awacs.cloudformation")
+elb = LazyModule("awacs.elasticloadbalancing")
+ecr = LazyModule("awacs.ecr")
+
 
 def ecs_agent_policy():
     p = Policy(
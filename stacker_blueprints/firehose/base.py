@@ -36,6 +36,8 @@ from ..cloudwatch_logs import (
     validate_cloudwatch_log_retention,
 )
 
+from ..util import memoized_method
+
 LOG_GROUP = "LogGroup"
 S3_LOG_STREAM = "S3LogStream"
 ROLE = "Role"
@@ -145,10 +147,12 @@ class BaseDeliveryStream(Blueprint):
         }
     }
 
+    @memoized_method
     def buffering_hints(self):
         hints_config = self.get_variables()["BufferingHints"]
         return firehose.BufferingHints(**hints_config)
 
+    @memoized_method
     def encryption_config(self):
         key_arn = self.get_variables()["EncryptionKeyArn"]
         if key_arn:
@@ -160,6 +164,7 @@ class BaseDeliveryStream(Blueprint):
         else:
             return NOVALUE
 
+    @memoized_method
     def s3_bucket_arn(self):
         bucket_name = self.get_variables()["BucketName"]
         return s3_arn(bucket_name)
@@ -0,0 +1,384 @@
+"""Build and upload lambda code packages, skipping unchanged ones.
+
+The :class:`stacker_blueprints.aws_lambda.Function` blueprint takes a
+troposphere ``awslambda.Code`` object for its code. `package` builds one
+from a source directory::
+
+    store = S3Store("my-bucket")
+    code = package("my-function", "functions/my_function", store,
+                   prefix="lambda")
+
+The source tree is hashed first, and the zip is only built and uploaded if
+no package with that hash is in the store yet. Zips are byte for byte
+reproducible: entries are sorted, timestamps fixed and permissions reduced
+to whether a file is executable, so the same sources always give the same
+zip. Files are compressed in parallel by a pool of threads (zlib releases
+the GIL while compressing).
+
+:class:`LocalStore` keeps packages in a directory, for tests and dry runs.
+
+In a stacker config, the `upload_packages` hook packages functions into
+stacker's bucket and stores their Code objects in the hook data::
+
+    pre_build:
+      - path: stacker_blueprints.lambda_package.upload_packages
+        required: true
+        data_key: lambda
+        args:
+          prefix: lambda
+          functions:
+            my-function:
+              path: functions/my_function
+
+    stacks:
+      - name: my-function
+        class_path: stacker_blueprints.aws_lambda.Function
+        variables:
+          Code: ${hook_data lambda::my-function}
+          ...
+"""
+import errno
+import fnmatch
+import hashlib
+import os
+import stat
+import struct
+import tempfile
+import zlib
+from multiprocessing.pool import ThreadPool
+
+from troposphere import awslambda
+
+# Bump whenever the zip layout changes, so that packages are rebuilt.
+PACKAGE_FORMAT_VERSION = "1"
+
+DEFAULT_EXCLUDES = [
+    "*.pyc",
+    "*.pyo",
+    "__pycache__",
+    ".git",
+    ".DS_Store",
+]
+
+# 1980-01-01 00:00:00, the earliest date a zip file can hold.
+ZIP_DOS_DATE = (0 << 9) | (1 << 5) | 1
+ZIP_DOS_TIME = 0
+
+ZIP_VERSION = 20
+ZIP_UNIX = 3
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP_UTF8_FLAG = 0x800
+ZIP_MAX_SIZE = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+
+
+def _excluded(path, excludes):
+    name = os.path.basename(path)
+    return any(
+        fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern)
+        for pattern in excludes
+    )
+
+
+def source_files(root, excludes=None):
+    """Return the sorted relative paths of the files to package.
+
+    Symlinked files and directories are followed, and packaged as regular
+    files. A symlink to one of its parent directories raises a ValueError.
+
+    Args:
+        root (str): The source directory.
+        excludes (list): fnmatch patterns of the files and directories to
+            leave out, matched against both their name and their path
+            relative to root. Default: DEFAULT_EXCLUDES
+    """
+    if excludes is None:
+        excludes = DEFAULT_EXCLUDES
+    files = []
+    for directory, dirnames, filenames in os.walk(root, followlinks=True):
+        relative = os.path.relpath(directory, root)
+        relative = "" if relative == "." else relative.replace(os.sep, "/")
+        if relative:
+            real = os.path.realpath(directory)
+            parts = relative.split("/")
+            for i in range(len(parts)):
+                parent = os.path.join(root, *parts[:i])
+                if os.path.realpath(parent) == real:
+                    raise ValueError("%s is a symlink to its parent %s." %
+                                     (directory, parent))
+        dirnames[:] = [
+            d for d in dirnames
+            if not _excluded(relative + "/" + d if relative else d, excludes)
+        ]
+        for filename in filenames:
+            path = relative + "/" + filename if relative else filename
+            if not _excluded(path, excludes):
+                files.append(path)
+    return sorted(files)
+
+
+def _encode_name(name):
+    """Return the utf-8 encoded name, and the zip flags it needs."""
+    if not isinstance(name, bytes):
+        name = name.encode("utf-8")
+    try:
+        name.decode("ascii")
+    except UnicodeDecodeError:
+        return name, ZIP_UTF8_FLAG
+    return name, 0
+
+
+def _is_executable(path):
+    return bool(os.stat(path).st_mode & stat.S_IXUSR)
+
+
+def _file_mode(path):
+    return 0o755 if _is_executable(path) else 0o644
+
+
+def _read(root, name):
+    with open(os.path.join(root, name), "rb") as f:
+        return f.read()
+
+
+def _hash_file(args):
+    root, name = args
+    return hashlib.sha256(_read(root, name)).hexdigest()
+
+
+def _compress_file(args):
+    root, name, level = args
+    path = os.path.join(root, name)
+    data = _read(root, name)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    if len(compressed) < len(data):
+        method = ZIP_DEFLATED
+    else:
+        method, compressed = ZIP_STORED, data
+    return (name, _file_mode(path), zlib.crc32(data) & 0xFFFFFFFF,
+            len(data), method, compressed)
+
+
+def source_hash(root, files, threads=None):
+    """Return a hash of the names, contents and modes of files."""
+    pool = ThreadPool(threads)
+    try:
+        digests = pool.map(_hash_file, [(root, name) for name in files])
+    finally:
+        pool.close()
+        pool.join()
+
+    digest = hashlib.sha256(PACKAGE_FORMAT_VERSION.encode("utf-8"))
+    for name, file_digest in zip(files, digests):
+        digest.update(_encode_name(name)[0])
+        digest.update(("\0%o\0%s\0" % (
+            _file_mode(os.path.join(root, name)), file_digest
+        )).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_zip(fileobj, root, files, threads=None, level=9):
+    """Write a reproducible zip archive of files to fileobj.
+
+    Args:
+        fileobj: A writable binary file object.
+        root (str): The directory files are relative to.
+        files (list): Relative paths of the files to archive, in order.
+        threads (int): Number of compression threads. Defaults to the
+            number of cpus.
+        level (int): zlib compression level.
+    """
+    if len(files) > ZIP_MAX_ENTRIES:
+        raise ValueError("Can't package more than %d files." %
+                         ZIP_MAX_ENTRIES)
+
+    central_directory = []
+    offset = 0
+    pool = ThreadPool(threads)
+    try:
+        entries = pool.imap(_compress_file,
+                            [(root, name, level) for name in files])
+        for name, mode, crc, size, method, data in entries:
+            encoded_name, flags = _encode_name(name)
+            if offset > ZIP_MAX_SIZE or len(data) > ZIP_MAX_SIZE:
+                raise ValueError("Packages over 4GB aren't supported.")
+
+            fileobj.write(LOCAL_HEADER.pack(
+                b"PK\x03\x04", ZIP_VERSION, flags, method, ZIP_DOS_TIME,
+                ZIP_DOS_DATE, crc, len(data), size, len(encoded_name), 0
+            ))
+            fileobj.write(encoded_name)
+            fileobj.write(data)
+            central_directory.append(CENTRAL_HEADER.pack(
+                b"PK\x01\x02", (ZIP_UNIX << 8) | ZIP_VERSION, ZIP_VERSION,
+                flags, method, ZIP_DOS_TIME, ZIP_DOS_DATE, crc, len(data),
+                size, len(encoded_name), 0, 0, 0, 0,
+                (stat.S_IFREG | mode) << 16, offset
+            ) + encoded_name)
+            offset += LOCAL_HEADER.size + len(encoded_name) + len(data)
+    finally:
+        pool.close()
+        pool.join()
+
+    central_directory = b"".join(central_directory)
+    fileobj.write(central_directory)
+    fileobj.write(END_RECORD.pack(
+        b"PK\x05\x06", 0, 0, len(files), len(files),
+        len(central_directory), offset, 0
+    ))
+
+
+class LocalStore(object):
+    """Stores packages in a local directory, standing in for S3.
+
+    Args:
+        directory (str): Where to store the packages.
+        bucket (str): The S3Bucket of the Code objects returned by
+            `package`.
+    """
+
+    def __init__(self, directory, bucket="local"):
+        self.directory = directory
+        self.bucket = bucket
+
+    def path(self, key):
+        return os.path.join(self.directory, *key.split("/"))
+
+    def version(self, key):
+        """Return the version of a stored package: "" if the store isn't
+        versioned, None if the package isn't stored."""
+        return "" if os.path.exists(self.path(key)) else None
+
+    def put(self, key, fileobj):
+        """Store a package and return its version."""
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(fileobj.read())
+        os.rename(tmp_path, path)
+        return ""
+
+
+class S3Store(object):
+    """Stores packages in an S3 bucket.
+
+    Args:
+        bucket (str): The bucket to upload packages to.
+        client: A boto3 s3 client. Defaults to one for the default session.
+    """
+
+    def __init__(self, bucket, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client("s3")
+        self.bucket = bucket
+        self.client = client
+
+    def version(self, key):
+        """Return the version id of a stored package, "" if the bucket
+        isn't versioned or None if the package isn't stored."""
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return response.get("VersionId") or ""
+
+    def put(self, key, fileobj):
+        """Upload a package and return its version id."""
+        response = self.client.put_object(
+            Bucket=self.bucket, Key=key, Body=fileobj,
+            ContentType="application/zip",
+        )
+        return response.get("VersionId") or ""
+
+
+def package(name, root, store, prefix="", excludes=None, threads=None):
+    """Package a source directory and return its awslambda.Code.
+
+    The package is only built and stored if the store doesn't hold a
+    package of the same sources yet.
+
+    Args:
+        name (str): The name of the package, used in its key.
+        root (str): The source directory.
+        store (Union[:class:`LocalStore`, :class:`S3Store`]): Where to store
+            the package.
+        prefix (str): Key prefix of the package.
+        excludes (list): See `source_files`.
+        threads (int): Number of threads to hash and compress files with.
+            Defaults to the number of cpus.
+    """
+    files = source_files(root, excludes)
+    if not files:
+        raise ValueError("No files to package in %s" % root)
+
+    key = "%s-%s.zip" % (name, source_hash(root, files, threads))
+    if prefix:
+        key = prefix.rstrip("/") + "/" + key
+
+    version = store.version(key)
+    if version is None:
+        with tempfile.TemporaryFile() as f:
+            write_zip(f, root, files, threads)
+            f.seek(0)
+            version = store.put(key, f)
+
+    kwargs = {"S3Bucket": store.bucket, "S3Key": key}
+    if version:
+        kwargs["S3ObjectVersion"] = version
+    return awslambda.Code(**kwargs)
+
+
+def upload_packages(provider, context, **kwargs):
+    """stacker hook packaging functions with `package` and uploading them to
+    S3, skipping unchanged packages.
+
+    Returns a dict of the awslambda.Code of each function, by name, which
+    stacker stores in the hook data under the data_key of the hook.
+
+    Keyword Args:
+        bucket (str): The bucket to upload packages to. Defaults to the
+            stacker bucket.
+        bucket_region (str): The region of the bucket. Defaults to the
+            region of the provider.
+        prefix (str): Key prefix of the packages.
+        threads (int): Number of threads to hash and compress files with.
+        functions (dict): The functions to package, by name, each a dict
+            with the path of its source directory (relative to the stacker
+            config) and optionally a list of exclude patterns (see
+            `source_files`).
+    """
+    from stacker.session_cache import get_session
+    from stacker.util import ensure_s3_bucket, get_config_directory
+
+    bucket = kwargs.get("bucket") or context.bucket_name
+    region = kwargs.get("bucket_region") or provider.region
+    client = get_session(region).client("s3")
+    ensure_s3_bucket(client, bucket, region)
+    store = S3Store(bucket, client)
+
+    results = {}
+    for name, options in kwargs["functions"].items():
+        root = os.path.expanduser(options["path"])
+        if not os.path.isabs(root):
+            root = os.path.join(get_config_directory(), root)
+        results[name] = package(name, root, store,
+                                prefix=kwargs.get("prefix", ""),
+                                excludes=options.get("exclude"),
+                                threads=kwargs.get("threads"))
+    return results
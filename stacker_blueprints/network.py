@@ -8,6 +8,8 @@ from troposphere import ec2
 
 from stacker.blueprints.base import Blueprint
 
+from .util import memoized_property
+
 
 class Network(Blueprint):
     VARIABLES = {
@@ -59,7 +61,7 @@ class Network(Blueprint):
     def vpc_id(self):
         return self.get_variables()["VpcId"]
 
-    @property
+    @memoized_property
     def network_type(self):
         if self.internet_gateway_id is not NoValue:
             return "public"
@@ -81,7 +83,7 @@ class Network(Blueprint):
     def cidr_block(self):
         return self.get_variables()["CidrBlock"]
 
-    @property
+    @memoized_property
     def tags(self):
         variables = self.get_variables()
         tag_dict = {"NetworkType": self.network_type}
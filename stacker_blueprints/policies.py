@@ -1,3 +1,8 @@
+import json
+import logging
+import re
+from collections import OrderedDict
+
 from awacs.aws import (
     Action,
     Allow,
@@ -9,20 +14,42 @@ from awacs.aws import (
 from troposphere import (
     Sub,
     Join,
+    Output,
+    Ref,
     Region,
     AccountId,
-    AWSHelperFn
+    AWSHelperFn,
+    encode_to_dict,
+    iam,
 )
 
-from awacs import (
-    cloudwatch,
-    dynamodb,
-    ecr,
-    kinesis,
-    ec2,
-    logs,
-    s3,
-    sts,
+from .util import STRING_TYPES, LazyModule
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use, most consumers of this module only need a few of
+# these.
+cloudwatch = LazyModule("awacs.cloudwatch")
+dynamodb = LazyModule("awacs.dynamodb")
+ecr = LazyModule("awacs.ecr")
+ecs = LazyModule("awacs.ecs")
+kinesis = LazyModule("awacs.kinesis")
+ec2 = LazyModule("awacs.ec2")
+logs = LazyModule("awacs.logs")
+s3 = LazyModule("awacs.s3")
+sts = LazyModule("awacs.sts")
+
+# The largest policy documents IAM accepts, whitespace excluded. Inline
+# policies share theirs across all the inline policies of a role.
+INLINE_POLICY_MAX_BYTES = 10240
+MANAGED_POLICY_MAX_BYTES = 6144
+
+POLICY_VERSION = "2012-10-17"
+
+# Statements with any other key (Sid, Principal, NotAction...) are left
+# alone by compact_statements.
+MERGEABLE_STATEMENT_KEYS = frozenset(
+    ["Effect", "Action", "Resource", "Condition"]
 )
 
 
@@ -276,26 +303,95 @@ def flowlogs_assumerole_policy():
 
 
 # reference: https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/aws-resource-dynamodb-table.html#cfn-dynamodb-table-examples-application-autoscaling # noqa
-def dynamodb_autoscaling_policy(tables):
-    """Policy to allow AutoScaling a list of DynamoDB tables."""
+def dynamodb_autoscaling_policy(tables, resources=None):
+    """Policy to allow AutoScaling a list of DynamoDB tables.
+
+    The tables are given by name, or as ARNs through resources, such as
+    those of `dynamodb_table_arns`.
+    """
+    statements = []
+    resources = resources or dynamodb_arns(tables)
+    # A statement without resources is invalid, as with no tables.
+    if resources:
+        statements.append(
+            Statement(
+                Effect=Allow,
+                Resource=resources,
+                Action=[
+                    dynamodb.DescribeTable,
+                    dynamodb.UpdateTable,
+                ]
+            )
+        )
+    statements.append(
+        Statement(
+            Effect=Allow,
+            Resource=['*'],
+            Action=[
+                cloudwatch.PutMetricAlarm,
+                cloudwatch.DescribeAlarms,
+                cloudwatch.GetMetricStatistics,
+                cloudwatch.SetAlarmState,
+                cloudwatch.DeleteAlarms,
+            ]
+        )
+    )
+    return Policy(Statement=statements)
+
+
+def dynamodb_table_arns(tables):
+    """Returns the ARNs of a list of DynamoDB tables and their indexes, in
+    the region and account of the stack."""
+    arns = []
+    for table in tables:
+        arn = Sub("arn:${AWS::Partition}:dynamodb:${AWS::Region}:"
+                  "${AWS::AccountId}:table/%s" % table)
+        index_arn = Sub("arn:${AWS::Partition}:dynamodb:${AWS::Region}:"
+                        "${AWS::AccountId}:table/%s/index/*" % table)
+        arns.extend([arn, index_arn])
+    return arns
+
+
+def dax_dynamodb_policy(tables):
+    """Policy to allow a DAX cluster to read and write through to a list of
+    DynamoDB tables and their indexes, in the region and account of the
+    stack."""
+    arns = dynamodb_table_arns(tables)
     return Policy(
         Statement=[
             Statement(
                 Effect=Allow,
-                Resource=dynamodb_arns(tables),
+                Resource=arns,
                 Action=[
+                    dynamodb.BatchGetItem,
+                    dynamodb.BatchWriteItem,
+                    dynamodb.ConditionCheckItem,
+                    dynamodb.DeleteItem,
                     dynamodb.DescribeTable,
-                    dynamodb.UpdateTable,
+                    dynamodb.GetItem,
+                    dynamodb.PutItem,
+                    dynamodb.Query,
+                    dynamodb.Scan,
+                    dynamodb.UpdateItem,
                 ]
             ),
+        ]
+    )
+
+
+# reference: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/autoscale_IAM_role.html # noqa
+def ecs_service_autoscaling_policy():
+    """Policy to allow AutoScaling ECS services."""
+    return Policy(
+        Statement=[
             Statement(
                 Effect=Allow,
                 Resource=['*'],
                 Action=[
+                    ecs.DescribeServices,
+                    ecs.UpdateService,
                     cloudwatch.PutMetricAlarm,
                     cloudwatch.DescribeAlarms,
-                    cloudwatch.GetMetricStatistics,
-                    cloudwatch.SetAlarmState,
                     cloudwatch.DeleteAlarms,
                 ]
             ),
@@ -345,3 +441,315 @@ def ecs_task_execution_policy(ecr_repo="*", log_group=None,
             ecr_repo, log_group, log_stream
         )
     )
+
+
+def _to_json(value):
+    return json.dumps(encode_to_dict(value), sort_keys=True,
+                      separators=(",", ":"))
+
+
+def _listify(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _wildcard_re(pattern, ignore_case):
+    """Translate an IAM wildcard pattern, where * matches any characters
+    and ? a single one, to a regex."""
+    parts = [
+        ".".join(re.escape(chunk) for chunk in part.split("?"))
+        for part in pattern.split("*")
+    ]
+    return re.compile("^%s$" % ".*".join(parts),
+                      re.IGNORECASE if ignore_case else 0)
+
+
+def _is_wildcard(value):
+    return isinstance(value, STRING_TYPES) and ("*" in value or "?" in value)
+
+
+def _prune(entries, ignore_case):
+    """Drop the entries covered by a wildcard entry.
+
+    Only literal strings are matched against wildcards: a wildcard isn't
+    covered by another one just because the pattern text matches (s3:::??
+    matches the text s3:::b*, not every bucket it stands for). Anything
+    else, wildcards and intrinsic functions, is only covered by "*".
+
+    Args:
+        entries (dict): Unique entries by key.
+        ignore_case (bool): Whether wildcards match regardless of case.
+
+    Returns:
+        dict: The remaining entries, sorted by key.
+    """
+    values = list(entries.values())
+    if "*" in values:
+        return OrderedDict(
+            (key, value) for key, value in sorted(entries.items())
+            if value == "*"
+        )
+
+    wildcards = [_wildcard_re(v, ignore_case) for v in values
+                 if _is_wildcard(v)]
+    kept = {}
+    for key, value in entries.items():
+        if (isinstance(value, STRING_TYPES) and not _is_wildcard(value) and
+                any(w.match(value) for w in wildcards)):
+            continue
+        kept[key] = value
+    return OrderedDict((key, kept[key]) for key in sorted(kept))
+
+
+def _unique_actions(actions):
+    entries = OrderedDict()
+    for action in actions:
+        name = encode_to_dict(action)
+        # Action names aren't case sensitive.
+        entries.setdefault(name.lower(), action)
+    return entries
+
+
+def _unique_resources(resources):
+    entries = OrderedDict()
+    for resource in resources:
+        entries.setdefault(_to_json(resource), resource)
+    return entries
+
+
+def _action_entries(entries):
+    # Match wildcards against the action names, not their objects.
+    return dict((key, encode_to_dict(value)) for key, value in entries.items())
+
+
+def _prune_actions(actions):
+    names = _prune(_action_entries(actions), ignore_case=True)
+    return OrderedDict((key, actions[key]) for key in names)
+
+
+def _merge_parts(parts, same, union):
+    """Merge the parts with identical heads and `same` entries, taking the
+    union of their `union` entries. Returns the remaining parts."""
+    merged = OrderedDict()
+    for part in parts:
+        key = (part["head"], tuple(part[same]))
+        if key not in merged:
+            merged[key] = part
+            continue
+        target = merged[key]
+        for entry_key, value in part[union].items():
+            target[union].setdefault(entry_key, value)
+        part["merged"] = True
+    for part in merged.values():
+        if union == "actions":
+            part["actions"] = _prune_actions(part["actions"])
+        else:
+            part["resources"] = _prune(part["resources"], ignore_case=False)
+    return list(merged.values())
+
+
+def compact_statements(statements):
+    """Merge and trim policy statements, without changing what they allow.
+
+    Statements with the same Effect and Condition are merged when they
+    have the same resources (their actions are combined) or the same
+    actions (their resources are combined). Actions and resources covered
+    by a wildcard in the same statement, such as s3:GetObject next to
+    s3:Get*, are dropped, and the rest are deduplicated and sorted so the
+    same permissions always give the same document.
+
+    Statements with any keys besides Effect, Action, Resource and Condition
+    are kept as they are. Statements keep the position of the first
+    statement merged into them.
+
+    Args:
+        statements (list): A list of :class:`awacs.aws.Statement` objects.
+
+    Returns:
+        list: The compacted list of :class:`awacs.aws.Statement` objects.
+    """
+    output = []
+    parts = []
+    for statement in statements:
+        properties = statement.properties
+        mergeable = (
+            "Action" in properties and "Resource" in properties and
+            not set(properties) - MERGEABLE_STATEMENT_KEYS
+        )
+        if not mergeable:
+            output.append(statement)
+            continue
+        part = {
+            "head": (_to_json(properties["Effect"]),
+                     _to_json(properties.get("Condition"))),
+            "effect": properties["Effect"],
+            "condition": properties.get("Condition"),
+            "actions": _prune_actions(
+                _unique_actions(_listify(properties["Action"]))),
+            "resources": _prune(
+                _unique_resources(_listify(properties["Resource"])),
+                ignore_case=False),
+            "merged": False,
+        }
+        output.append(part)
+        parts.append(part)
+
+    # Merging on one side can make the other side identical, so repeat
+    # until nothing changes.
+    while True:
+        count = len(parts)
+        parts = _merge_parts(parts, "resources", "actions")
+        parts = _merge_parts(parts, "actions", "resources")
+        if len(parts) == count:
+            break
+
+    compacted = []
+    for part in output:
+        if not isinstance(part, dict):
+            compacted.append(part)
+        elif not part["merged"]:
+            kwargs = {
+                "Effect": part["effect"],
+                "Action": list(part["actions"].values()),
+                "Resource": list(part["resources"].values()),
+            }
+            if part["condition"] is not None:
+                kwargs["Condition"] = part["condition"]
+            compacted.append(Statement(**kwargs))
+    return compacted
+
+
+def policy_size(statements):
+    """Estimate the size of a policy document of statements, as counted
+    by IAM (without whitespace).
+
+    Intrinsic functions are counted as their JSON, which can be longer or
+    shorter than the values CloudFormation replaces them with.
+    """
+    return len(_to_json({"Version": POLICY_VERSION, "Statement": statements}))
+
+
+def _split_statement(statement, max_bytes):
+    """Split a statement too large for a policy by its resources, into
+    statements that each fill a policy as much as possible."""
+    properties = statement.properties
+    resources = _listify(properties.get("Resource", []))
+
+    def with_resources(chunk):
+        kwargs = dict(properties)
+        kwargs["Resource"] = chunk
+        return Statement(**kwargs)
+
+    too_large = ValueError(
+        "Statement is %d bytes, more than the %d allowed in a policy." % (
+            policy_size([statement]), max_bytes)
+    )
+    if len(resources) < 2:
+        raise too_large
+
+    available = max_bytes - policy_size([with_resources([])])
+    statements = []
+    chunk = []
+    size = 0
+    for resource in resources:
+        # Resources after the first are separated by a comma.
+        resource_size = len(_to_json(resource))
+        if resource_size > available:
+            raise too_large
+        added = resource_size + (1 if chunk else 0)
+        if size + added > available:
+            statements.append(with_resources(chunk))
+            chunk = []
+            size = 0
+            added = resource_size
+        chunk.append(resource)
+        size += added
+    statements.append(with_resources(chunk))
+    return statements
+
+
+def split_statements(statements, max_bytes=MANAGED_POLICY_MAX_BYTES):
+    """Split statements into groups that each fit in a policy document.
+
+    Statements are kept in order. A statement too large for a policy by
+    itself is split into statements with fewer resources.
+
+    Args:
+        statements (list): A list of :class:`awacs.aws.Statement` objects.
+        max_bytes (int): The largest policy allowed, as estimated by
+            `policy_size`. Default: MANAGED_POLICY_MAX_BYTES
+
+    Returns:
+        list: Lists of statements, one per policy.
+    """
+    empty = policy_size([])
+    policies = []
+    current = []
+    size = empty
+    pending = list(reversed(statements))
+    while pending:
+        statement = pending.pop()
+        statement_size = len(_to_json(statement))
+        if empty + statement_size > max_bytes:
+            pending.extend(reversed(_split_statement(statement, max_bytes)))
+            continue
+        # Statements after the first are separated by a comma.
+        added = statement_size + (1 if current else 0)
+        if size + added > max_bytes:
+            policies.append(current)
+            current = []
+            size = empty
+            added = statement_size
+        current.append(statement)
+        size += added
+    if current:
+        policies.append(current)
+    return policies
+
+
+def add_role_policies(template, role, statements):
+    """Add the policies granting statements to role, returning the first.
+
+    The statements go in a single inline policy named
+    ${AWS::StackName}-policy, with a PolicyName output. If they don't fit
+    in what is left of the inline policy size limit of the role, they are
+    compacted, and if they still don't fit they are split across as many
+    managed policies as needed (Policy, Policy2...), with a PolicyArn,
+    Policy2Arn... output each.
+    """
+    budget = INLINE_POLICY_MAX_BYTES - sum(
+        policy_size(policy.PolicyDocument.Statement)
+        for policy in getattr(role, "Policies", [])
+    )
+    if policy_size(statements) > budget:
+        statements = compact_statements(statements)
+
+    if policy_size(statements) <= budget:
+        policy = template.add_resource(
+            iam.PolicyType(
+                "Policy",
+                PolicyName=Sub("${AWS::StackName}-policy"),
+                PolicyDocument=Policy(Statement=statements),
+                Roles=[role.Ref()],
+            )
+        )
+        template.add_output(Output("PolicyName", Value=Ref(policy)))
+        return policy
+
+    logger.debug("Policy statements are %d bytes compacted, more than the "
+                 "%d left for inline policies, splitting them across "
+                 "managed policies.", policy_size(statements), budget)
+    policies = []
+    for i, chunk in enumerate(split_statements(statements), 1):
+        title = "Policy%d" % i if i > 1 else "Policy"
+        policy = template.add_resource(
+            iam.ManagedPolicy(
+                title,
+                PolicyDocument=Policy(Statement=chunk),
+                Roles=[role.Ref()],
+            )
+        )
+        template.add_output(Output(title + "Arn", Value=Ref(policy)))
+        policies.append(policy)
+    return policies[0]
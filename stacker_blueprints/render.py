@@ -0,0 +1,496 @@
+"""Render many blueprints to CloudFormation templates in one go.
+
+Building troposphere/awacs object graphs is CPU bound, so a batch of stacks
+is spread across a pool of processes. Each stack is described the same way
+it is in a stacker config::
+
+    definitions = [
+        {
+            "name": "vpc",
+            "class_path": "stacker_blueprints.vpc.VPC2",
+            "variables": {"VPC": {"MyVPC": {"CidrBlock": "10.0.0.0/16"}}},
+        },
+        ...
+    ]
+
+    for result in render_blueprints(definitions):
+        if result.error:
+            print(result.name, result.error)
+
+Variables must already be resolved (no stacker lookups) and picklable.
+
+Passing a :class:`TemplateCache` skips rendering entirely for stacks whose
+blueprint source, package versions and variables haven't changed since the
+last time they were rendered.
+
+With `compact=True` templates are rendered without whitespace, and every
+result carries :class:`TemplateStats` about the size of its template. Stacks
+whose template doesn't fit in `limits` (CloudFormation's own limits by
+default) fail instead of being returned::
+
+    results = render_blueprints(definitions, compact=True,
+                                limits={"bytes": 460800})
+    write_templates(results, "templates")
+"""
+import errno
+import gzip
+import hashlib
+import inspect
+import io
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import traceback
+from collections import namedtuple
+
+import awacs
+import troposphere
+
+from stacker.config import Config
+from stacker.context import Context
+from stacker.util import load_object_from_string
+from stacker.variables import Variable
+
+from . import __version__
+from .util import CLOUDFORMATION_LIMITS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "stacker"
+
+RenderResult = namedtuple("RenderResult",
+                          ["name", "template", "error", "stats"])
+
+TemplateStats = namedtuple("TemplateStats",
+                           ["bytes", "resources", "outputs", "parameters"])
+
+COMPACT_SEPARATORS = (",", ":")
+
+# Everything that can change the output of a blueprint besides its inputs
+# and the source of its class (see `source_hash`).
+CACHE_VERSIONS = {
+    "stacker_blueprints": __version__,
+    "troposphere": troposphere.__version__,
+    "awacs": getattr(awacs, "__version__", ""),
+}
+
+# The sha256 of source files, by path, mtime and size.
+_file_hashes = {}
+
+
+def _file_hash(path):
+    stat = os.stat(path)
+    key = (path, stat.st_mtime, stat.st_size)
+    if key not in _file_hashes:
+        with open(path, "rb") as f:
+            _file_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+    return _file_hashes[key]
+
+
+def source_hash(blueprint_class):
+    """Return a hash of the source files of a blueprint class and its bases.
+
+    This catches edits to blueprints that don't come with a version bump,
+    including blueprints outside of this package.
+    """
+    paths = set()
+    for cls in inspect.getmro(blueprint_class):
+        try:
+            path = inspect.getsourcefile(cls) or inspect.getfile(cls)
+        except TypeError:
+            # Built-in classes, such as object, have no source.
+            continue
+        paths.add(os.path.abspath(path))
+
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(_file_hash(path).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _encode_variable(value):
+    """json.dumps fallback for troposphere/awacs objects in variables."""
+    for method in ("to_dict", "JSONrepr"):
+        if hasattr(value, method):
+            return {
+                "__type__": "%s.%s" % (type(value).__module__,
+                                       type(value).__name__),
+                "value": getattr(value, method)(),
+            }
+    raise TypeError("%r can't be used in a template cache key" % (value,))
+
+
+def is_cacheable(blueprint_class, variables):
+    """Whether a rendered template of a blueprint class can be cached.
+
+    Blueprints whose templates depend on anything besides their variables
+    (files read at render time, the current date, remote state, ...) should
+    set `CACHEABLE = False`, or to a function that takes the variables and
+    returns whether the template can be cached.
+    """
+    cacheable = getattr(blueprint_class, "CACHEABLE", True)
+    if callable(cacheable):
+        return cacheable(variables)
+    return cacheable
+
+
+class TemplateCache(object):
+    """A content addressed, size bounded, on-disk cache of templates.
+
+    Templates are keyed by a hash of the stack name, namespace, blueprint
+    class path, the source files of the blueprint class and its bases, the
+    versions in `CACHE_VERSIONS` and the resolved variable values. Reading
+    an entry marks it as recently used; `evict` removes the least recently
+    used entries until the cache fits in `max_bytes`.
+
+    Args:
+        directory (str): Where to store the cached templates.
+        max_bytes (int): Size budget for the cache. Default: 256MB
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, name, class_path, variables, namespace=DEFAULT_NAMESPACE,
+            compact=False):
+        """Return the cache key for a stack, or None if it can't be cached.
+        """
+        try:
+            blueprint_class = load_object_from_string(class_path)
+        except (ImportError, AttributeError, ValueError):
+            return None
+        if not is_cacheable(blueprint_class, variables):
+            return None
+
+        try:
+            payload = json.dumps(
+                {
+                    "name": name,
+                    "namespace": namespace,
+                    "class_path": class_path,
+                    "source": source_hash(blueprint_class),
+                    "versions": CACHE_VERSIONS,
+                    "variables": variables,
+                    "compact": compact,
+                },
+                sort_keys=True,
+                separators=(",", ":"),
+                default=_encode_variable,
+            )
+        except (IOError, OSError, TypeError, ValueError) as e:
+            logger.debug("Not caching %s: %s", name, e)
+            return None
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return the cached template for key, or None on a miss."""
+        path = self.path(key)
+        try:
+            with open(path) as fd:
+                template = fd.read()
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+        # Bump the mtime, which is what eviction orders entries by.
+        os.utime(path, None)
+        return template
+
+    def set(self, key, template):
+        """Store a template. Writes are atomic, so concurrent readers never
+        see a partial template."""
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(template)
+        os.rename(tmp_path, path)
+
+    def entries(self):
+        """Return a list of (mtime, size, path) of every cached template."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used templates until the cache fits in
+        `max_bytes`. Returns the number of templates removed."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def _definition_attr(definition, attr, default=None):
+    if isinstance(definition, dict):
+        return definition.get(attr, default)
+    return getattr(definition, attr, default)
+
+
+def normalize_definition(definition):
+    """Return a (name, class_path, variables) tuple for a definition.
+
+    Args:
+        definition (Union[dict, tuple, :class:`stacker.config.Stack`]): A
+            stack definition, either as a dict or stacker config Stack with
+            `name`, `class_path` and `variables`, or a (class_path,
+            variables) tuple, in which case the class name is used as the
+            stack name.
+    """
+    if isinstance(definition, (tuple, list)):
+        class_path, variables = definition
+        name = class_path.rsplit(".", 1)[-1]
+    else:
+        name = _definition_attr(definition, "name")
+        class_path = _definition_attr(definition, "class_path")
+        variables = _definition_attr(definition, "variables")
+    return name, class_path, dict(variables or {})
+
+
+def build_blueprint(name, class_path, variables, namespace=DEFAULT_NAMESPACE):
+    """Instantiate a blueprint and resolve its variables."""
+    context = Context(config=Config({"namespace": namespace}))
+    blueprint_class = load_object_from_string(class_path)
+    blueprint = blueprint_class(name, context)
+    blueprint.resolve_variables(
+        [Variable(k, v) for k, v in variables.items()]
+    )
+    return blueprint
+
+
+def render_blueprint(name, class_path, variables,
+                     namespace=DEFAULT_NAMESPACE, compact=False):
+    """Render a single blueprint and return its template as JSON.
+
+    With compact, the template is rendered without any whitespace. Keys are
+    sorted either way, so the output is deterministic.
+    """
+    blueprint = build_blueprint(name, class_path, variables, namespace)
+    if not compact:
+        return blueprint.render_template()[1]
+
+    # Same as Blueprint.render_template, which has no way to change the
+    # separators.
+    blueprint.import_mappings()
+    blueprint.create_template()
+    if blueprint.description:
+        blueprint.set_template_description(blueprint.description)
+    blueprint.setup_parameters()
+    return blueprint.template.to_json(indent=None,
+                                      separators=COMPACT_SEPARATORS)
+
+
+def template_stats(template):
+    """Return the :class:`TemplateStats` of a rendered JSON template."""
+    data = json.loads(template)
+    return TemplateStats(
+        bytes=len(template.encode("utf-8")),
+        resources=len(data.get("Resources", {})),
+        outputs=len(data.get("Outputs", {})),
+        parameters=len(data.get("Parameters", {})),
+    )
+
+
+def template_headroom(stats, limits=None):
+    """Return how far below each limit a template is, as a dict.
+
+    Negative values are limits the template exceeds.
+    """
+    limits = dict(CLOUDFORMATION_LIMITS, **(limits or {}))
+    return dict(
+        (field, limits[field] - value)
+        for field, value in stats._asdict().items()
+    )
+
+
+def check_template_limits(name, stats, limits=None):
+    """Raise a ValueError if a template exceeds any of the limits."""
+    exceeded = sorted(
+        "%s (%d over)" % (field, -headroom)
+        for field, headroom in template_headroom(stats, limits).items()
+        if headroom < 0
+    )
+    if exceeded:
+        raise ValueError(
+            "Template for %s exceeds its limits for %s." % (
+                name, ", ".join(exceeded))
+        )
+
+
+def format_template_stats(name, stats, limits=None):
+    """Return a one line summary of a template's size and headroom."""
+    headroom = template_headroom(stats, limits)
+    return ", ".join(
+        ["%s: %d bytes (%d left)" % (name, stats.bytes, headroom["bytes"])] +
+        ["%d %s (%d left)" % (getattr(stats, field), field, headroom[field])
+         for field in ("resources", "outputs", "parameters")]
+    )
+
+
+def gzip_template(template):
+    """Return the gzip compressed template.
+
+    The gzip header doesn't record a timestamp or file name, so the same
+    template always compresses to the same bytes.
+    """
+    buf = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", fileobj=buf, mtime=0) as f:
+        f.write(template.encode("utf-8"))
+    return buf.getvalue()
+
+
+def write_templates(results, directory, compress=True):
+    """Write the templates of successful render results to a directory.
+
+    Each template is written to `<name>.json`, and with compress to
+    `<name>.json.gz` as well.
+
+    Returns:
+        list: The paths written.
+    """
+    paths = []
+    for result in results:
+        if result.template is None:
+            continue
+        path = os.path.join(directory, result.name + ".json")
+        with open(path, "w") as f:
+            f.write(result.template)
+        paths.append(path)
+        if compress:
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip_template(result.template))
+            paths.append(path + ".gz")
+    return paths
+
+
+def _checked_result(name, template, limits):
+    stats = template_stats(template)
+    if limits is not None:
+        check_template_limits(name, stats, limits)
+    return RenderResult(name, template, None, stats)
+
+
+def _render_definition(args):
+    definition, namespace, compact, limits = args
+    name = _definition_attr(definition, "name")
+    try:
+        name, class_path, variables = normalize_definition(definition)
+        template = render_blueprint(name, class_path, variables, namespace,
+                                    compact)
+        return _checked_result(name, template, limits)
+    except Exception:
+        # Exceptions aren't guaranteed to be picklable, so only the
+        # formatted traceback crosses back over the process boundary.
+        return RenderResult(name, None, traceback.format_exc(), None)
+
+
+def render_blueprints(definitions, processes=None,
+                      namespace=DEFAULT_NAMESPACE, cache=None, compact=False,
+                      limits=CLOUDFORMATION_LIMITS):
+    """Render a batch of blueprints across a pool of processes.
+
+    Args:
+        definitions (list): Stack definitions, see `normalize_definition`.
+        processes (int): Number of worker processes. Defaults to the number
+            of cpus. With 1, everything is rendered in the current process.
+        namespace (str): The stacker namespace to render the stacks in.
+        cache (:class:`TemplateCache`): If given, templates are looked up in
+            and stored to this cache.
+        compact (bool): Render templates without whitespace.
+        limits (dict): Templates exceeding any of these "bytes",
+            "resources", "outputs" or "parameters" limits fail to render.
+            Limits that aren't given default to CloudFormation's. Pass None
+            to disable the check.
+
+    Returns:
+        list: A :class:`RenderResult` per definition, in input order. The
+            `template` of a result is the rendered JSON and `stats` its
+            :class:`TemplateStats`, or None if the stack failed to render,
+            in which case `error` holds the traceback.
+    """
+    if limits is not None:
+        limits = dict(CLOUDFORMATION_LIMITS, **limits)
+
+    results = [None] * len(definitions)
+    keys = [None] * len(definitions)
+    pending = []
+    for i, definition in enumerate(definitions):
+        if cache is not None:
+            name, class_path, variables = normalize_definition(definition)
+            keys[i] = cache.key(name, class_path, variables, namespace,
+                                compact)
+            template = keys[i] and cache.get(keys[i])
+            if template is not None:
+                try:
+                    results[i] = _checked_result(name, template, limits)
+                except ValueError:
+                    results[i] = RenderResult(name, None,
+                                              traceback.format_exc(), None)
+                continue
+        pending.append(i)
+
+    jobs = [(definitions[i], namespace, compact, limits) for i in pending]
+    for i, result in zip(pending, _render_jobs(jobs, processes)):
+        results[i] = result
+        if result.error:
+            logger.error("Failed to render %s:\n%s", result.name,
+                         result.error)
+        elif keys[i]:
+            cache.set(keys[i], result.template)
+
+    if cache is not None and pending:
+        cache.evict()
+    return results
+
+
+def _render_jobs(jobs, processes):
+    if not jobs:
+        return []
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(jobs)))
+
+    if processes == 1:
+        return [_render_definition(job) for job in jobs]
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        # Small chunks keep the workers busy when a few stacks are much
+        # larger than the rest.
+        chunksize = max(1, len(jobs) // (processes * 4))
+        return pool.map(_render_definition, jobs, chunksize)
+    finally:
+        pool.close()
+        pool.join()
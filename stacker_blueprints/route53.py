@@ -1,4 +1,6 @@
 from hashlib import md5
+from itertools import chain
+import json
 
 from stacker.blueprints.base import Blueprint
 
@@ -8,9 +10,13 @@ from troposphere import (
     GetAtt,
     Join,
     Region,
+    encode_to_dict,
     route53,
 )
 
+from .util import CLOUDFORMATION_LIMITS, jump_consistent_hash
+from .zone_file import read_zone_file
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -18,34 +24,102 @@ logger = logging.getLogger(__name__)
 CLOUDFRONT_ZONE_ID = "Z2FDTNDATAQYW2"
 
 # reference:
-#   https://docs.aws.amazon.com/general/latest/gr/rande.html#elb_region
+#   https://docs.aws.amazon.com/general/latest/gr/elb.html
+# Classic and Application Load Balancers, including dualstack names.
 ELB_ZONE_IDS = {
     'us-east-2': 'Z3AADJGX6KTTL2',
     'us-east-1': 'Z35SXDOTRQ7X7K',
     'us-west-1': 'Z368ELLRRE2KJ0',
     'us-west-2': 'Z1H1FL5HABSF5',
-    'ca-central-1': 'ZQSVJUPU6J1EY',
+    'af-south-1': 'Z268VQBMOI5EKX',
+    'ap-east-1': 'Z3DQVH9N71FHZ0',
     'ap-south-1': 'ZP97RAFLXTNZK',
+    'ap-northeast-3': 'Z5LXEXXYW11ES',
     'ap-northeast-2': 'ZWKZPGTI48KDX',
     'ap-southeast-1': 'Z1LMS91P8CMLE5',
     'ap-southeast-2': 'Z1GM3OXH4ZPM65',
     'ap-northeast-1': 'Z14GRHDCWA56QT',
+    'ca-central-1': 'ZQSVJUPU6J1EY',
     'eu-central-1': 'Z215JYRZR1TBD5',
     'eu-west-1': 'Z32O12XQLNTSW2',
     'eu-west-2': 'ZHURV8PSTC4K8',
+    'eu-south-1': 'Z3ULH7SSC9OV64',
     'eu-west-3': 'Z3Q77PNBQS71R4',
+    'eu-north-1': 'Z23TAZ7KFP5Y7F',
+    'me-south-1': 'ZS929ML54UICD',
     'sa-east-1': 'Z2P70J7HTTTPLU',
+    'us-gov-west-1': 'Z33AYJ8TM3BH4J',
+    'us-gov-east-1': 'Z166TLBEWOO7G0',
+}
+
+# Network Load Balancers
+NLB_ZONE_IDS = {
+    'us-east-2': 'ZLMOA37VPKANP',
+    'us-east-1': 'Z26RNL4JYFTOTI',
+    'us-west-1': 'Z24FKFUX50B4VW',
+    'us-west-2': 'Z18D5FSROUN65G',
+    'af-south-1': 'Z203XCE67M25HM',
+    'ap-east-1': 'Z12Y7K3UBGUAD1',
+    'ap-south-1': 'ZVDDRBQ08TROA',
+    'ap-northeast-3': 'Z1GWIQ4HH19I5X',
+    'ap-northeast-2': 'ZIBE1TIR4HY56',
+    'ap-southeast-1': 'ZKVM4W9LS7TM',
+    'ap-southeast-2': 'ZCT6FZBF4DROD',
+    'ap-northeast-1': 'Z31USIVHYNEOWT',
+    'ca-central-1': 'Z2EPGBW3API2WT',
+    'eu-central-1': 'Z3F0SRJ5LGBH90',
+    'eu-west-1': 'Z2IFOLAFXWLO4F',
+    'eu-west-2': 'ZD4D7Y8KGAS4G',
+    'eu-south-1': 'Z23146JA1KNAFP',
+    'eu-west-3': 'Z1CMS0P5QUZ6D5',
+    'eu-north-1': 'Z1UDT6IFJ4EJM',
+    'me-south-1': 'Z3QSRYVP46NYYV',
+    'sa-east-1': 'ZTK26PT1VY4CU',
+    'us-gov-west-1': 'ZMG1MZ2THAWF1',
+    'us-gov-east-1': 'Z1ZSMQQ6Q24QQ8',
+}
+
+# reference:
+#   https://docs.aws.amazon.com/general/latest/gr/apigateway.html
+# Regional API Gateway custom domains. Edge optimized ones are CloudFront
+# distributions.
+API_GATEWAY_ZONE_IDS = {
+    'us-east-2': 'ZOJJZC49E0EPZ',
+    'us-east-1': 'Z1UJRXOUMOOFQ8',
+    'us-west-1': 'Z2MUQ32089INYE',
+    'us-west-2': 'Z2OJLYMUO9EFXC',
+    'ap-east-1': 'Z3FD1VL90ND7K5',
+    'ap-south-1': 'Z3VO1THU9YC4UR',
+    'ap-northeast-2': 'Z20JF4UZKIW1U8',
+    'ap-southeast-1': 'ZL327KTPIQFUL',
+    'ap-southeast-2': 'Z2RPCDW04V8134',
+    'ap-northeast-1': 'Z1YSHQZHG15GKL',
+    'ca-central-1': 'Z19DQILCV0OWEC',
+    'eu-central-1': 'Z1U9ULNL0V5AJ3',
+    'eu-west-1': 'ZLY8HYME6SFDD',
+    'eu-west-2': 'ZJ5UAJN8Y3Z2Q',
+    'eu-west-3': 'Z3KY65QIEKYHQQ',
+    'eu-north-1': 'Z3UWIKFBOOGXPP',
+    'me-south-1': 'Z20ZBPC0SS8806',
+    'sa-east-1': 'ZCMLWB8V5SYIT',
 }
 
 # reference:
-#   https://docs.aws.amazon.com/general/latest/gr/rande.html#s3_region
+#   https://docs.aws.amazon.com/global-accelerator/latest/dg/dns-addressing-custom-domains.mapping-your-custom-domain.html  # noqa
+GLOBAL_ACCELERATOR_ZONE_ID = "Z2BJ6XQ5FK7U4H"
+
+# reference:
+#   https://docs.aws.amazon.com/general/latest/gr/s3.html#s3_website_region_endpoints  # noqa
 S3_WEBSITE_ZONE_IDS = {
     "s3-website.us-east-2.amazonaws.com": "Z2O1EMRO9K5GLX",
     "s3-website-us-east-1.amazonaws.com": "Z3AQBSTGFYJSTF",
     "s3-website-us-west-1.amazonaws.com": "Z2F56UZL2M1ACD",
     "s3-website-us-west-2.amazonaws.com": "Z3BJ6K6RIION7M",
+    "s3-website.af-south-1.amazonaws.com": "Z83WF9RJE8B12",
+    "s3-website.ap-east-1.amazonaws.com": "ZNB98KWMFR0R6",
     "s3-website.ca-central-1.amazonaws.com": "Z1QDHH18159H29",
     "s3-website.ap-south-1.amazonaws.com": "Z11RGJOFQNVJUP",
+    "s3-website.ap-northeast-3.amazonaws.com": "Z2YQB5RD63NC85",
     "s3-website.ap-northeast-2.amazonaws.com": "Z3W03O7B5YMIYP",
     "s3-website-ap-southeast-1.amazonaws.com": "Z3O0J2DXBE1FTB",
     "s3-website-ap-southeast-2.amazonaws.com": "Z1WCIGYICN2BYD",
@@ -53,7 +127,10 @@ S3_WEBSITE_ZONE_IDS = {
     "s3-website.eu-central-1.amazonaws.com": "Z21DNDUVLTQW6Q",
     "s3-website-eu-west-1.amazonaws.com": "Z1BKCTXD74EZPE",
     "s3-website.eu-west-2.amazonaws.com": "Z3GKZC51ZF0DB4",
+    "s3-website.eu-south-1.amazonaws.com": "Z30OZKI7KPW7MI",
     "s3-website.eu-west-3.amazonaws.com": "Z3R1K369G5AVDG",
+    "s3-website.eu-north-1.amazonaws.com": "Z3BAZG2TWCNX0D",
+    "s3-website.me-south-1.amazonaws.com": "Z1MPMWCPA7YB62",
     "s3-website-sa-east-1.amazonaws.com": "Z7KQH4QJS55SO",
 }
 
@@ -61,6 +138,52 @@ S3_WEBSITE_ZONE_IDS = {
 CF_DOMAIN = ".cloudfront.net."
 ELB_DOMAIN = ".elb.amazonaws.com."
 S3_WEBSITE_PREFIX = "s3-website"
+AWS_DOMAIN = "amazonaws.com"
+
+
+def _build_alias_target_zone_index():
+    index = {
+        "cloudfront.net": CLOUDFRONT_ZONE_ID,
+        "awsglobalaccelerator.com": GLOBAL_ACCELERATOR_ZONE_ID,
+    }
+    for region, zone_id in ELB_ZONE_IDS.items():
+        index["%s.elb.%s" % (region, AWS_DOMAIN)] = zone_id
+    for region, zone_id in NLB_ZONE_IDS.items():
+        index["elb.%s.%s" % (region, AWS_DOMAIN)] = zone_id
+    for region, zone_id in API_GATEWAY_ZONE_IDS.items():
+        index["execute-api.%s.%s" % (region, AWS_DOMAIN)] = zone_id
+    index.update(S3_WEBSITE_ZONE_IDS)
+    return index
+
+
+# Hosted zone ids of alias targets, keyed by the lower cased DNS suffix
+# (without the trailing dot) shared by every endpoint in the zone.
+ALIAS_TARGET_ZONE_IDS = _build_alias_target_zone_index()
+ALIAS_TARGET_MAX_LABELS = max(
+    suffix.count(".") + 1 for suffix in ALIAS_TARGET_ZONE_IDS
+)
+
+
+def get_alias_target_hosted_zone_id(dns_name):
+    """Return the hosted zone id of an AWS alias target, or None if
+    dns_name isn't the endpoint of a known AWS service.
+
+    The longest known suffix of dns_name wins, which makes lookups cost at
+    most ALIAS_TARGET_MAX_LABELS dict lookups whatever the size of the
+    index.
+    """
+    labels = dns_name.lower().rstrip(".").split(".")
+    for i in range(max(0, len(labels) - ALIAS_TARGET_MAX_LABELS),
+                   len(labels)):
+        zone_id = ALIAS_TARGET_ZONE_IDS.get(".".join(labels[i:]))
+        if zone_id:
+            return zone_id
+    return None
+
+
+# Route53 applies a RecordSetGroup as a single change batch, which can hold
+# at most 1000 changes.
+MAX_RECORD_SETS_PER_GROUP = 1000
 
 
 def get_record_set_md5(rs_name, rs_type):
@@ -72,6 +195,176 @@ def get_record_set_md5(rs_name, rs_type):
     return md5(rs_name + rs_type).hexdigest()
 
 
+def _record_set_name_and_type(record_set):
+    if isinstance(record_set, dict):
+        return record_set["Name"], record_set["Type"]
+    return record_set.Name, record_set.Type
+
+
+def _record_set_keys(record_set):
+    """Return the keys a record set is sharded by, across stacks and across
+    RecordSetGroups, both taken from the md5 of its name & type."""
+    digest = get_record_set_md5(*_record_set_name_and_type(record_set))
+    return int(digest[16:], 16), int(digest[:16], 16)
+
+
+def record_set_shard(record_set, shards):
+    """Return the shard of the stacks a record set is in, out of shards.
+
+    Stacks and RecordSetGroups are sharded by different halves of the md5
+    of the name & type, so the records of a stack are spread evenly across
+    its groups.
+    """
+    return jump_consistent_hash(_record_set_keys(record_set)[0], shards)
+
+
+def _shard_keys(keys, budget):
+    """Return the indexes of keys split into shards of at most budget."""
+    count = max(1, -(-len(keys) // budget))
+    while True:
+        shards = [[] for _ in range(count)]
+        for i, key in enumerate(keys):
+            shards[jump_consistent_hash(key, count)].append(i)
+        if max(len(shard) for shard in shards) <= budget:
+            return shards
+        count += 1
+
+
+def shard_record_sets(record_sets, budget):
+    """Split record sets into shards of at most budget record sets.
+
+    Records are assigned by the md5 of their name & type (the same sum used
+    for their logical id when they aren't sharded), so a record stays in the
+    same shard as long as the number of shards doesn't change. The number of
+    shards is the smallest that keeps every shard within budget, and when it
+    grows only the records landing in the new shards move.
+
+    Args:
+        record_sets (list): record_set dicts or troposphere objects.
+        budget (int): The maximum number of record sets in a shard.
+
+    Returns:
+        list: A list of lists of record sets, one per shard.
+    """
+    if budget < 1:
+        raise ValueError("The record set budget must be at least 1.")
+
+    keys = [_record_set_keys(rs)[1] for rs in record_sets]
+    return [
+        [record_sets[i] for i in shard]
+        for shard in _shard_keys(keys, budget)
+    ]
+
+
+def json_size(value, depth):
+    """Return the size of value in a template rendered the way stacker
+    renders it (indented by 4 spaces), at depth levels of nesting, with
+    the separator before it."""
+    text = json.dumps(encode_to_dict(value), indent=4, sort_keys=True,
+                      separators=(",", ": "))
+    return len(text) + (text.count("\n") + 1) * 4 * depth + 2
+
+
+def _describe_record_set(name, rs_type, set_identifier=None):
+    if set_identifier is None:
+        return "%s %s" % (name, rs_type)
+    return "%s %s (%s)" % (name, rs_type, set_identifier)
+
+
+class RecordSetIndex(object):
+    """Detects conflicting record sets in a single pass.
+
+    Every record set of a hosted zone is added to the index as it is
+    created. Problems are collected rather than raised, so that `check`
+    can report all of them at once, before CloudFormation finds the first
+    one:
+
+    - duplicate record sets (same name, type and SetIdentifier)
+    - CNAME records sharing a name with records of another type
+    - record sets of the same name and type mixing weighted and
+      non-weighted records, or weighted records with different TTLs
+    - distinct record sets that would get the same logical ID from
+      `get_record_set_md5`
+    """
+
+    def __init__(self):
+        self.problems = []
+        self._record_sets = set()
+        self._types = {}
+        self._policies = {}
+        self._logical_ids = {}
+
+    def add(self, record_set, logical_id=None):
+        """Index a troposphere record set.
+
+        Returns:
+            bool: Whether the record set was added without problems.
+        """
+        name = record_set.Name.lower().rstrip(".") + "."
+        rs_type = record_set.Type.upper()
+        set_identifier = getattr(record_set, "SetIdentifier", None)
+        description = _describe_record_set(name, rs_type, set_identifier)
+        problem_count = len(self.problems)
+
+        key = (name, rs_type, set_identifier)
+        if key in self._record_sets:
+            self.problems.append("Duplicate record set %s." % description)
+        self._record_sets.add(key)
+
+        types = self._types.setdefault(name, set())
+        if rs_type not in types:
+            if rs_type == "CNAME" and types:
+                self.problems.append(
+                    "CNAME record set %s conflicts with the %s record sets "
+                    "of the same name." % (description,
+                                           "/".join(sorted(types)))
+                )
+            elif "CNAME" in types:
+                self.problems.append(
+                    "Record set %s conflicts with the CNAME record set of "
+                    "the same name." % description
+                )
+        types.add(rs_type)
+
+        weighted = getattr(record_set, "Weight", None) is not None
+        policy = (weighted, set_identifier is not None,
+                  getattr(record_set, "TTL", None))
+        first = self._policies.setdefault((name, rs_type), policy)
+        if weighted and set_identifier is None:
+            self.problems.append(
+                "Weighted record set %s needs a SetIdentifier." % description
+            )
+        elif first[:2] != policy[:2]:
+            self.problems.append(
+                "Record set %s mixes weighted and non-weighted records." % (
+                    description)
+            )
+        elif weighted and first[2] != policy[2]:
+            self.problems.append(
+                "Weighted record set %s has TTL %s, other records of the "
+                "set have TTL %s." % (description, policy[2], first[2])
+            )
+
+        if logical_id is not None:
+            other = self._logical_ids.setdefault(logical_id, key)
+            if other != key:
+                self.problems.append(
+                    "Record sets %s and %s would share the logical ID %s." % (
+                        _describe_record_set(*other), description,
+                        logical_id)
+                )
+
+        return len(self.problems) == problem_count
+
+    def check(self):
+        """Raise a ValueError listing every problem found, if any."""
+        if self.problems:
+            raise ValueError(
+                "Found %d problem(s) with the record sets:\n  %s" % (
+                    len(self.problems), "\n  ".join(self.problems))
+            )
+
+
 def add_hosted_zone_id_if_missing(record_set, hosted_zone_id):
     """Add HostedZoneId to Trophosphere record_set object if missing."""
     if not getattr(record_set, "HostedZoneId", None):
@@ -80,6 +373,10 @@ def add_hosted_zone_id_if_missing(record_set, hosted_zone_id):
 
 
 class DNSRecords(Blueprint):
+    # Templates built from a zone file depend on its contents, not just on
+    # the variables.
+    CACHEABLE = staticmethod(lambda variables: not variables.get("ZoneFile"))
+
     VARIABLES = {
         "VPC": {
             "type": str,
@@ -118,24 +415,83 @@ class DNSRecords(Blueprint):
                            "Also accepts an optional 'Enabled' boolean.",
             "default": {}
         },
+        "ZoneFile": {
+            "type": str,
+            "description": "Path to a BIND zone file or CSV export (with "
+                           "Name, Type, TTL and Value columns) to read "
+                           "additional RecordSets from. The file is read "
+                           "line by line, and records with the same name "
+                           "and type are merged wherever they are in it.",
+            "default": "",
+        },
+        "ZoneFileFormat": {
+            "type": str,
+            "description": "Either 'bind' or 'csv'. By default files with a "
+                           ".csv extension are read as CSV, anything else "
+                           "as a BIND zone file.",
+            "default": "",
+        },
+        "ZoneFileOrigin": {
+            "type": str,
+            "description": "The origin for relative names in the zone file "
+                           "when it has no $ORIGIN directive. Defaults to "
+                           "HostedZoneName.",
+            "default": "",
+        },
+        "RecordSetGroupBudget": {
+            "type": int,
+            "description": "When set, RecordSets are packed into "
+                           "RecordSetGroups of at most this many record "
+                           "sets (max: %d) instead of creating one resource "
+                           "per record set, which keeps large zones under "
+                           "the CloudFormation resource limit (see Shards "
+                           "for the template size limit). Records are "
+                           "assigned to groups by the md5 of their name and "
+                           "type, so they don't move between groups as "
+                           "other records are added or removed. "
+                           "Default: 0 (disabled)" % (
+                               MAX_RECORD_SETS_PER_GROUP),
+            "default": 0,
+        },
+        "Shard": {
+            "type": int,
+            "description": "The shard of the record sets to create, from 0 "
+                           "to Shards - 1. Only the first shard creates "
+                           "RecordSetGroups.",
+            "default": 0,
+        },
+        "Shards": {
+            "type": int,
+            "description": "The number of stacks the record sets are split "
+                           "across, sharing the same variables but for "
+                           "Shard, for zones too large for a single "
+                           "template. Records are assigned to stacks by the "
+                           "md5 of their name and type. Requires "
+                           "HostedZoneId when more than 1. Default: 1",
+            "default": 1,
+        },
     }
 
     def add_hosted_zone_id_for_alias_target_if_missing(self, rs):
-        """Add proper hosted zone id to record set alias target if missing."""
+        """Add proper hosted zone id to record set alias target if missing.
+
+        Alias targets that aren't AWS endpoints are assumed to be records of
+        the hosted zone the record set is created in.
+        """
         alias_target = getattr(rs, "AliasTarget", None)
         if alias_target:
             hosted_zone_id = getattr(alias_target, "HostedZoneId", None)
             if not hosted_zone_id:
                 dns_name = alias_target.DNSName
-                if dns_name.endswith(CF_DOMAIN):
-                    alias_target.HostedZoneId = CLOUDFRONT_ZONE_ID
-                elif dns_name.endswith(ELB_DOMAIN):
-                    region = dns_name.split('.')[-5]
-                    alias_target.HostedZoneId = ELB_ZONE_IDS[region]
-                elif dns_name in S3_WEBSITE_ZONE_IDS:
-                    alias_target.HostedZoneId = S3_WEBSITE_ZONE_IDS[dns_name]
-                else:
-                    alias_target.HostedZoneId = self.hosted_zone_id
+                zone_id = get_alias_target_hosted_zone_id(dns_name)
+                if zone_id is None:
+                    if dns_name.lower().rstrip(".").endswith(AWS_DOMAIN):
+                        raise ValueError(
+                            "Unknown hosted zone for alias target %s, "
+                            "please set its HostedZoneId." % dns_name
+                        )
+                    zone_id = self.hosted_zone_id
+                alias_target.HostedZoneId = zone_id
         return rs
 
     def create_record_set(self, rs_dict):
@@ -144,24 +500,87 @@ class DNSRecords(Blueprint):
         rs = route53.RecordSetType.from_dict(record_set_md5, rs_dict)
         rs = add_hosted_zone_id_if_missing(rs, self.hosted_zone_id)
         rs = self.add_hosted_zone_id_for_alias_target_if_missing(rs)
-        return self.template.add_resource(rs)
+        if not self.record_set_index.add(rs, record_set_md5):
+            # Keep going to report every problem, see RecordSetIndex.check
+            if record_set_md5 in self.template.resources:
+                return rs
+        # Record sets of other shards are only checked for conflicts, and
+        # those over the resource limit are reported by check_template_size.
+        if (record_set_shard(rs, self.shards) == self.shard and
+                len(self.template.resources) <
+                CLOUDFORMATION_LIMITS["resources"]):
+            self.template.add_resource(rs)
+        return rs
 
     def create_record_set_group(self, name, g_dict):
         """Accept a record_set dict. Return a Troposphere record_set object."""
+        g_dict = dict(g_dict)
+        g_dict["RecordSets"] = [
+            self.add_hosted_zone_id_for_alias_target_if_missing(
+                route53.RecordSet.from_dict(None, rs_dict)
+            )
+            for rs_dict in g_dict.get("RecordSets", [])
+        ]
+        for record_set in g_dict["RecordSets"]:
+            self.record_set_index.add(record_set)
         rs = route53.RecordSetGroup.from_dict(name, g_dict)
         rs = add_hosted_zone_id_if_missing(rs, self.hosted_zone_id)
-        rs = self.add_hosted_zone_id_for_alias_target_if_missing(rs)
+        if self.shard:
+            # Only the first shard creates RecordSetGroups, the others only
+            # check their record sets for conflicts.
+            return rs
         return self.template.add_resource(rs)
 
+    def add_record_set_size(self, record_set, size):
+        """Track the size of a record set, in every shard, for
+        `check_template_size`."""
+        keys = _record_set_keys(record_set)
+        self.record_set_sizes.append(keys + (size,))
+        return jump_consistent_hash(keys[0], self.shards) == self.shard
+
     def create_record_sets(self, record_set_dicts):
         """Accept list of record_set dicts.
-        Return list of record_set objects."""
+        Return list of record_set objects of this shard."""
+        record_set_objects = []
+        for record_set_dict in record_set_dicts:
+            # pop removes the 'Enabled' key and tests if True.
+            if record_set_dict.pop('Enabled', True):
+                rs = self.create_record_set(record_set_dict)
+                size = json_size(rs, 2) + len(rs.title) + 4
+                if self.add_record_set_size(rs, size):
+                    record_set_objects.append(rs)
+        return record_set_objects
+
+    def create_sharded_record_sets(self, record_set_dicts, budget):
+        """Accept list of record_set dicts and pack the record sets of this
+        shard into RecordSetGroups of at most budget record sets.
+        Return list of record_set objects of this shard."""
+        if budget > MAX_RECORD_SETS_PER_GROUP:
+            raise ValueError(
+                "RecordSetGroupBudget can't be more than %d." % (
+                    MAX_RECORD_SETS_PER_GROUP)
+            )
+
         record_set_objects = []
         for record_set_dict in record_set_dicts:
             # pop removes the 'Enabled' key and tests if True.
             if record_set_dict.pop('Enabled', True):
-                record_set_objects.append(
-                    self.create_record_set(record_set_dict)
+                rs = route53.RecordSet.from_dict(None, record_set_dict)
+                rs = self.add_hosted_zone_id_for_alias_target_if_missing(rs)
+                self.record_set_index.add(rs)
+                # Record sets are nested 5 levels deep in their group.
+                if self.add_record_set_size(rs, json_size(rs, 5)):
+                    record_set_objects.append(rs)
+
+        for i, shard in enumerate(shard_record_sets(record_set_objects,
+                                                    budget)):
+            if shard:
+                self.template.add_resource(
+                    route53.RecordSetGroup(
+                        "RecordSetGroupShard%d" % i,
+                        HostedZoneId=self.hosted_zone_id,
+                        RecordSets=shard,
+                    )
                 )
         return record_set_objects
 
@@ -177,11 +596,74 @@ class DNSRecords(Blueprint):
                 )
         return record_set_groups
 
+    def shard_usage(self, shards, budget):
+        """Return the estimated (bytes, resources) of the template of each
+        shard, when the record sets are split across shards."""
+        members = [[] for _ in range(shards)]
+        for stack_key, group_key, size in self.record_set_sizes:
+            members[jump_consistent_hash(stack_key, shards)].append(
+                (group_key, size)
+            )
+
+        usage = []
+        for shard in members:
+            size = self.base_bytes + sum(s for _, s in shard)
+            resources = len(shard)
+            if budget and shard:
+                resources = sum(
+                    1 for group in _shard_keys([k for k, _ in shard], budget)
+                    if group
+                )
+                size += resources * self.group_bytes
+            usage.append((size, self.base_resources + resources))
+        return usage
+
+    def check_template_size(self, budget):
+        """Raise a ValueError if the template of this shard is estimated to
+        exceed the CloudFormation template size or resource limits, naming
+        the number of Shards needed.
+
+        Sizes are those of the template rendered by stacker, which indents
+        it, so they are estimated from the record sets rendered the same
+        way rather than by rendering the whole template again.
+        """
+        max_bytes = CLOUDFORMATION_LIMITS["bytes"]
+        max_resources = CLOUDFORMATION_LIMITS["resources"]
+
+        def fits(usage):
+            return usage[0] <= max_bytes and usage[1] <= max_resources
+
+        size, resources = self.shard_usage(self.shards, budget)[self.shard]
+        if fits((size, resources)):
+            return
+        if not fits((self.base_bytes, self.base_resources + 1)):
+            raise ValueError(
+                "Shard %d has no room left for record sets, its template "
+                "is %d bytes with %d resources without them." % (
+                    self.shard, self.base_bytes, self.base_resources)
+            )
+
+        total = sum(s for _, _, s in self.record_set_sizes)
+        needed = max(self.shards,
+                     -(-total // (max_bytes - self.base_bytes)))
+        while needed < len(self.record_set_sizes) and not all(
+            fits(usage) for usage in self.shard_usage(needed, budget)
+        ):
+            needed += 1
+        raise ValueError(
+            "Shard %d of the record sets needs about %d bytes and %d "
+            "resources, more than the %d bytes and %d resources allowed in "
+            "a template. Please split them across %d Shards%s." % (
+                self.shard, size, resources, max_bytes, max_resources,
+                needed, "" if budget else " or set RecordSetGroupBudget")
+        )
+
     def create_template(self):
         variables = self.get_variables()
         hosted_zone_name = variables["HostedZoneName"]
         hosted_zone_id = variables["HostedZoneId"]
         hosted_zone_comment = variables["Comment"]
+        self.shard, self.shards = variables["Shard"], variables["Shards"]
 
         if all([hosted_zone_comment, hosted_zone_id]):
             logger.warning(
@@ -197,6 +679,15 @@ class DNSRecords(Blueprint):
             raise ValueError("Please specify either a 'HostedZoneName' or "
                              "'HostedZoneId' variable.")
 
+        if self.shards < 1:
+            raise ValueError("Shards must be at least 1.")
+        if not 0 <= self.shard < self.shards:
+            raise ValueError("Shard must be between 0 and %d, got %d." % (
+                self.shards - 1, self.shard))
+        if self.shards > 1 and not hosted_zone_id:
+            raise ValueError("Sharded record sets need a 'HostedZoneId', "
+                             "as every shard would create the hosted zone.")
+
         if hosted_zone_id:
             self.hosted_zone_id = hosted_zone_id
 
@@ -230,5 +721,38 @@ class DNSRecords(Blueprint):
             Output("HostedZoneId", Value=self.hosted_zone_id)
         )
 
+        self.record_set_index = RecordSetIndex()
         self.create_record_set_groups(variables["RecordSetGroups"])
-        return self.create_record_sets(variables["RecordSets"])
+
+        self.record_set_sizes = []
+        self.base_bytes = len(self.template.to_json())
+        self.base_resources = len(self.template.resources)
+        # A group, without its record sets, nested in Resources.
+        self.group_bytes = json_size(
+            {"Properties": {"HostedZoneId": self.hosted_zone_id,
+                            "RecordSets": [{}]},
+             "Type": route53.RecordSetGroup.resource_type},
+            2
+        ) + len("RecordSetGroupShard%d" % self.shards) + 4
+
+        record_sets = variables["RecordSets"]
+        if variables["ZoneFile"]:
+            record_sets = chain(
+                record_sets,
+                read_zone_file(
+                    variables["ZoneFile"],
+                    origin=variables["ZoneFileOrigin"] or hosted_zone_name,
+                    file_format=variables["ZoneFileFormat"],
+                )
+            )
+
+        budget = variables["RecordSetGroupBudget"]
+        if budget:
+            record_set_objects = self.create_sharded_record_sets(
+                record_sets, budget
+            )
+        else:
+            record_set_objects = self.create_record_sets(record_sets)
+        self.record_set_index.check()
+        self.check_template_size(budget)
+        return record_set_objects
@@ -1,7 +1,23 @@
 from collections import Mapping
+import functools
+import importlib
 
 from troposphere import Tags
 
+# str and unicode on python 2, str on python 3.
+STRING_TYPES = (str, type(u""))
+
+# reference:
+#   https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/cloudformation-limits.html  # noqa
+# "bytes" is the limit for templates uploaded to S3, templates passed in
+# the request body are limited to 51200 bytes.
+CLOUDFORMATION_LIMITS = {
+    "bytes": 1024 * 1024,
+    "resources": 500,
+    "outputs": 200,
+    "parameters": 200,
+}
+
 
 def check_properties(properties, allowed_properties, resource):
     """Checks the list of properties in the properties variable against the
@@ -22,6 +38,20 @@ def check_properties(properties, allowed_properties, resource):
             )
 
 
+def jump_consistent_hash(key, num_buckets):
+    """Map an integer key to one of num_buckets buckets.
+
+    When num_buckets grows by one, only 1/num_buckets of the keys move, all
+    of them to the new bucket. See https://arxiv.org/abs/1406.2294
+    """
+    bucket, j = -1, 0
+    while j < num_buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
 def _tags_to_dict(tag_list):
     return dict((tag['Key'], tag['Value']) for tag in tag_list)
 
@@ -54,3 +84,80 @@ def merge_tags(left, right, factory=Tags):
         tags.update(_tags_to_dict(right))
 
     return factory(**tags)
+
+
+def _memoized(blueprint, name, compute):
+    """Return the value of compute, computed once per set of resolved
+    variables of blueprint and stored under name."""
+    variables = blueprint.get_variables()
+    memo = blueprint.__dict__.get("_memoized_properties")
+    if memo is None or memo[0] is not variables:
+        memo = (variables, {})
+        blueprint.__dict__["_memoized_properties"] = memo
+    values = memo[1]
+    if name not in values:
+        values[name] = compute()
+    return values[name]
+
+
+def memoized_property(method):
+    """A read-only property computed once per set of resolved variables.
+
+    Blueprint properties that are derived from variables are often read
+    several times while building a template, and some of them build
+    troposphere objects or run validations every time. This computes the
+    value on first access and returns the same value until the blueprint's
+    variables are resolved again.
+
+    Example::
+
+        class MyBlueprint(Blueprint):
+            @memoized_property
+            def tags(self):
+                return Tags(**self.get_variables()["Tags"])
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def getter(self):
+        return _memoized(self, name, lambda: method(self))
+
+    return property(getter)
+
+
+def memoized_method(method):
+    """Same as `memoized_property`, for methods taking no arguments that
+    are part of the API of a blueprint, so they keep being called."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self):
+        return _memoized(self, name, lambda: method(self))
+
+    return wrapper
+
+
+class LazyModule(object):
+    """Stand-in for a module that is only imported once it is used.
+
+    Use it for modules that are expensive to import and only needed by
+    some of the code of a module, like the awacs service modules (which
+    define an Action for every API call of the service)::
+
+        s3 = LazyModule("awacs.s3")
+        ...
+        s3.GetObject  # awacs.s3 is imported here
+    """
+
+    def __init__(self, name):
+        self.__dict__["_lazy_name"] = name
+
+    def __getattr__(self, attr):
+        # Only called for attributes that aren't in __dict__ yet, which
+        # after the first call are only the ones the module doesn't have.
+        module = importlib.import_module(self._lazy_name)
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return "<lazy module %r>" % self._lazy_name
@@ -0,0 +1,303 @@
+"""Stream DNS records out of BIND zone files and CSV exports.
+
+Both readers are generators that yield one dictionary per record set, in the
+format accepted by the RecordSets variable of
+:class:`stacker_blueprints.route53.DNSRecords`::
+
+    {
+        "Name": "www.example.com.",
+        "Type": "A",
+        "TTL": "300",
+        "ResourceRecords": ["10.0.0.1", "10.0.0.2"],
+    }
+
+Names are fully qualified and lower cased, TTLs are converted to seconds.
+Records with the same name and type are merged into a single record set,
+wherever they are in the file. Files are read line by line, and only the
+record sets, not the lines they were parsed from, are kept in memory.
+
+SOA records and the NS records of the zone apex are skipped, since Route53
+manages those for the hosted zone.
+"""
+from collections import OrderedDict
+import csv
+import re
+
+# Record types Route53 supports
+RECORD_TYPES = (
+    "A", "AAAA", "CAA", "CNAME", "DS", "MX", "NAPTR", "NS", "PTR", "SPF",
+    "SRV", "TXT",
+)
+
+CLASSES = ("IN", "CH", "HS")
+
+DEFAULT_TTL = 300
+
+TTL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+TTL_RE = re.compile(r"^(\d+[smhdw]?)+$", re.IGNORECASE)
+TTL_PART_RE = re.compile(r"(\d+)([smhdw]?)", re.IGNORECASE)
+
+# The position of the domain name in the rdata of types that hold one.
+NAME_RDATA_INDEX = {
+    "CNAME": 0,
+    "NS": 0,
+    "PTR": 0,
+    "MX": 1,
+    "SRV": 3,
+}
+
+
+def parse_ttl(value):
+    """Convert a BIND TTL (300, 5m, 1h30m, 1w, ...) to seconds."""
+    if not TTL_RE.match(value):
+        raise ValueError("Invalid TTL '%s'" % value)
+    return sum(
+        int(number) * TTL_UNITS[unit.lower() or "s"]
+        for number, unit in TTL_PART_RE.findall(value)
+    )
+
+
+def qualify_name(name, origin):
+    """Return the fully qualified, lower cased version of a name."""
+    if name == "@":
+        if not origin:
+            raise ValueError("'@' used without an origin.")
+        name = origin
+    elif not name.endswith("."):
+        if not origin:
+            raise ValueError(
+                "Relative name '%s' used without an origin." % name
+            )
+        name = "%s.%s" % (name, origin)
+    return name.lower()
+
+
+def normalize_origin(origin):
+    if not origin:
+        return ""
+    return origin.lower().rstrip(".") + "."
+
+
+def split_zone_line(line):
+    """Split a zone file line into tokens.
+
+    Comments are dropped and quoted strings are kept as a single token,
+    quotes included.
+
+    Returns:
+        tuple: The list of tokens, and how much the line changes the
+            parenthesis nesting level.
+    """
+    tokens = []
+    token = ""
+    parens = 0
+    quoted = escaped = False
+    for char in line:
+        if escaped:
+            token += char
+            escaped = False
+        elif char == "\\":
+            token += char
+            escaped = True
+        elif quoted:
+            token += char
+            quoted = char != '"'
+        elif char == '"':
+            token += char
+            quoted = True
+        elif char == ";":
+            break
+        elif char in "()" or char.isspace():
+            if token:
+                tokens.append(token)
+                token = ""
+            if char == "(":
+                parens += 1
+            elif char == ")":
+                parens -= 1
+        else:
+            token += char
+    if token:
+        tokens.append(token)
+    return tokens, parens
+
+
+def zone_file_entries(lines):
+    """Yield (owner_omitted, tokens) for each entry of a zone file.
+
+    Entries spanning several lines in parentheses are joined together.
+    """
+    tokens = []
+    parens = 0
+    owner_omitted = False
+    for line in lines:
+        line_tokens, delta = split_zone_line(line)
+        if not parens:
+            owner_omitted = line[:1].isspace()
+        tokens.extend(line_tokens)
+        parens += delta
+        if parens < 0:
+            raise ValueError("Unbalanced parentheses in zone file.")
+        if parens or not tokens:
+            continue
+        yield owner_omitted, tokens
+        tokens = []
+    if parens:
+        raise ValueError("Unbalanced parentheses in zone file.")
+
+
+def parse_zone_lines(lines, origin=""):
+    """Yield one record dictionary per resource record in a zone file.
+
+    Records aren't merged; see `merge_record_sets`.
+
+    Args:
+        lines (iterable): The lines of a BIND zone file.
+        origin (str): The origin used for relative names until a $ORIGIN
+            directive is found.
+    """
+    origin = normalize_origin(origin)
+    default_ttl = None
+    last_ttl = None
+    last_name = None
+    for owner_omitted, tokens in zone_file_entries(lines):
+        directive = tokens[0].upper()
+        if directive == "$ORIGIN":
+            origin = normalize_origin(qualify_name(tokens[1], origin))
+            continue
+        if directive == "$TTL":
+            default_ttl = parse_ttl(tokens[1])
+            continue
+        if directive.startswith("$"):
+            raise ValueError("Unsupported zone file directive %s" %
+                             tokens[0])
+
+        if owner_omitted:
+            if last_name is None:
+                raise ValueError("The first record of a zone file must "
+                                 "have a name.")
+            name = last_name
+        else:
+            name = qualify_name(tokens.pop(0), origin)
+        last_name = name
+
+        ttl = None
+        while tokens and (TTL_RE.match(tokens[0]) or
+                          tokens[0].upper() in CLASSES):
+            token = tokens.pop(0)
+            if token.upper() not in CLASSES:
+                ttl = last_ttl = parse_ttl(token)
+
+        if not tokens:
+            raise ValueError("Missing record type for %s" % name)
+        record_type = tokens.pop(0).upper()
+
+        if record_type == "SOA":
+            if default_ttl is None and len(tokens) == 7:
+                # Without $TTL the SOA minimum is the default (RFC 1035)
+                default_ttl = parse_ttl(tokens[6])
+            continue
+        if record_type == "NS" and name == origin:
+            continue
+        if record_type not in RECORD_TYPES:
+            raise ValueError("Unsupported record type %s for %s" % (
+                record_type, name))
+
+        index = NAME_RDATA_INDEX.get(record_type)
+        if index is not None and index < len(tokens):
+            tokens[index] = qualify_name(tokens[index], origin)
+
+        if ttl is None:
+            ttl = default_ttl or last_ttl or DEFAULT_TTL
+
+        yield {
+            "Name": name,
+            "Type": record_type,
+            "TTL": str(ttl),
+            "ResourceRecords": [" ".join(tokens)],
+        }
+
+
+def parse_csv_lines(lines, origin=""):
+    """Yield one record dictionary per row of a CSV export.
+
+    The first row must be a header with (case insensitive) Name, Type, TTL
+    and Value columns. Empty TTLs use the default TTL.
+    """
+    origin = normalize_origin(origin)
+    reader = csv.reader(lines)
+    header = [column.strip().lower() for column in next(reader)]
+    try:
+        columns = [header.index(c) for c in ("name", "type", "ttl", "value")]
+    except ValueError:
+        raise ValueError("CSV zone files need Name, Type, TTL and Value "
+                         "columns.")
+
+    for row in reader:
+        if not any(row):
+            continue
+        name, record_type, ttl, value = [row[i].strip() for i in columns]
+        name = qualify_name(name, origin)
+        record_type = record_type.upper()
+        if record_type == "SOA" or (record_type == "NS" and name == origin):
+            continue
+        if record_type not in RECORD_TYPES:
+            raise ValueError("Unsupported record type %s for %s" % (
+                record_type, name))
+
+        rdata = value.split()
+        index = NAME_RDATA_INDEX.get(record_type)
+        if index is not None and index < len(rdata):
+            rdata[index] = qualify_name(rdata[index], origin)
+            value = " ".join(rdata)
+
+        yield {
+            "Name": name,
+            "Type": record_type,
+            "TTL": str(parse_ttl(ttl) if ttl else DEFAULT_TTL),
+            "ResourceRecords": [value],
+        }
+
+
+def merge_record_sets(records):
+    """Merge records with the same name and type, adjacent or not.
+
+    Record sets are yielded in the order their first record appears, once
+    every record has been read.
+    """
+    record_sets = OrderedDict()
+    for record in records:
+        key = (record["Name"], record["Type"])
+        if key in record_sets:
+            record_sets[key]["ResourceRecords"].extend(
+                record["ResourceRecords"]
+            )
+        else:
+            record_sets[key] = record
+    for record_set in record_sets.values():
+        yield record_set
+
+
+def read_zone_file(path, origin="", file_format=""):
+    """Read the record sets of a BIND zone file or CSV export.
+
+    Args:
+        path (str): Path to the zone file.
+        origin (str): The origin for relative names. A $ORIGIN directive in
+            the zone file takes precedence.
+        file_format (str): Either "bind" or "csv". By default, files with a
+            .csv extension are read as CSV and anything else as BIND.
+    """
+    file_format = (file_format or
+                   ("csv" if path.lower().endswith(".csv") else "bind"))
+    if file_format == "csv":
+        parser = parse_csv_lines
+    elif file_format == "bind":
+        parser = parse_zone_lines
+    else:
+        raise ValueError("Unknown zone file format '%s'" % file_format)
+
+    with open(path) as lines:
+        for record_set in merge_record_sets(parser(lines, origin)):
+            yield record_set
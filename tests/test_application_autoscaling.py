@@ -0,0 +1,75 @@
+import unittest
+
+from stacker_blueprints.application_autoscaling import (
+    pre_warm_schedules,
+    restore_schedules,
+    scheduled_actions,
+)
+
+
+class TestPreWarmSchedules(unittest.TestCase):
+    def test_schedules(self):
+        peaks = [
+            {"name": "morning", "start": "08:00", "end": "10:30",
+             "days": "MON-FRI", "min": 60},
+            {"name": "midnight", "start": "00:10", "end": "01:00",
+             "lead": 30, "min": 20},
+        ]
+        self.assertEqual(pre_warm_schedules(peaks, 5), [
+            {"name": "morning-pre-warm",
+             "schedule": "cron(45 7 ? * MON-FRI *)", "min": 60},
+            {"name": "morning-cool-down",
+             "schedule": "cron(30 10 ? * MON-FRI *)", "min": 5},
+            {"name": "midnight-pre-warm", "schedule": "cron(40 23 * * ? *)",
+             "min": 20},
+            {"name": "midnight-cool-down", "schedule": "cron(0 1 * * ? *)",
+             "min": 5},
+        ])
+
+    def test_lead_before_midnight_on_some_days(self):
+        peaks = [{"name": "early", "start": "00:05", "end": "01:00",
+                  "days": "MON", "min": 10}]
+        with self.assertRaises(ValueError):
+            pre_warm_schedules(peaks, 1)
+
+    def test_invalid_time(self):
+        for value in ("8am", "24:00", "08:60"):
+            peaks = [{"name": "peak", "start": value, "end": "10:00",
+                      "min": 10}]
+            with self.assertRaises(ValueError):
+                pre_warm_schedules(peaks, 1)
+
+
+class TestScheduledActions(unittest.TestCase):
+    def test_needs_min_or_max(self):
+        with self.assertRaises(ValueError):
+            scheduled_actions([{"name": "noop", "schedule": "rate(1 day)"}])
+
+
+class TestRestoreSchedules(unittest.TestCase):
+    def test_restores_at_end(self):
+        schedules = [
+            {"name": "batch", "schedule": "cron(0 2 * * ? *)",
+             "end": "cron(0 4 * * ? *)", "min": 40, "max": 200},
+            {"name": "quiet", "schedule": "cron(0 22 * * ? *)", "min": 5},
+        ]
+        self.assertEqual(restore_schedules(schedules, 5, 50), [
+            {"name": "batch", "schedule": "cron(0 2 * * ? *)", "min": 40,
+             "max": 200},
+            {"name": "batch-restore", "schedule": "cron(0 4 * * ? *)",
+             "min": 5, "max": 50},
+            {"name": "quiet", "schedule": "cron(0 22 * * ? *)", "min": 5},
+        ])
+
+    def test_out_of_range_needs_end(self):
+        for schedule in ({"min": 40, "max": 200}, {"min": 1}, {"max": 60}):
+            schedule = dict(schedule, name="batch",
+                            schedule="cron(0 2 * * ? *)")
+            with self.assertRaises(ValueError):
+                restore_schedules([schedule], 5, 50)
+
+    def test_min_above_max(self):
+        with self.assertRaises(ValueError):
+            restore_schedules([{"name": "batch", "schedule": "rate(1 day)",
+                                "end": "rate(2 days)", "min": 20,
+                                "max": 10}], 5, 50)
@@ -1,11 +1,17 @@
+import re
 from types import MethodType
 
 from stacker.context import Context
 from stacker.config import Config
 from stacker.variables import Variable
-from stacker_blueprints.aws_lambda import Function, FunctionScheduler
+from stacker_blueprints.aws_lambda import (
+    Function,
+    FunctionScheduler,
+    Functions,
+)
 from stacker.blueprints.testutil import BlueprintTestCase
 
+from troposphere import Ref
 from troposphere.awslambda import Code
 
 from awacs.aws import Statement, Allow
@@ -109,6 +115,83 @@ class TestBlueprint(BlueprintTestCase):
         blueprint.create_template()
         self.assertRenderedBlueprint(blueprint)
 
+    def test_create_template_with_concurrency(self):
+        blueprint = self.create_blueprint(
+            'test_aws_lambda_Function_with_concurrency'
+        )
+
+        self.common_variables["AliasName"] = "prod"
+        self.common_variables["AliasVersion"] = "1"
+        self.common_variables["ReservedConcurrentExecutions"] = 100
+        self.common_variables["ProvisionedConcurrency"] = {
+            "min": 5,
+            "max": 50,
+            "target": 0.75,
+            "schedules": [
+                {
+                    "name": "morning-peak",
+                    "schedule": "cron(0 8 * * ? *)",
+                    "end": "cron(0 11 * * ? *)",
+                    "min": 20,
+                    "max": 100,
+                },
+            ],
+        }
+
+        blueprint.resolve_variables(self.generate_variables())
+        blueprint.create_template()
+        self.assertRenderedBlueprint(blueprint)
+
+    def test_provisioned_concurrency_without_scaling(self):
+        blueprint = self.create_blueprint('test_aws_lambda_Function')
+        self.common_variables["AliasName"] = "prod"
+        self.common_variables["AliasVersion"] = "1"
+        self.common_variables["ProvisionedConcurrency"] = {"min": 5}
+
+        blueprint.resolve_variables(self.generate_variables())
+        blueprint.create_template()
+        resources = blueprint.template.resources
+        self.assertEqual(
+            resources["Alias"].ProvisionedConcurrencyConfig.to_dict(),
+            {"ProvisionedConcurrentExecutions": 5}
+        )
+        self.assertNotIn("ProvisionedConcurrencyScalableTarget", resources)
+
+    def test_provisioned_concurrency_needs_min(self):
+        blueprint = self.create_blueprint('test_aws_lambda_Function')
+        self.common_variables["AliasName"] = "prod"
+        self.common_variables["AliasVersion"] = "1"
+        self.common_variables["ProvisionedConcurrency"] = {"max": 10}
+        blueprint.resolve_variables(self.generate_variables())
+        with self.assertRaises(ValueError) as cm:
+            blueprint.create_template()
+        self.assertIn("needs a min", str(cm.exception))
+
+    def test_provisioned_concurrency_schedules_need_an_end(self):
+        blueprint = self.create_blueprint('test_aws_lambda_Function')
+        self.common_variables["AliasName"] = "prod"
+        self.common_variables["AliasVersion"] = "1"
+        self.common_variables["ProvisionedConcurrency"] = {
+            "min": 5,
+            "max": 50,
+            "schedules": [
+                {"name": "peak", "schedule": "cron(0 8 * * ? *)",
+                 "max": 100},
+            ],
+        }
+        blueprint.resolve_variables(self.generate_variables())
+        with self.assertRaises(ValueError):
+            blueprint.create_template()
+
+    def test_provisioned_concurrency_needs_published_alias(self):
+        for alias_variables in ({}, {"AliasName": "prod"}):
+            blueprint = self.create_blueprint('test_aws_lambda_Function')
+            self.common_variables.update(alias_variables)
+            self.common_variables["ProvisionedConcurrency"] = {"min": 5}
+            blueprint.resolve_variables(self.generate_variables())
+            with self.assertRaises(ValueError):
+                blueprint.create_template()
+
     def test_create_template_event_source_mapping(self):
         blueprint = self.create_blueprint(
             'test_aws_lambda_Function_event_source_mapping'
@@ -123,6 +206,126 @@ class TestBlueprint(BlueprintTestCase):
         blueprint.create_template()
         self.assertRenderedBlueprint(blueprint)
 
+    def test_create_template_event_source_throughput(self):
+        blueprint = self.create_blueprint(
+            'test_aws_lambda_Function_event_source_throughput'
+        )
+        self.common_variables["EventSourceMapping"] = {
+            "EventSourceArn": "arn:aws:kinesis:us-east-1:12345:stream/"
+                              "FakeStream",
+            "StartingPosition": "LATEST",
+            "BatchSize": 10,
+        }
+        self.common_variables["EventSourceThroughput"] = {
+            "batch-size": 500,
+            "batching-window": 5,
+            "parallelization-factor": 4,
+            "bisect-on-error": True,
+            "max-record-age": 3600,
+        }
+        self.common_variables["IteratorAgeAlarm"] = {
+            "threshold": 60000,
+            "alarm-actions": ["arn:aws:sns:us-east-1:12345:alerts"],
+        }
+
+        blueprint.resolve_variables(self.generate_variables())
+        blueprint.create_template()
+        self.assertRenderedBlueprint(blueprint)
+
+    def test_event_source_mapping_sqs(self):
+        blueprint = self.create_blueprint('test_aws_lambda_Function_sqs')
+        self.common_variables["EventSourceMapping"] = {
+            "EventSourceArn": "arn:aws:sqs:us-east-1:12345:queue",
+        }
+        self.common_variables["EventSourceThroughput"] = {
+            "batch-size": 100,
+            "batching-window": 10,
+        }
+        blueprint.resolve_variables(self.generate_variables())
+        blueprint.create_template()
+        mapping = blueprint.template.resources["EventSourceMapping"]
+        self.assertEqual(mapping.BatchSize, 100)
+        policy = blueprint.template.resources["Policy"]
+        actions = [
+            action.JSONrepr()
+            for statement in policy.PolicyDocument.Statement
+            for action in statement.Action
+        ]
+        self.assertIn("sqs:ReceiveMessage", actions)
+
+    def test_event_source_mapping_validation(self):
+        blueprint = self.create_blueprint('test_aws_lambda_Function_sqs')
+        self.common_variables["EventSourceMapping"] = {
+            "EventSourceArn": "arn:aws:sqs:us-east-1:12345:queue",
+            "StartingPosition": "LATEST",
+        }
+        self.common_variables["EventSourceThroughput"] = {
+            "batch-size": 100,
+            "parallelization-factor": 2,
+        }
+        blueprint.resolve_variables(self.generate_variables())
+        with self.assertRaises(ValueError) as cm:
+            blueprint.create_template()
+        message = str(cm.exception)
+        self.assertIn("ParallelizationFactor isn't supported", message)
+        self.assertIn("StartingPosition isn't supported", message)
+        self.assertIn("BatchSize over 10 needs a", message)
+
+    def test_event_source_mapping_stream_limits(self):
+        blueprint = self.create_blueprint('test_aws_lambda_Function_stream')
+        self.common_variables["EventSourceMapping"] = {
+            "EventSourceArn": "arn:aws:dynamodb:us-east-1:12345:table/"
+                              "FakeTable/stream/FakeStream",
+        }
+        self.common_variables["EventSourceThroughput"] = {
+            "parallelization-factor": 20,
+            "starting-position": "AT_TIMESTAMP",
+        }
+        blueprint.resolve_variables(self.generate_variables())
+        with self.assertRaises(ValueError) as cm:
+            blueprint.create_template()
+        message = str(cm.exception)
+        self.assertIn("ParallelizationFactor must be between 1 and 10",
+                      message)
+        self.assertIn("StartingPosition must be one of TRIM_HORIZON, LATEST",
+                      message)
+
+    def test_event_source_mapping_other_sources(self):
+        blueprint = self.create_blueprint('test_aws_lambda_Function_kafka')
+        self.common_variables["Role"] = "my-fake-role"
+        self.common_variables["EventSourceMapping"] = {
+            "EventSourceArn": "arn:aws:kafka:us-east-1:12345:cluster/"
+                              "FakeCluster/abcd",
+            "StartingPosition": "LATEST",
+            "BatchSize": 20000,
+        }
+        blueprint.resolve_variables(self.generate_variables())
+        blueprint.create_template()
+        mapping = blueprint.template.resources["EventSourceMapping"]
+        self.assertEqual(mapping.BatchSize, 20000)
+
+    def test_event_source_mapping_intrinsic_values(self):
+        for arn, mapping in (
+            ("arn:aws:kinesis:us-east-1:12345:stream/FakeStream", {
+                "StartingPosition": "LATEST",
+                "BatchSize": Ref("BatchSize"),
+                "MaximumRecordAgeInSeconds": Ref("RecordAge"),
+            }),
+            ("arn:aws:sqs:us-east-1:12345:FakeQueue", {
+                "BatchSize": Ref("BatchSize"),
+            }),
+        ):
+            blueprint = self.create_blueprint('test_aws_lambda_Function')
+            self.common_variables["EventSourceMapping"] = dict(
+                mapping, EventSourceArn=arn
+            )
+            blueprint.resolve_variables(self.generate_variables())
+            blueprint.create_template()
+            self.assertEqual(
+                blueprint.template.resources["EventSourceMapping"].BatchSize,
+                Ref("BatchSize")
+            )
+
     def test_create_template_extended_statements(self):
         blueprint = self.create_blueprint(
             'test_aws_lambda_Function_extended_statements'
@@ -148,6 +351,109 @@ class TestBlueprint(BlueprintTestCase):
         self.assertRenderedBlueprint(blueprint)
 
 
+class TestFunctions(BlueprintTestCase):
+    def setUp(self):
+        self.ctx = Context(config=Config({'namespace': 'test'}))
+
+    def functions(self, count):
+        return dict(
+            ("Function%d" % i, {
+                "Code": {"S3Bucket": "test_bucket", "S3Key": "code%d" % i},
+                "Handler": "handler",
+                "Runtime": "python3.8",
+            })
+            for i in range(count)
+        )
+
+    def test_create_template(self):
+        blueprint = Functions('test_aws_lambda_Functions', self.ctx)
+        functions = self.functions(2)
+        functions["Function1"]["VpcConfig"] = {
+            "SecurityGroupIds": ["sg-1"],
+            "SubnetIds": ["subnet-1"],
+        }
+        blueprint.resolve_variables(
+            [
+                Variable("Functions", functions),
+                Variable("AliasName", "live"),
+            ]
+        )
+        blueprint.create_template()
+        self.assertRenderedBlueprint(blueprint)
+
+    def test_external_role(self):
+        blueprint = Functions('test_aws_lambda_Functions', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable("Functions", self.functions(2)),
+                Variable("Role", "arn:aws:iam::12345:role/shared"),
+            ]
+        )
+        blueprint.create_template()
+        resources = blueprint.template.resources
+        self.assertEqual(
+            sorted(re.sub("Version[0-9a-f]{8}$", "Version", r)
+                   for r in resources),
+            ["Function0", "Function0Version", "Function1",
+             "Function1Version"]
+        )
+        self.assertEqual(resources["Function0"].Role,
+                         "arn:aws:iam::12345:role/shared")
+
+    def test_new_version_on_change(self):
+        def alias_version(functions):
+            blueprint = Functions('test_aws_lambda_Functions', self.ctx)
+            blueprint.resolve_variables([
+                Variable("Functions", functions),
+                Variable("AliasName", "live"),
+            ])
+            blueprint.create_template()
+            alias = blueprint.template.resources["Function0Alias"]
+            return alias.FunctionVersion.data["Fn::GetAtt"][0]
+
+        functions = self.functions(1)
+        version = alias_version(functions)
+        self.assertEqual(alias_version(self.functions(1)), version)
+        functions["Function0"]["Code"]["S3Key"] = "code0-v2"
+        self.assertNotEqual(alias_version(functions), version)
+
+    def test_policy_split_across_managed_policies(self):
+        blueprint = Functions('test_aws_lambda_Functions', self.ctx)
+        blueprint.resolve_variables(
+            [Variable("Functions", self.functions(80))]
+        )
+        blueprint.create_template()
+        resources = blueprint.template.resources
+        self.assertEqual(
+            sorted(name for name in resources if name.startswith("Policy")),
+            ["Policy", "Policy2"]
+        )
+        policies = [resources["Policy"], resources["Policy2"]]
+        self.assertEqual(
+            [policy.resource_type for policy in policies],
+            ["AWS::IAM::ManagedPolicy"] * 2
+        )
+        logged = sum(
+            len(policy.PolicyDocument.Statement[0].Resource)
+            for policy in policies
+        )
+        self.assertEqual(logged, 80)
+        self.assertIn("Policy2Arn", blueprint.template.outputs)
+        self.assertNotIn("PolicyName", blueprint.template.outputs)
+
+    def test_too_many_functions(self):
+        blueprint = Functions('test_aws_lambda_Functions', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable("Functions", self.functions(100)),
+                Variable("AliasName", "live"),
+            ]
+        )
+        with self.assertRaises(ValueError) as cm:
+            blueprint.create_template()
+        self.assertIn("100 functions need 205 outputs", str(cm.exception))
+
+
 class TestFunctionScheduler(BlueprintTestCase):
     def setUp(self):
         self.ctx = Context({'namespace': 'test'})
@@ -179,3 +485,77 @@ class TestFunctionScheduler(BlueprintTestCase):
         )
         blueprint.create_template()
         self.assertRenderedBlueprint(blueprint)
+
+    def test_create_template_warm_up(self):
+        blueprint = FunctionScheduler(
+            'test_aws_lambda_FunctionScheduler_warm_up', self.ctx
+        )
+        functions = dict(
+            ("api-%d" % i,
+             "arn:aws:lambda:us-east-1:01234:function:api-%d" % i)
+            for i in range(6)
+        )
+        # The same function twice is warmed up once, at the highest
+        # concurrency.
+        functions["api-0-again"] = {
+            "arn": "arn:aws:lambda:us-east-1:01234:function:api-0",
+            "concurrency": 5,
+        }
+        blueprint.resolve_variables(
+            [
+                Variable(
+                    "WarmUp",
+                    {
+                        "functions": functions,
+                        "concurrency": 2,
+                        "payload": {"source": "warmer"},
+                    }
+                )
+            ]
+        )
+        blueprint.create_template()
+        self.assertRenderedBlueprint(blueprint)
+
+    def test_scheduler_and_warm_up(self):
+        blueprint = FunctionScheduler('test_aws_lambda_FunctionScheduler',
+                                      self.ctx)
+        arn = "arn:aws:lambda:us-east-1:01234:function:fn"
+        blueprint.resolve_variables(
+            [
+                Variable(
+                    "CloudwatchEventsRule",
+                    {
+                        "FnSchedule": {
+                            "ScheduleExpression": "rate(1 hour)",
+                            "State": "ENABLED",
+                            "Targets": [{"Id": "Fn", "Arn": arn}],
+                        }
+                    }
+                ),
+                Variable("WarmUp", {"functions": {"Fn": arn}}),
+            ]
+        )
+        blueprint.create_template()
+        resources = blueprint.template.resources
+        self.assertIn("PermToInvokeFunctionForFn", resources)
+        self.assertIn("WarmUpPermForFn", resources)
+
+    def test_warm_up_validation(self):
+        blueprint = FunctionScheduler(
+            'test_aws_lambda_FunctionScheduler_warm_up', self.ctx
+        )
+        blueprint.resolve_variables([])
+        with self.assertRaises(ValueError):
+            blueprint.create_template()
+
+        blueprint.resolve_variables(
+            [
+                Variable(
+                    "WarmUp",
+                    {"functions": {"api": {"arn": "arn", "concurrency": 0}}}
+                )
+            ]
+        )
+        with self.assertRaises(ValueError) as cm:
+            blueprint.create_template()
+        self.assertIn("concurrency of api", str(cm.exception))
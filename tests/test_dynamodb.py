@@ -0,0 +1,134 @@
+import unittest
+
+from stacker.context import Context
+from stacker.variables import Variable
+
+from stacker_blueprints.dynamodb import (
+    AutoScaling,
+    AutoScalingRole,
+    DAXCluster,
+    shard_autoscaling_configs,
+)
+
+DAX_VARIABLES = {
+    "Tables": ["test-user-table"],
+    "VpcId": "vpc-123456",
+    "Subnets": ["subnet-123456"],
+}
+
+TABLE_CONFIGS = [
+    {"table": "test-table-%d" % i, "read": {"max": 100},
+     "write": {"max": 100}}
+    for i in range(150)
+]
+
+
+def create_blueprint(cls, variables):
+    blueprint = cls("test_dynamodb", Context({"namespace": "test"}))
+    blueprint.resolve_variables([Variable(k, v) for k, v in variables.items()])
+    blueprint.create_template()
+    return blueprint
+
+
+class TestShardAutoScalingConfigs(unittest.TestCase):
+    def test_shards(self):
+        shards = shard_autoscaling_configs(TABLE_CONFIGS, 3)
+        self.assertEqual(len(shards), 3)
+        self.assertEqual(sorted(sum(shards, []), key=lambda c: c["table"]),
+                         sorted(TABLE_CONFIGS, key=lambda c: c["table"]))
+        self.assertTrue(all(shards))
+
+    def test_tables_only_move_to_new_shards(self):
+        before = shard_autoscaling_configs(TABLE_CONFIGS, 3)
+        after = shard_autoscaling_configs(TABLE_CONFIGS, 4)
+        for old, new in zip(before, after):
+            self.assertTrue(all(config in old for config in new))
+
+    def test_invalid_shards(self):
+        with self.assertRaises(ValueError):
+            shard_autoscaling_configs(TABLE_CONFIGS, 0)
+
+
+class TestAutoScaling(unittest.TestCase):
+    def test_too_many_resources(self):
+        with self.assertRaises(ValueError) as cm:
+            create_blueprint(AutoScaling,
+                             {"AutoScalingConfigs": TABLE_CONFIGS})
+        self.assertIn("needs 601 resources", str(cm.exception))
+        self.assertIn("across 2 Shards", str(cm.exception))
+
+    def test_shards(self):
+        resources = 0
+        for shard in range(2):
+            blueprint = create_blueprint(AutoScaling, {
+                "AutoScalingConfigs": TABLE_CONFIGS,
+                "RoleArn": "arn:aws:iam::123456789012:role/autoscaling",
+                "Shard": shard,
+                "Shards": 2,
+            })
+            self.assertNotIn("Role", blueprint.template.resources)
+            resources += len(blueprint.template.resources)
+        self.assertEqual(resources, 600)
+
+    def test_empty_shard(self):
+        configs = [{"table": "test-table-0", "read": {"max": 100}}]
+        empty = [shard for shard, shard_configs in enumerate(
+            shard_autoscaling_configs(configs, 2)) if not shard_configs]
+        self.assertEqual(len(empty), 1)
+
+        blueprint = create_blueprint(AutoScaling, {
+            "AutoScalingConfigs": configs,
+            "Shard": empty[0],
+            "Shards": 2,
+        })
+        resources = blueprint.template.resources
+        self.assertEqual(list(resources), ["Role"])
+        statements = resources["Role"].Policies[0].PolicyDocument.Statement
+        self.assertEqual(len(statements), 1)
+
+        blueprint = create_blueprint(AutoScaling, {
+            "AutoScalingConfigs": configs,
+            "RoleArn": "arn:aws:iam::123456789012:role/autoscaling",
+            "Shard": empty[0],
+            "Shards": 2,
+        })
+        self.assertEqual(list(blueprint.template.resources), ["Placeholder"])
+
+    def test_invalid_shard(self):
+        with self.assertRaises(ValueError):
+            create_blueprint(AutoScaling, {
+                "AutoScalingConfigs": TABLE_CONFIGS,
+                "Shard": 2,
+                "Shards": 2,
+            })
+
+
+class TestAutoScalingRole(unittest.TestCase):
+    def test_policy_split(self):
+        configs = [{"table": "test-table-with-a-long-name-%d" % i}
+                   for i in range(300)]
+        blueprint = create_blueprint(AutoScalingRole,
+                                     {"AutoScalingConfigs": configs})
+        resources = blueprint.template.resources
+        self.assertEqual(resources["Policy"].resource_type,
+                         "AWS::IAM::ManagedPolicy")
+        self.assertIn("Policy2", resources)
+
+
+class TestDAXCluster(unittest.TestCase):
+    def create_template(self, **variables):
+        return create_blueprint(DAXCluster, dict(DAX_VARIABLES, **variables))
+
+    def test_node_count(self):
+        self.create_template(Nodes=11)
+        for nodes in (0, 12):
+            with self.assertRaises(ValueError):
+                self.create_template(Nodes=nodes)
+
+    def test_needs_tables(self):
+        with self.assertRaises(ValueError):
+            self.create_template(Tables=[])
+
+    def test_negative_ttl(self):
+        with self.assertRaises(ValueError):
+            self.create_template(QueryTTL=-1)
@@ -0,0 +1,164 @@
+import unittest
+
+from stacker_blueprints.dynamodb_planner import (
+    autoscaling_configs_variable,
+    burst_hours,
+    plan_table,
+    plan_tables,
+    provisioned_capacity,
+    scaling_settings,
+    tables_variable,
+)
+
+# Busy during the day, quiet at night.
+STEADY_READS = [700] * 8 + [1400] * 12 + [700] * 4
+STEADY_WRITES = [70] * 8 + [140] * 12 + [70] * 4
+
+# Idle but for one busy hour.
+SPIKY_READS = [0] * 23 + [50]
+SPIKY_WRITES = [0] * 23 + [10]
+
+TABLES = {
+    "UserTable": {
+        "TableName": "test-user-table",
+        "ProvisionedThroughput": {
+            "ReadCapacityUnits": 5,
+            "WriteCapacityUnits": 5,
+        },
+        "GlobalSecondaryIndexes": [
+            {"IndexName": "by-email",
+             "ProvisionedThroughput": {
+                 "ReadCapacityUnits": 5,
+                 "WriteCapacityUnits": 5,
+             }},
+        ],
+    },
+    "EventTable": {
+        "TableName": "test-event-table",
+        "ProvisionedThroughput": {
+            "ReadCapacityUnits": 5,
+            "WriteCapacityUnits": 5,
+        },
+    },
+}
+
+
+class TestCapacity(unittest.TestCase):
+    def test_scaling_settings(self):
+        self.assertEqual(
+            scaling_settings([7, 70], target=70.0, headroom=1.5),
+            {"min": 10, "max": 150, "target": 70.0},
+        )
+        self.assertEqual(scaling_settings([0], target=50.0)["min"], 1)
+
+    def test_invalid_target(self):
+        for target in (0, 19.9, 90.5, 100):
+            with self.assertRaises(ValueError):
+                scaling_settings([7, 70], target=target)
+            with self.assertRaises(ValueError):
+                plan_table({"table": "users", "reads": [1], "writes": [1]},
+                           target=target)
+
+    def test_capacity_scales_in_an_hour_late(self):
+        settings = {"min": 1, "max": 1000, "target": 50.0}
+        self.assertEqual(
+            provisioned_capacity([10, 100, 10, 10], settings),
+            [20, 200, 200, 20],
+        )
+
+    def test_capacity_is_bounded(self):
+        settings = {"min": 30, "max": 100, "target": 50.0}
+        self.assertEqual(
+            provisioned_capacity([10, 100, 10, 10], settings),
+            [30, 100, 100, 30],
+        )
+
+    def test_burst_hours(self):
+        settings = {"min": 1, "max": 1000, "target": 50.0}
+        series = [10, 100, 10, 10]
+        self.assertEqual(
+            burst_hours(series, provisioned_capacity(series, settings)), 1
+        )
+        settings["max"] = 50
+        self.assertEqual(
+            burst_hours(series, provisioned_capacity(series, settings)), 1
+        )
+        self.assertEqual(burst_hours([10, 10], [20, 20]), 0)
+
+
+class TestPlan(unittest.TestCase):
+    def test_steady_table_is_provisioned(self):
+        plan = plan_table({"table": "users", "reads": STEADY_READS,
+                           "writes": STEADY_WRITES})
+        self.assertEqual(plan["billing-mode"], "PROVISIONED")
+        self.assertLess(plan["provisioned-cost"], plan["on-demand-cost"])
+        self.assertEqual(plan["read"]["min"], 1000)
+        self.assertEqual(plan["read"]["max"], 3000)
+        self.assertEqual(plan["write"]["min"], 100)
+        self.assertEqual(plan["write"]["burst-hours"], 1)
+
+    def test_spiky_table_is_on_demand(self):
+        plan = plan_table({"table": "events", "reads": SPIKY_READS,
+                           "writes": SPIKY_WRITES})
+        self.assertEqual(plan["billing-mode"], "PAY_PER_REQUEST")
+        self.assertGreater(plan["provisioned-cost"], plan["on-demand-cost"])
+
+    def test_prices(self):
+        profile = {"table": "users", "reads": STEADY_READS,
+                   "writes": STEADY_WRITES}
+        plan = plan_table(profile, prices={"read-request-unit": 0,
+                                           "write-request-unit": 0})
+        self.assertEqual(plan["on-demand-cost"], 0)
+        self.assertEqual(plan["billing-mode"], "PAY_PER_REQUEST")
+
+    def test_invalid_profiles(self):
+        with self.assertRaises(ValueError):
+            plan_table({"table": "users", "reads": [1, 2], "writes": []})
+        with self.assertRaises(ValueError):
+            plan_table({"table": "users", "reads": [1, 2], "writes": [1]})
+        with self.assertRaises(ValueError):
+            plan_table({"table": "users", "reads": [-1], "writes": [1]})
+        with self.assertRaises(ValueError):
+            plan_tables([{"table": "users", "reads": [1], "writes": [1]}] * 2)
+
+
+class TestVariables(unittest.TestCase):
+    def setUp(self):
+        self.plans = plan_tables([
+            {"table": "test-user-table", "reads": STEADY_READS,
+             "writes": STEADY_WRITES},
+            {"table": "test-event-table", "reads": SPIKY_READS,
+             "writes": SPIKY_WRITES},
+        ])
+
+    def test_tables_variable(self):
+        tables = tables_variable(self.plans, TABLES)
+        throughput = {"ReadCapacityUnits": 1000, "WriteCapacityUnits": 100}
+        self.assertEqual(tables["UserTable"]["BillingMode"], "PROVISIONED")
+        self.assertEqual(tables["UserTable"]["ProvisionedThroughput"],
+                         throughput)
+        self.assertEqual(
+            tables["UserTable"]["GlobalSecondaryIndexes"][0],
+            {"IndexName": "by-email", "ProvisionedThroughput": throughput},
+        )
+        self.assertEqual(tables["EventTable"], {
+            "TableName": "test-event-table",
+            "BillingMode": "PAY_PER_REQUEST",
+        })
+        # The given tables are left as they were.
+        self.assertEqual(
+            TABLES["EventTable"]["ProvisionedThroughput"]["ReadCapacityUnits"],
+            5,
+        )
+
+    def test_unknown_table(self):
+        with self.assertRaises(ValueError):
+            tables_variable(self.plans, {"UserTable": TABLES["UserTable"]})
+
+    def test_autoscaling_configs_variable(self):
+        self.assertEqual(autoscaling_configs_variable(self.plans, TABLES), [
+            {"table": "test-user-table",
+             "read": {"min": 1000, "max": 3000, "target": 70.0},
+             "write": {"min": 100, "max": 300, "target": 70.0},
+             "indexes": [{"index": "by-email", "read": {}, "write": {}}]},
+        ])
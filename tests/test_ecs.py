@@ -0,0 +1,227 @@
+from stacker.blueprints.testutil import BlueprintTestCase
+from stacker.context import Context
+from stacker.variables import Variable
+
+from stacker_blueprints.ecs import (
+    AutoScalingCluster,
+    Cluster,
+    SimpleECSApp,
+    SimpleFargateApp,
+)
+
+TASK_VARIABLES = {
+    "TaskName": "mytask",
+    "Image": "fake_repo/image:12345",
+    "CPU": 1024,
+    "Memory": 2048,
+    "AppName": "myapp",
+    "Cluster": "mycluster",
+    "Count": 3,
+}
+
+FARGATE_VARIABLES = dict(
+    TASK_VARIABLES,
+    Subnets=["net-123456"],
+    SecurityGroup="sg-abc1234",
+)
+
+
+class TestApps(BlueprintTestCase):
+    def setUp(self):
+        self.ctx = Context({"namespace": "test"})
+
+    def create_template(self, cls, variables):
+        blueprint = cls("test_ecs_app", self.ctx)
+        blueprint.resolve_variables(
+            [Variable(k, v) for k, v in variables.items()]
+        )
+        blueprint.create_template()
+        return blueprint
+
+    def test_autoscaling_needs_max(self):
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(
+                SimpleECSApp,
+                dict(TASK_VARIABLES, AutoScaling={"cpu": {}}),
+            )
+        self.assertIn("needs a max", str(cm.exception))
+
+    def test_autoscaling_max_below_min(self):
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(
+                SimpleECSApp,
+                dict(TASK_VARIABLES, AutoScaling={"min": 5, "max": 2}),
+            )
+        self.assertIn("max (2) can't be less than its min (5)",
+                      str(cm.exception))
+
+    def test_autoscaling_count_out_of_range(self):
+        for config in ({"min": 5, "max": 10}, {"min": 1, "max": 2}):
+            with self.assertRaises(ValueError) as cm:
+                self.create_template(
+                    SimpleECSApp, dict(TASK_VARIABLES, AutoScaling=config),
+                )
+            self.assertIn("Count must be between the AutoScaling min",
+                          str(cm.exception))
+
+    def test_autoscaling_requests_need_resource_label(self):
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(
+                SimpleECSApp,
+                dict(TASK_VARIABLES,
+                     AutoScaling={"max": 10, "requests": {"target": 100}}),
+            )
+        self.assertIn("requests needs a target and a resource-label",
+                      str(cm.exception))
+
+    def test_autoscaling_step_policy_needs_steps(self):
+        step = {
+            "name": "queue-depth",
+            "namespace": "AWS/SQS",
+            "metric": "ApproximateNumberOfMessagesVisible",
+            "threshold": 100,
+        }
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(
+                SimpleECSApp,
+                dict(TASK_VARIABLES,
+                     AutoScaling={"max": 10, "steps": [step]}),
+            )
+        self.assertIn("queue-depth needs steps", str(cm.exception))
+
+    def test_autoscaling_schedules_need_an_end(self):
+        schedule = {"name": "nightly", "schedule": "cron(0 22 * * ? *)",
+                    "min": 1, "max": 4}
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(
+                SimpleECSApp,
+                dict(TASK_VARIABLES,
+                     AutoScaling={"max": 10, "schedules": [schedule]}),
+            )
+        self.assertIn("without an end", str(cm.exception))
+
+    def test_fargate_capacity_providers_only(self):
+        strategy = [{"CapacityProvider": "my-asg-provider", "Weight": 1}]
+        with self.assertRaises(ValueError):
+            self.create_template(
+                SimpleFargateApp,
+                dict(FARGATE_VARIABLES, CapacityProviderStrategy=strategy),
+            )
+
+    def test_one_base_per_strategy(self):
+        strategy = [
+            {"CapacityProvider": "FARGATE", "Base": 1},
+            {"CapacityProvider": "FARGATE_SPOT", "Base": 1},
+        ]
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(
+                SimpleFargateApp,
+                dict(FARGATE_VARIABLES, CapacityProviderStrategy=strategy),
+            )
+        self.assertIn("Only one capacity provider", str(cm.exception))
+
+    def test_placement_strategies_not_on_fargate(self):
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(
+                SimpleFargateApp,
+                dict(FARGATE_VARIABLES,
+                     PlacementStrategyPreset="binpack-memory"),
+            )
+        self.assertIn("Fargate", str(cm.exception))
+
+    def test_placement_strategies_with_ec2_capacity_providers(self):
+        blueprint = self.create_template(
+            SimpleECSApp,
+            dict(TASK_VARIABLES,
+                 CapacityProviderStrategy=[{"CapacityProvider": "asg"}],
+                 PlacementStrategyPreset="spread-instances"),
+        )
+        service = blueprint.template.resources["Service"]
+        self.assertNotIn("LaunchType", service.properties)
+        self.assertEqual(service.PlacementStrategies[0].Field, "instanceId")
+
+    def test_invalid_placement_strategies(self):
+        invalid = [
+            [{"Type": "binpack", "Field": "instanceId"}],
+            [{"Type": "spread", "Field": "memory"}],
+            [{"Type": "random", "Field": "cpu"}],
+            [{"Type": "random"}] * 6,
+        ]
+        for strategies in invalid:
+            with self.assertRaises(ValueError):
+                self.create_template(
+                    SimpleECSApp,
+                    dict(TASK_VARIABLES, PlacementStrategies=strategies),
+                )
+
+    def test_unknown_placement_strategy_preset(self):
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(
+                SimpleECSApp,
+                dict(TASK_VARIABLES, PlacementStrategyPreset="tetris"),
+            )
+        self.assertIn("az-binpack-memory", str(cm.exception))
+
+
+class TestCluster(BlueprintTestCase):
+    def setUp(self):
+        self.ctx = Context({"namespace": "test"})
+
+    def test_strategy_required_with_capacity_providers(self):
+        blueprint = Cluster("test_ecs_cluster", self.ctx)
+        blueprint.resolve_variables(
+            [Variable("CapacityProviders", ["FARGATE"])]
+        )
+        with self.assertRaises(ValueError):
+            blueprint.create_template()
+
+    def test_strategy_of_unknown_provider(self):
+        blueprint = Cluster("test_ecs_cluster", self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable("CapacityProviders", ["FARGATE"]),
+                Variable("DefaultCapacityProviderStrategy",
+                         [{"CapacityProvider": "FARGATE_SPOT"}]),
+            ]
+        )
+        with self.assertRaises(ValueError) as cm:
+            blueprint.create_template()
+        self.assertIn("FARGATE_SPOT", str(cm.exception))
+
+
+class TestAutoScalingCluster(BlueprintTestCase):
+    def setUp(self):
+        self.ctx = Context({"namespace": "test"})
+
+    def create_template(self, **variables):
+        variables.setdefault("Subnets", ["net-123456"])
+        variables.setdefault("MaxSize", 10)
+        blueprint = AutoScalingCluster("test_ecs_cluster", self.ctx)
+        blueprint.resolve_variables(
+            [Variable(k, v) for k, v in variables.items()]
+        )
+        blueprint.create_template()
+        return blueprint
+
+    def test_min_size_above_max_size(self):
+        with self.assertRaises(ValueError):
+            self.create_template(MinSize=11)
+
+    def test_invalid_target_capacity(self):
+        with self.assertRaises(ValueError):
+            self.create_template(ManagedScaling={"target-capacity": 0})
+
+    def test_invalid_warm_pool_state(self):
+        with self.assertRaises(ValueError) as cm:
+            self.create_template(WarmPool={"state": "Frozen"})
+        self.assertIn("Hibernated, Running, Stopped", str(cm.exception))
+
+    def test_without_termination_protection(self):
+        blueprint = self.create_template(ManagedTerminationProtection=False)
+        resources = blueprint.template.resources
+        self.assertEqual(
+            resources["AutoScalingGroup"].NewInstancesProtectedFromScaleIn,
+            "false"
+        )
+        provider = resources["CapacityProvider"].AutoScalingGroupProvider
+        self.assertEqual(provider.ManagedTerminationProtection, "DISABLED")
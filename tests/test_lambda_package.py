@@ -0,0 +1,170 @@
+import io
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+import zipfile
+
+import mock
+from botocore.exceptions import ClientError
+
+from stacker_blueprints.lambda_package import (
+    LocalStore,
+    S3Store,
+    package,
+    source_files,
+    source_hash,
+    upload_packages,
+    write_zip,
+)
+
+
+class TestLambdaPackage(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.write("handler.py", "def handler(event, context):\n    pass\n")
+        self.write("lib/util.py", "VALUE = 1\n" * 100)
+        self.write("lib/util.pyc", "compiled")
+        self.write("bin/run", "#!/bin/sh\n")
+        os.chmod(os.path.join(self.root, "bin/run"), 0o700)
+
+    def write(self, name, content):
+        path = os.path.join(self.root, *name.split("/"))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self, files):
+        buf = io.BytesIO()
+        write_zip(buf, self.root, files, threads=2)
+        return buf.getvalue()
+
+    def test_source_files(self):
+        self.assertEqual(source_files(self.root),
+                         ["bin/run", "handler.py", "lib/util.py"])
+        self.assertEqual(source_files(self.root, ["lib", "*.pyc"]),
+                         ["bin/run", "handler.py"])
+
+    def test_source_files_follow_symlinks(self):
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other)
+        with open(os.path.join(other, "shared.py"), "w") as f:
+            f.write("SHARED = 1\n")
+        os.symlink(other, os.path.join(self.root, "shared"))
+        self.assertIn("shared/shared.py", source_files(self.root))
+
+        os.symlink(self.root, os.path.join(self.root, "lib", "loop"))
+        with self.assertRaises(ValueError):
+            source_files(self.root)
+
+    def test_zip_is_reproducible(self):
+        files = source_files(self.root)
+        first = self.build(files)
+        past = time.time() - 3600
+        for name in files:
+            os.utime(os.path.join(self.root, name), (past, past))
+        self.assertEqual(first, self.build(files))
+
+    def test_zip_contents(self):
+        files = source_files(self.root)
+        archive = zipfile.ZipFile(io.BytesIO(self.build(files)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), files)
+        self.assertEqual(archive.read("lib/util.py"), b"VALUE = 1\n" * 100)
+        self.assertEqual(
+            archive.getinfo("lib/util.py").compress_type,
+            zipfile.ZIP_DEFLATED
+        )
+        modes = dict(
+            (info.filename, stat.S_IMODE(info.external_attr >> 16))
+            for info in archive.infolist()
+        )
+        self.assertEqual(modes, {"bin/run": 0o755, "handler.py": 0o644,
+                                 "lib/util.py": 0o644})
+
+    def test_source_hash(self):
+        files = source_files(self.root)
+        digest = source_hash(self.root, files)
+        self.assertEqual(digest, source_hash(self.root, files, threads=1))
+        self.write("handler.py", "changed")
+        self.assertNotEqual(digest, source_hash(self.root, files))
+
+    def test_package_skips_stored_packages(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store = LocalStore(directory, bucket="bucket")
+        code = package("function", self.root, store, prefix="lambda/")
+        self.assertEqual(code.S3Bucket, "bucket")
+        self.assertTrue(code.S3Key.startswith("lambda/function-"))
+        self.assertNotIn("S3ObjectVersion", code.properties)
+        self.assertTrue(zipfile.is_zipfile(store.path(code.S3Key)))
+
+        with mock.patch.object(store, "put") as put:
+            again = package("function", self.root, store, prefix="lambda")
+        self.assertFalse(put.called)
+        self.assertEqual(again.S3Key, code.S3Key)
+
+        self.write("handler.py", "changed")
+        changed = package("function", self.root, store, prefix="lambda")
+        self.assertNotEqual(changed.S3Key, code.S3Key)
+
+    def test_package_empty_directory(self):
+        with self.assertRaises(ValueError):
+            package("function", self.root, LocalStore(self.root),
+                    excludes=["*"])
+
+    def test_s3_store(self):
+        client = mock.Mock()
+        client.head_object.side_effect = ClientError(
+            {"Error": {"Code": "404"}}, "HeadObject"
+        )
+        client.put_object.return_value = {"VersionId": "v1"}
+        code = package("function", self.root, S3Store("bucket", client))
+        self.assertEqual(code.S3ObjectVersion, "v1")
+        self.assertEqual(client.put_object.call_args[1]["Bucket"], "bucket")
+
+        client.reset_mock()
+        client.head_object.side_effect = None
+        client.head_object.return_value = {"VersionId": "v1"}
+        code = package("function", self.root, S3Store("bucket", client))
+        self.assertEqual(code.S3ObjectVersion, "v1")
+        self.assertFalse(client.put_object.called)
+
+    def test_upload_packages_hook(self):
+        client = mock.Mock()
+        client.head_object.side_effect = ClientError(
+            {"Error": {"Code": "404"}}, "HeadObject"
+        )
+        client.put_object.return_value = {"VersionId": "v1"}
+        provider = mock.Mock(region="us-east-1")
+        context = mock.Mock(bucket_name="stacker-bucket")
+        with mock.patch("stacker.session_cache.get_session") as get_session, \
+                mock.patch("stacker.util.ensure_s3_bucket") as ensure_bucket, \
+                mock.patch("stacker.util.get_config_directory",
+                           return_value=os.path.dirname(self.root)):
+            get_session.return_value.client.return_value = client
+            results = upload_packages(
+                provider, context, prefix="lambda",
+                functions={
+                    "function": {"path": os.path.basename(self.root)},
+                    "no-bin": {"path": self.root, "exclude": ["bin"]},
+                },
+            )
+        ensure_bucket.assert_called_once_with(client, "stacker-bucket",
+                                              "us-east-1")
+        self.assertEqual(sorted(results), ["function", "no-bin"])
+        self.assertEqual(results["function"].S3Bucket, "stacker-bucket")
+        self.assertTrue(
+            results["function"].S3Key.startswith("lambda/function-")
+        )
+        self.assertEqual(results["function"].S3ObjectVersion, "v1")
+        self.assertNotEqual(results["function"].S3Key.split("-")[-1],
+                            results["no-bin"].S3Key.split("-")[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
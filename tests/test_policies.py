@@ -0,0 +1,188 @@
+import unittest
+
+from awacs.aws import (
+    Action,
+    Allow,
+    Condition,
+    Deny,
+    Principal,
+    Statement,
+    StringEquals,
+)
+import awacs.s3
+from troposphere import Join, Ref, encode_to_dict
+
+from stacker_blueprints.policies import (
+    MANAGED_POLICY_MAX_BYTES,
+    compact_statements,
+    policy_size,
+    split_statements,
+)
+
+
+def to_dicts(statements):
+    return [encode_to_dict(statement) for statement in statements]
+
+
+class TestCompactStatements(unittest.TestCase):
+    def test_merges_actions_on_the_same_resources(self):
+        statements = compact_statements([
+            Statement(Effect=Allow, Action=[awacs.s3.PutObject],
+                      Resource=["arn:aws:s3:::b/*"]),
+            Statement(Effect=Allow, Action=[awacs.s3.GetObject],
+                      Resource=["arn:aws:s3:::b/*"]),
+        ])
+        self.assertEqual(to_dicts(statements), [{
+            "Effect": "Allow",
+            "Action": ["s3:GetObject", "s3:PutObject"],
+            "Resource": ["arn:aws:s3:::b/*"],
+        }])
+
+    def test_merges_resources_of_the_same_actions(self):
+        statements = compact_statements([
+            Statement(Effect=Allow, Action=[awacs.s3.ListBucket],
+                      Resource=["arn:aws:s3:::c"]),
+            Statement(Effect=Allow, Action=[awacs.s3.ListBucket],
+                      Resource=[Join("", ["arn:aws:s3:::", Ref("B")]),
+                                "arn:aws:s3:::a"]),
+        ])
+        self.assertEqual(to_dicts(statements), [{
+            "Effect": "Allow",
+            "Action": ["s3:ListBucket"],
+            "Resource": [
+                "arn:aws:s3:::a",
+                "arn:aws:s3:::c",
+                {"Fn::Join": ["", ["arn:aws:s3:::", {"Ref": "B"}]]},
+            ],
+        }])
+
+    def test_does_not_grant_more(self):
+        statements = [
+            Statement(Effect=Allow, Action=[awacs.s3.GetObject],
+                      Resource=["arn:aws:s3:::a/*"]),
+            Statement(Effect=Allow, Action=[awacs.s3.ListBucket],
+                      Resource=["arn:aws:s3:::a"]),
+        ]
+        self.assertEqual(to_dicts(compact_statements(statements)),
+                         to_dicts(statements))
+
+    def test_removes_covered_actions_and_resources(self):
+        statements = compact_statements([
+            Statement(
+                Effect=Allow,
+                Action=[awacs.s3.GetObject, Action("s3", "get*"),
+                        awacs.s3.GetObject, awacs.s3.PutObject],
+                Resource=["arn:aws:s3:::b/key", "arn:aws:s3:::b/*",
+                          "arn:aws:s3:::B/key"],
+            ),
+            Statement(Effect=Allow, Action=[Action("*")],
+                      Resource=[Ref("Resource"), "*"]),
+        ])
+        self.assertEqual(to_dicts(statements), [
+            {
+                "Effect": "Allow",
+                "Action": ["s3:get*", "s3:PutObject"],
+                "Resource": ["arn:aws:s3:::B/key", "arn:aws:s3:::b/*"],
+            },
+            {
+                "Effect": "Allow",
+                "Action": ["*"],
+                "Resource": ["*"],
+            },
+        ])
+
+    def test_keeps_overlapping_wildcards(self):
+        statements = compact_statements([
+            Statement(
+                Effect=Allow,
+                Action=[Action("s3", "Get*"), Action("s3", "G?t*")],
+                Resource=["arn:aws:s3:::??", "arn:aws:s3:::b*",
+                          "arn:aws:s3:::bc"],
+            ),
+        ])
+        self.assertEqual(to_dicts(statements), [
+            {
+                "Effect": "Allow",
+                "Action": ["s3:G?t*", "s3:Get*"],
+                "Resource": ["arn:aws:s3:::??", "arn:aws:s3:::b*"],
+            },
+        ])
+
+    def test_keeps_effects_conditions_and_other_keys_apart(self):
+        condition = Condition(StringEquals("s3:prefix", "home/"))
+        statements = [
+            Statement(Effect=Allow, Action=[awacs.s3.ListBucket],
+                      Resource=["arn:aws:s3:::a"]),
+            Statement(Effect=Deny, Action=[awacs.s3.ListBucket],
+                      Resource=["arn:aws:s3:::b"]),
+            Statement(Effect=Allow, Action=[awacs.s3.ListBucket],
+                      Resource=["arn:aws:s3:::c"], Condition=condition),
+            Statement(Effect=Allow, Principal=Principal("*"),
+                      Action=[awacs.s3.ListBucket],
+                      Resource=["arn:aws:s3:::d"]),
+            Statement(Effect=Allow, Action=[awacs.s3.ListBucket],
+                      Resource=["arn:aws:s3:::a"]),
+        ]
+        self.assertEqual(to_dicts(compact_statements(statements)),
+                         to_dicts(statements[:4]))
+
+    def test_merges_repeatedly(self):
+        # The first two merge into GetObject+PutObject on a, which then
+        # merges with the third on its actions.
+        statements = compact_statements([
+            Statement(Effect=Allow, Action=[awacs.s3.GetObject],
+                      Resource=["a"]),
+            Statement(Effect=Allow, Action=[awacs.s3.PutObject],
+                      Resource=["a"]),
+            Statement(Effect=Allow,
+                      Action=[awacs.s3.PutObject, awacs.s3.GetObject],
+                      Resource=["b"]),
+        ])
+        self.assertEqual(to_dicts(statements), [{
+            "Effect": "Allow",
+            "Action": ["s3:GetObject", "s3:PutObject"],
+            "Resource": ["a", "b"],
+        }])
+
+
+class TestSplitStatements(unittest.TestCase):
+    def bucket_statement(self, count):
+        return Statement(
+            Effect=Allow,
+            Action=[awacs.s3.GetObject],
+            Resource=["arn:aws:s3:::bucket-%d/*" % i for i in range(count)],
+        )
+
+    def test_policy_size(self):
+        self.assertEqual(
+            policy_size([self.bucket_statement(1)]),
+            len('{"Statement":[{"Action":["s3:GetObject"],"Effect":"Allow",'
+                '"Resource":["arn:aws:s3:::bucket-0/*"]}],'
+                '"Version":"2012-10-17"}')
+        )
+
+    def test_fits_in_one_policy(self):
+        statements = [self.bucket_statement(1), self.bucket_statement(2)]
+        self.assertEqual(split_statements(statements), [statements])
+
+    def test_splits_in_order(self):
+        statements = [self.bucket_statement(3) for _ in range(5)]
+        size = policy_size(statements[:2])
+        policies = split_statements(statements, size)
+        self.assertEqual(policies,
+                         [statements[:2], statements[2:4], statements[4:]])
+
+    def test_splits_large_statements_by_resource(self):
+        policies = split_statements([self.bucket_statement(500)])
+        self.assertEqual(len(policies), 3)
+        resources = []
+        for statements in policies:
+            self.assertEqual(len(statements), 1)
+            self.assertLessEqual(policy_size(statements),
+                                 MANAGED_POLICY_MAX_BYTES)
+            resources.extend(statements[0].Resource)
+        self.assertEqual(resources, self.bucket_statement(500).Resource)
+
+    def test_statement_too_large(self):
+        with self.assertRaises(ValueError):
+            split_statements([self.bucket_statement(1)], 50)
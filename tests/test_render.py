@@ -0,0 +1,226 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from stacker_blueprints.ecs import Cluster
+from stacker_blueprints.render import (
+    TemplateCache,
+    TemplateStats,
+    check_template_limits,
+    format_template_stats,
+    gzip_template,
+    normalize_definition,
+    render_blueprint,
+    render_blueprints,
+    template_headroom,
+    write_templates,
+)
+
+CLUSTER = {
+    "name": "cluster",
+    "class_path": "stacker_blueprints.ecs.Cluster",
+}
+
+BUCKETS = {
+    "name": "buckets",
+    "class_path": "stacker_blueprints.s3.Buckets",
+    "variables": {
+        "Buckets": {"Simple": {}},
+        "ReadRoles": ["Role1"],
+    },
+}
+
+BROKEN = {
+    "name": "broken",
+    "class_path": "stacker_blueprints.route53.DNSRecords",
+    "variables": {},
+}
+
+
+class TestRender(unittest.TestCase):
+    def test_normalize_definition_tuple(self):
+        self.assertEqual(
+            normalize_definition(("stacker_blueprints.ecs.Cluster", None)),
+            ("Cluster", "stacker_blueprints.ecs.Cluster", {})
+        )
+
+    def test_render_blueprint(self):
+        template = json.loads(
+            render_blueprint("cluster", CLUSTER["class_path"], {})
+        )
+        self.assertEqual(list(template["Resources"]), ["Cluster"])
+
+    def test_render_blueprints_in_order(self):
+        definitions = [CLUSTER, BUCKETS, CLUSTER, BUCKETS]
+        results = render_blueprints(definitions, processes=2)
+        self.assertEqual(
+            [r.name for r in results],
+            ["cluster", "buckets", "cluster", "buckets"]
+        )
+        serial = render_blueprints(definitions, processes=1)
+        self.assertEqual(
+            [r.template for r in results],
+            [r.template for r in serial]
+        )
+
+    def test_render_blueprints_collects_errors(self):
+        results = render_blueprints([CLUSTER, BROKEN, BUCKETS], processes=2)
+        self.assertEqual([r.name for r in results],
+                         ["cluster", "broken", "buckets"])
+        self.assertIsNone(results[0].error)
+        self.assertIsNone(results[1].template)
+        self.assertIn("ValueError", results[1].error)
+        self.assertIsNone(results[2].error)
+
+
+class TestTemplateSize(unittest.TestCase):
+    def test_compact_render(self):
+        pretty = render_blueprint("buckets", BUCKETS["class_path"],
+                                  BUCKETS["variables"])
+        compact = render_blueprint("buckets", BUCKETS["class_path"],
+                                   BUCKETS["variables"], compact=True)
+        self.assertLess(len(compact), len(pretty))
+        self.assertNotIn(" ", compact)
+        self.assertEqual(json.loads(compact), json.loads(pretty))
+
+    def test_render_blueprints_stats(self):
+        result = render_blueprints([BUCKETS], processes=1, compact=True)[0]
+        self.assertEqual(result.stats.bytes, len(result.template))
+        self.assertEqual(result.stats.resources, 2)
+        self.assertEqual(result.stats.outputs, 3)
+        self.assertEqual(result.stats.parameters, 0)
+
+    def test_render_blueprints_limits(self):
+        result = render_blueprints([BUCKETS, CLUSTER], processes=1,
+                                   limits={"resources": 1})
+        self.assertIsNone(result[0].template)
+        self.assertIn("exceeds its limits for resources (1 over)",
+                      result[0].error)
+        self.assertIsNone(result[1].error)
+
+    def test_headroom(self):
+        stats = TemplateStats(bytes=100, resources=501, outputs=0,
+                              parameters=0)
+        headroom = template_headroom(stats, {"bytes": 1000})
+        self.assertEqual(headroom["bytes"], 900)
+        self.assertEqual(headroom["resources"], -1)
+        self.assertEqual(headroom["outputs"], 200)
+        with self.assertRaises(ValueError):
+            check_template_limits("stack", stats)
+        self.assertEqual(
+            format_template_stats("stack", stats, {"bytes": 1000}),
+            "stack: 100 bytes (900 left), 501 resources (-1 left), "
+            "0 outputs (200 left), 0 parameters (200 left)"
+        )
+
+    def test_gzip_template_is_deterministic(self):
+        self.assertEqual(gzip_template("{}"), gzip_template("{}"))
+
+    def test_write_templates(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        results = render_blueprints([CLUSTER, BROKEN], processes=1,
+                                    compact=True)
+        paths = write_templates(results, directory)
+        self.assertEqual(
+            [os.path.basename(path) for path in paths],
+            ["cluster.json", "cluster.json.gz"]
+        )
+
+
+class UncacheableCluster(Cluster):
+    CACHEABLE = False
+
+
+class TestTemplateCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = TemplateCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key_is_stable(self):
+        variables = {"Buckets": {"A": {}, "B": {}}, "ReadRoles": ["r"]}
+        key = self.cache.key("buckets", BUCKETS["class_path"], variables)
+        self.assertEqual(
+            key,
+            self.cache.key("buckets", BUCKETS["class_path"],
+                           dict(reversed(list(variables.items()))))
+        )
+        self.assertNotEqual(
+            key,
+            self.cache.key("buckets", BUCKETS["class_path"],
+                           {"Buckets": {"A": {}}, "ReadRoles": ["r"]})
+        )
+        self.assertNotEqual(
+            key,
+            self.cache.key("other", BUCKETS["class_path"], variables)
+        )
+
+    def test_key_with_troposphere_variables(self):
+        from troposphere.awslambda import Code
+        key = self.cache.key(
+            "function", "stacker_blueprints.aws_lambda.Function",
+            {"Code": Code(S3Bucket="bucket", S3Key="key")}
+        )
+        self.assertIsNotNone(key)
+
+    def test_key_opt_out(self):
+        self.assertIsNone(
+            self.cache.key("cluster", "tests.test_render.UncacheableCluster",
+                           {})
+        )
+
+    def test_key_changes_with_the_blueprint_source(self):
+        source = ("from stacker_blueprints.ecs import Cluster\n\n\n"
+                  "class EditedCluster(Cluster):\n"
+                  "    pass\n")
+        path = os.path.join(self.directory, "edited_blueprint.py")
+        with open(path, "w") as f:
+            f.write(source)
+        sys.path.insert(0, self.directory)
+        try:
+            class_path = "edited_blueprint.EditedCluster"
+            key = self.cache.key("cluster", class_path, {})
+            self.assertIsNotNone(key)
+            self.assertEqual(key, self.cache.key("cluster", class_path, {}))
+            with open(path, "w") as f:
+                f.write(source + "    # edited\n")
+            self.assertNotEqual(key,
+                                self.cache.key("cluster", class_path, {}))
+        finally:
+            sys.path.remove(self.directory)
+            sys.modules.pop("edited_blueprint", None)
+
+    def test_render_blueprints_uses_cache(self):
+        first = render_blueprints([CLUSTER, BUCKETS, BROKEN], processes=1,
+                                  cache=self.cache)
+        # Failed renders aren't cached.
+        self.assertEqual(len(self.cache.entries()), 2)
+
+        key = self.cache.key("cluster", CLUSTER["class_path"], {})
+        self.cache.set(key, '{"Resources": {}}')
+        second = render_blueprints([CLUSTER, BUCKETS], processes=1,
+                                   cache=self.cache)
+        self.assertEqual(second[0].template, '{"Resources": {}}')
+        self.assertEqual(second[1].template, first[1].template)
+
+    def test_evict_least_recently_used(self):
+        for i, key in enumerate(["aa1", "bb2", "cc3"]):
+            self.cache.set(key, "x" * 10)
+            os.utime(self.cache.path(key), (i, i))
+        # Reading aa1 makes bb2 the least recently used entry.
+        self.assertEqual(self.cache.get("aa1"), "x" * 10)
+        self.cache.max_bytes = 20
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertIsNone(self.cache.get("bb2"))
+        self.assertIsNotNone(self.cache.get("aa1"))
+        self.assertIsNotNone(self.cache.get("cc3"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,17 @@
+import os
+import re
+import shutil
+import tempfile
+
 from stacker.context import Context
 from stacker.config import Config
 from stacker.variables import Variable
 
 from stacker_blueprints.route53 import (
   DNSRecords,
+  get_alias_target_hosted_zone_id,
   get_record_set_md5,
+  shard_record_sets,
 )
 
 from stacker.blueprints.testutil import BlueprintTestCase
@@ -155,6 +162,75 @@ class TestRoute53(BlueprintTestCase):
             record_sets[0].AliasTarget.HostedZoneId, "Z3AADJGX6KTTL2"
         )
 
+    def test_get_alias_target_hosted_zone_id(self):
+        for dns_name, zone_id in (
+            ("d123456789f.cloudfront.net.", "Z2FDTNDATAQYW2"),
+            ("MyELB-123.eu-north-1.elb.amazonaws.com.", "Z23TAZ7KFP5Y7F"),
+            ("dualstack.myalb-123.us-east-1.elb.amazonaws.com",
+             "Z35SXDOTRQ7X7K"),
+            ("mynlb-123.elb.us-west-2.amazonaws.com.", "Z18D5FSROUN65G"),
+            ("d-abc123.execute-api.eu-west-1.amazonaws.com.",
+             "ZLY8HYME6SFDD"),
+            ("a1234.awsglobalaccelerator.com.", "Z2BJ6XQ5FK7U4H"),
+            ("s3-website-us-east-1.amazonaws.com.", "Z3AQBSTGFYJSTF"),
+            ("bucket.s3-website.eu-west-3.amazonaws.com", "Z3R1K369G5AVDG"),
+        ):
+            self.assertEqual(get_alias_target_hosted_zone_id(dns_name),
+                             zone_id, dns_name)
+        self.assertIsNone(
+            get_alias_target_hosted_zone_id("host.testdomain.com.")
+        )
+
+    def test_unknown_aws_alias_target_raises(self):
+        blueprint = DNSRecords('test_route53_unknown_alias', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable(
+                    "RecordSets",
+                    [
+                        {
+                            "Name": "host.testdomain.com.",
+                            "Type": "A",
+                            "AliasTarget": {
+                                "DNSName": "myelb-123.xx-east-9.elb.amazonaws.com.",  # noqa
+                            },
+                        },
+                    ]
+                ),
+                Variable("HostedZoneId", "fake_zone_id"),
+            ]
+        )
+        with self.assertRaises(ValueError):
+            blueprint.create_template()
+
+    def test_record_set_group_alias_hosted_zone_id(self):
+        blueprint = DNSRecords('test_route53_group_alias', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable(
+                    "RecordSetGroups",
+                    {
+                        "Frontend": {
+                            "RecordSets": [
+                                {
+                                    "Name": "host.testdomain.com.",
+                                    "Type": "A",
+                                    "AliasTarget": {
+                                        "DNSName": "mynlb-123.elb.us-east-1.amazonaws.com.",  # noqa
+                                    },
+                                },
+                            ],
+                        },
+                    }
+                ),
+                Variable("HostedZoneId", "fake_zone_id"),
+            ]
+        )
+        blueprint.create_template()
+        group = blueprint.template.resources["Frontend"]
+        self.assertEqual(group.RecordSets[0].AliasTarget.HostedZoneId,
+                         "Z26RNL4JYFTOTI")
+
     def test_alias_default_hosted_zone_id(self):
         blueprint = DNSRecords(
             'test_route53_alias_default_hosted_zone_id', self.ctx
@@ -248,6 +324,297 @@ class TestRoute53(BlueprintTestCase):
         with self.assertRaises(ValueError):
             blueprint.create_template()
 
+    def test_create_template_sharded_record_sets(self):
+        blueprint = DNSRecords('route53_sharded_record_sets', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable(
+                    "RecordSets",
+                    [
+                        {
+                            "Name": "host%d.testdomain.com." % i,
+                            "Type": "A",
+                            "ResourceRecords": ["10.0.0.%d" % i],
+                        }
+                        for i in range(5)
+                    ] + [
+                        {
+                            "Name": "cdn.testdomain.com.",
+                            "Type": "A",
+                            "AliasTarget": {
+                                "DNSName": "d123456789f.cloudfront.net.",
+                            },
+                        },
+                        {
+                            "Name": "disabled.testdomain.com.",
+                            "Type": "A",
+                            "ResourceRecords": ["10.0.0.254"],
+                            "Enabled": False,
+                        },
+                    ]
+                ),
+                Variable("HostedZoneId", "fake_zone_id"),
+                Variable("RecordSetGroupBudget", 3),
+            ]
+        )
+        record_sets = blueprint.create_template()
+        self.assertEqual(6, len(record_sets))
+        self.assertRenderedBlueprint(blueprint)
+
+    def test_create_template_zone_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        zone_file = os.path.join(directory, "testdomain.com.zone")
+        with open(zone_file, "w") as f:
+            f.write("$TTL 300\n"
+                    "host  A  10.0.0.1\n"
+                    "host2 A  10.0.0.2\n"
+                    "      A  10.0.0.3\n")
+
+        blueprint = DNSRecords('route53_zone_file', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable(
+                    "RecordSets",
+                    [
+                        {
+                            "Name": "host3.testdomain.com.",
+                            "Type": "A",
+                            "ResourceRecords": ["10.0.0.4"],
+                        },
+                    ]
+                ),
+                Variable("HostedZoneName", "testdomain.com"),
+                Variable("ZoneFile", zone_file),
+            ]
+        )
+        record_sets = blueprint.create_template()
+        self.assertEqual(
+            [(rs.Name, rs.ResourceRecords) for rs in record_sets],
+            [
+                ("host3.testdomain.com.", ["10.0.0.4"]),
+                ("host.testdomain.com.", ["10.0.0.1"]),
+                ("host2.testdomain.com.", ["10.0.0.2", "10.0.0.3"]),
+            ]
+        )
+        self.assertFalse(DNSRecords.CACHEABLE({"ZoneFile": zone_file}))
+        self.assertTrue(DNSRecords.CACHEABLE({"ZoneFile": ""}))
+
+    def test_record_set_conflicts_reported_together(self):
+        blueprint = DNSRecords('test_route53_conflicts', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable(
+                    "RecordSetGroups",
+                    {
+                        "Weighted": {
+                            "RecordSets": [
+                                {
+                                    "Name": "www.testdomain.com.",
+                                    "Type": "A",
+                                    "SetIdentifier": "one",
+                                    "Weight": "1",
+                                    "TTL": "60",
+                                    "ResourceRecords": ["10.0.0.1"],
+                                },
+                                {
+                                    "Name": "www.testdomain.com.",
+                                    "Type": "A",
+                                    "SetIdentifier": "two",
+                                    "Weight": "1",
+                                    "TTL": "300",
+                                    "ResourceRecords": ["10.0.0.2"],
+                                },
+                            ],
+                        },
+                    }
+                ),
+                Variable(
+                    "RecordSets",
+                    [
+                        {
+                            "Name": "host.testdomain.com.",
+                            "Type": "TXT",
+                            "ResourceRecords": ['"a"'],
+                        },
+                        {
+                            "Name": "Host.testdomain.com",
+                            "Type": "TXT",
+                            "ResourceRecords": ['"b"'],
+                        },
+                        {
+                            "Name": "host.testdomain.com.",
+                            "Type": "CNAME",
+                            "ResourceRecords": ["other.testdomain.com."],
+                        },
+                        {
+                            "Name": "WWW.testdomain.com.",
+                            "Type": "A",
+                            "ResourceRecords": ["10.0.0.3"],
+                        },
+                        {
+                            "Name": "api.testdomain.com.",
+                            "Type": "A",
+                            "SetIdentifier": "one",
+                            "Weight": "1",
+                            "ResourceRecords": ["10.0.0.4"],
+                        },
+                        {
+                            "Name": "api.testdomain.com.",
+                            "Type": "A",
+                            "SetIdentifier": "two",
+                            "Weight": "1",
+                            "ResourceRecords": ["10.0.0.5"],
+                        },
+                    ]
+                ),
+                Variable("HostedZoneId", "fake_zone_id"),
+            ]
+        )
+        with self.assertRaises(ValueError) as cm:
+            blueprint.create_template()
+        message = str(cm.exception)
+        self.assertIn("Found 5 problem(s)", message)
+        self.assertIn("has TTL 300", message)
+        self.assertIn("Duplicate record set host.testdomain.com. TXT.",
+                      message)
+        self.assertIn("CNAME record set host.testdomain.com. CNAME "
+                      "conflicts with the TXT record sets", message)
+        self.assertIn("api.testdomain.com. A (one) and api.testdomain.com. "
+                      "A (two) would share the logical ID", message)
+        self.assertIn("www.testdomain.com. A mixes weighted and "
+                      "non-weighted records", message)
+
+    def sharded_blueprint(self, record_sets, shard, shards, **variables):
+        blueprint = DNSRecords('test_route53_shard', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable("RecordSets", [dict(rs) for rs in record_sets]),
+                Variable("HostedZoneId", "fake_zone_id"),
+                Variable("Shard", shard),
+                Variable("Shards", shards),
+            ] + [Variable(k, v) for k, v in variables.items()]
+        )
+        return blueprint
+
+    def test_record_sets_split_across_shards(self):
+        record_sets = [
+            {
+                "Name": "host%d.testdomain.com." % i,
+                "Type": "A",
+                "ResourceRecords": ["10.0.0.%d" % i],
+            }
+            for i in range(20)
+        ]
+        groups = {
+            "Group": {
+                "RecordSets": [
+                    {
+                        "Name": "www.testdomain.com.",
+                        "Type": "A",
+                        "ResourceRecords": ["10.0.1.1"],
+                    },
+                ],
+            },
+        }
+        names = []
+        for shard in range(2):
+            blueprint = self.sharded_blueprint(record_sets, shard, 2,
+                                               RecordSetGroups=groups)
+            shard_names = [rs.Name for rs in blueprint.create_template()]
+            self.assertTrue(shard_names)
+            names.extend(shard_names)
+            self.assertEqual("Group" in blueprint.template.resources,
+                             shard == 0)
+        self.assertEqual(sorted(names),
+                         sorted(rs["Name"] for rs in record_sets))
+
+    def test_sharded_record_sets_need_a_hosted_zone_id(self):
+        blueprint = DNSRecords('test_route53_shard', self.ctx)
+        blueprint.resolve_variables(
+            [
+                Variable("HostedZoneName", "testdomain.com"),
+                Variable("Shards", 2),
+            ]
+        )
+        with self.assertRaises(ValueError):
+            blueprint.create_template()
+
+    def test_template_size_limit(self):
+        # Each record renders to about 4KB, so 300 of them don't fit in the
+        # 1MB of a template, even packed into groups.
+        record_sets = [
+            {
+                "Name": "txt%d.testdomain.com." % i,
+                "Type": "TXT",
+                "ResourceRecords": ['"%s"' % ("x" * 250)] * 16,
+            }
+            for i in range(300)
+        ]
+        blueprint = self.sharded_blueprint(record_sets, 0, 1,
+                                           RecordSetGroupBudget=100)
+        with self.assertRaises(ValueError) as cm:
+            blueprint.create_template()
+        message = str(cm.exception)
+        self.assertIn("more than the 1048576 bytes", message)
+        shards = int(re.search(r"across (\d+) Shards", message).group(1))
+        self.assertGreater(shards, 1)
+
+        for shard in range(shards):
+            blueprint = self.sharded_blueprint(record_sets, shard, shards,
+                                               RecordSetGroupBudget=100)
+            blueprint.create_template()
+            self.assertLessEqual(len(blueprint.template.to_json()),
+                                 1024 * 1024)
+
+    def test_resource_limit(self):
+        record_sets = [
+            {
+                "Name": "host%d.testdomain.com." % i,
+                "Type": "A",
+                "ResourceRecords": ["10.0.%d.%d" % (i // 256, i % 256)],
+            }
+            for i in range(600)
+        ]
+        with self.assertRaises(ValueError) as cm:
+            self.sharded_blueprint(record_sets, 0, 1).create_template()
+        self.assertIn("Please split them across 2 Shards or set "
+                      "RecordSetGroupBudget.", str(cm.exception))
+
+    def test_shard_record_sets_within_budget(self):
+        record_sets = [
+            {"Name": "host%d.example.com." % i, "Type": "A"}
+            for i in range(1000)
+        ]
+        shards = shard_record_sets(record_sets, 100)
+        self.assertTrue(all(len(shard) <= 100 for shard in shards))
+        self.assertEqual(sum(len(shard) for shard in shards), 1000)
+
+    def test_shard_record_sets_stable(self):
+        def assignments(record_sets):
+            shards = shard_record_sets(record_sets, 100)
+            return dict(
+                (rs["Name"], i)
+                for i, shard in enumerate(shards)
+                for rs in shard
+            )
+
+        record_sets = [
+            {"Name": "host%d.example.com." % i, "Type": "A"}
+            for i in range(1000)
+        ]
+        before = assignments(record_sets)
+        # Removing records only moves the records of the removed shards.
+        after = assignments(record_sets[:-10])
+        shards_after = set(after.values())
+        for name, shard in after.items():
+            if before[name] in shards_after:
+                self.assertEqual(before[name], shard)
+
+    def test_shard_record_sets_invalid_budget(self):
+        with self.assertRaises(ValueError):
+            shard_record_sets([], 0)
+
     def test_get_record_set_md5(self):
         rs_name = "www.example.com"
         self.assertEqual(
@@ -0,0 +1,78 @@
+import sys
+import unittest
+
+from stacker.blueprints.base import Blueprint
+from stacker.config import Config
+from stacker.context import Context
+from stacker.variables import Variable
+
+from stacker_blueprints.util import (
+    LazyModule,
+    memoized_method,
+    memoized_property,
+)
+
+
+class Counter(Blueprint):
+    VARIABLES = {
+        "Name": {"type": str},
+    }
+
+    calls = 0
+
+    @memoized_property
+    def upper_name(self):
+        self.calls += 1
+        return self.get_variables()["Name"].upper()
+
+    @memoized_method
+    def lower_name(self):
+        self.calls += 1
+        return self.get_variables()["Name"].lower()
+
+
+class TestMemoizedProperty(unittest.TestCase):
+    def setUp(self):
+        self.blueprint = Counter(
+            "counter", Context(config=Config({"namespace": "test"}))
+        )
+
+    def test_computed_once(self):
+        self.blueprint.resolve_variables([Variable("Name", "a")])
+        self.assertEqual(self.blueprint.upper_name, "A")
+        self.assertEqual(self.blueprint.upper_name, "A")
+        self.assertEqual(self.blueprint.calls, 1)
+
+    def test_reset_when_variables_are_resolved_again(self):
+        self.blueprint.resolve_variables([Variable("Name", "a")])
+        self.assertEqual(self.blueprint.upper_name, "A")
+        self.blueprint.resolve_variables([Variable("Name", "b")])
+        self.assertEqual(self.blueprint.upper_name, "B")
+        self.assertEqual(self.blueprint.calls, 2)
+
+    def test_method(self):
+        self.blueprint.resolve_variables([Variable("Name", "A")])
+        self.assertEqual(self.blueprint.lower_name(), "a")
+        self.assertEqual(self.blueprint.lower_name(), "a")
+        self.assertEqual(self.blueprint.calls, 1)
+        self.blueprint.resolve_variables([Variable("Name", "B")])
+        self.assertEqual(self.blueprint.lower_name(), "b")
+        self.assertEqual(self.blueprint.calls, 2)
+
+
+class TestLazyModule(unittest.TestCase):
+    def test_imported_on_first_use(self):
+        sys.modules.pop("json.tool", None)
+        tool = LazyModule("json.tool")
+        self.assertNotIn("json.tool", sys.modules)
+        self.assertTrue(callable(tool.main))
+        self.assertIn("json.tool", sys.modules)
+        self.assertIs(tool.main, sys.modules["json.tool"].main)
+
+    def test_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            LazyModule("json").does_not_exist
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from stacker_blueprints.zone_file import (
+    merge_record_sets,
+    parse_csv_lines,
+    parse_ttl,
+    parse_zone_lines,
+    read_zone_file,
+)
+
+ZONE = """\
+$ORIGIN Example.com.
+$TTL 1h
+@   IN  SOA ns1.example.com. admin.example.com. (
+            2020010101 ; serial
+            7200       ; refresh
+            3600 1209600 300 )
+    IN  NS  ns1.example.com.
+    IN  MX  10 mail
+www     300 IN  A   10.0.0.1
+            IN  A   10.0.0.2
+mail    IN  5m  A   10.0.0.3
+alias       CNAME   www
+txt         TXT     "v=spf1 include:example.net ~all" ; comment
+sub         NS      ns1.other.net.
+"""
+
+
+class TestZoneFile(unittest.TestCase):
+    def test_parse_ttl(self):
+        self.assertEqual(parse_ttl("300"), 300)
+        self.assertEqual(parse_ttl("1h30m"), 5400)
+        self.assertEqual(parse_ttl("1W"), 604800)
+        with self.assertRaises(ValueError):
+            parse_ttl("soon")
+
+    def test_parse_zone_lines(self):
+        records = list(
+            merge_record_sets(parse_zone_lines(ZONE.splitlines()))
+        )
+        self.assertEqual(
+            [(r["Name"], r["Type"], r["TTL"], r["ResourceRecords"])
+             for r in records],
+            [
+                ("example.com.", "MX", "3600", ["10 mail.example.com."]),
+                ("www.example.com.", "A", "300",
+                 ["10.0.0.1", "10.0.0.2"]),
+                ("mail.example.com.", "A", "300", ["10.0.0.3"]),
+                ("alias.example.com.", "CNAME", "3600",
+                 ["www.example.com."]),
+                ("txt.example.com.", "TXT", "3600",
+                 ['"v=spf1 include:example.net ~all"']),
+                ("sub.example.com.", "NS", "3600", ["ns1.other.net."]),
+            ]
+        )
+
+    def test_merge_non_adjacent_records(self):
+        lines = [
+            "a A 10.0.0.1",
+            "b A 10.0.0.2",
+            "a A 10.0.0.3",
+            "a TXT text",
+        ]
+        records = list(
+            merge_record_sets(parse_zone_lines(lines, "example.com"))
+        )
+        self.assertEqual(
+            [(r["Name"], r["Type"], r["ResourceRecords"]) for r in records],
+            [
+                ("a.example.com.", "A", ["10.0.0.1", "10.0.0.3"]),
+                ("b.example.com.", "A", ["10.0.0.2"]),
+                ("a.example.com.", "TXT", ["text"]),
+            ]
+        )
+
+    def test_parse_zone_lines_soa_minimum_ttl(self):
+        lines = [
+            "@ SOA ns1 admin 1 2 3 4 60",
+            "www A 10.0.0.1",
+        ]
+        records = list(parse_zone_lines(lines, origin="example.com"))
+        self.assertEqual(records[0]["TTL"], "60")
+
+    def test_parse_zone_lines_errors(self):
+        with self.assertRaises(ValueError):
+            list(parse_zone_lines(["www A 10.0.0.1"]))
+        with self.assertRaises(ValueError):
+            list(parse_zone_lines(["$INCLUDE other.zone"], "example.com"))
+        with self.assertRaises(ValueError):
+            list(parse_zone_lines(["www HINFO a b"], "example.com"))
+        with self.assertRaises(ValueError):
+            list(parse_zone_lines(["www TXT ( a"], "example.com"))
+
+    def test_parse_csv_lines(self):
+        lines = [
+            "Name,Type,TTL,Value",
+            "www,A,,10.0.0.1",
+            "www.example.com.,A,60,10.0.0.2",
+            "example.com.,NS,,ns1.example.com.",
+            "alias,CNAME,1m,www",
+        ]
+        records = list(
+            merge_record_sets(parse_csv_lines(lines, "example.com."))
+        )
+        self.assertEqual(
+            [(r["Name"], r["Type"], r["TTL"], r["ResourceRecords"])
+             for r in records],
+            [
+                ("www.example.com.", "A", "300", ["10.0.0.1", "10.0.0.2"]),
+                ("alias.example.com.", "CNAME", "60",
+                 ["www.example.com."]),
+            ]
+        )
+
+    def test_parse_csv_lines_missing_columns(self):
+        with self.assertRaises(ValueError):
+            list(parse_csv_lines(["Name,Type,Value"]))
+
+    def test_read_zone_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "records.csv")
+            with open(path, "w") as f:
+                f.write("name,type,ttl,value\nwww,A,60,10.0.0.1\n")
+            self.assertEqual(
+                list(read_zone_file(path, "example.com")),
+                [{"Name": "www.example.com.", "Type": "A", "TTL": "60",
+                  "ResourceRecords": ["10.0.0.1"]}]
+            )
+            with self.assertRaises(ValueError):
+                list(read_zone_file(path, file_format="json"))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()